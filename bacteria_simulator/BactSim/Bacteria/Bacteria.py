@@ -1,6 +1,9 @@
 import networkx as nx
+import numpy as np
 import copy
 from BactSim.Evolution import Evolution
+from BactSim.Bacteria.Topology import Topology, as_float
+from BactSim.Bacteria.CompactBacteria import CompactBacteria
 
 def make_basic_bacteria(id):
     def make_edge_cfg(weight, scale = 1, atp = 0, evo_sd = 0):
@@ -129,16 +132,25 @@ class Bacteria(object):
     - evolution (BactSim.Evolution.Evolution)
     - description (str) : description of this edge
 
+    Compiled topology
+    ------------------
+    next_timestep() does not walk the graph. It uses a compiled form of it (see compile()),
+    which is only rebuilt when add_node() or add_edge() changes the structure of the graph,
+    and a cached sum of the weights of the outgoing edges of each node, which is refreshed by
+    evolve(). If you change the weight of an edge in any other way (eg. through the dict
+    returned by get_edge()), call refresh_weights() afterwards.
+
     How to read the code
     ---------------------
     Similar/related types of functions in this class are grouped together, headed by comments
     like this `## Example ##`. The sections are summarized here:
 
     1. Adding nodes and edges
-    2. Simulation functions : survival and reproduction
-    3. Getting node amounts and edge weights
-    4. Getting nodes and edges
-    5. Displaying functions (AKA functions that return strings describing the bacteria)
+    2. Compiled topology
+    3. Simulation functions : survival and reproduction
+    4. Getting node amounts and edge weights
+    5. Getting nodes and edges
+    6. Displaying functions (AKA functions that return strings describing the bacteria)
     """
 
     def __init__(self, id,
@@ -190,17 +202,125 @@ class Bacteria(object):
 
         self.graph = nx.DiGraph()
         self.graph.add_node('atp', amount=initial_atp)
+        self.invalidate()
 
 
     ## Adding nodes and edges ##
 
     def add_node(self, name, initial_amount = 0, description = ''):
         self.graph.add_node(name, amount = initial_amount, description = '')
+        self.invalidate()
 
     def add_edge(self, src, dest, weight, make_evolution_cls = lambda w: Evolution(w, 0), atp = 0, scale = 1, description = ''):
         if src not in self.graph or dest not in self.graph:
             raise ValueError('src or dest node has not been created')
         self.graph.add_edge(src, dest, weight=weight, atp_needed = atp, evolution = make_evolution_cls(weight), scale = scale, description = description)
+        self.invalidate()
+
+
+    ## Compiled topology ##
+
+    def invalidate(self):
+        """
+        Discards the compiled topology. It is rebuilt the next time it is needed. Called
+        automatically by add_node() and add_edge().
+        """
+
+        self._topology = None
+        self._node_data = None
+        self._edge_data = None
+        self._out_weights = None
+
+    def compile(self):
+        """
+        Returns the compiled topology of this bacterium (see BactSim.Bacteria.Topology),
+        compiling it first if the graph has changed since it was last compiled.
+
+        :returns: a Topology
+        """
+
+        if self._topology is None:
+            self._bind(Topology.from_bacteria(self))
+            self.refresh_weights()
+        return self._topology
+
+    def _bind(self, topology):
+        """Use the given topology, which must match the graph, as the compiled topology"""
+
+        # attribute dicts of the nodes and edges, indexed like topology.nodes/topology.edges
+        nodes = self.graph.nodes
+        edges = self.graph.edges
+        self._node_data = [nodes[name] for name in topology.nodes]
+        self._edge_data = [(src, dest, edges[name], scale, atp_needed)
+                           for (name, (src, dest, scale, atp_needed))
+                           in zip(topology.edges, topology.edge_list)]
+        self._topology = topology
+
+    def refresh_weights(self):
+        """
+        Recomputes the cached sum of weights of the outgoing edges of each node. Called
+        automatically by evolve().
+        """
+
+        if self._topology is None:
+            return
+        out_weights = [0] * self._topology.num_nodes
+        for (src, dest, data, scale, atp_needed) in self._edge_data:
+            out_weights[src] = out_weights[src] + data['weight']
+        self._out_weights = out_weights
+
+    def get_out_weights(self):
+        """
+        Returns the sum of weights of the outgoing edges of each node, ordered like the nodes
+        of the compiled topology (see compile()). The list is cached, so do not change it.
+
+        :returns: list of numbers
+        """
+
+        self.compile()
+        return self._out_weights
+
+    def get_state(self):
+        """
+        Returns the node amounts and edge weights of this bacterium as arrays, ordered like
+        the nodes and edges of its compiled topology (see compile()).
+
+        :returns: tuple of 2 np.ndarray (amounts, weights)
+        """
+
+        self.compile()
+        return (np.array([as_float(node['amount']) for node in self._node_data]),
+                np.array([as_float(data['weight']) for (_, _, data, _, _) in self._edge_data]))
+
+    def set_amounts(self, amounts):
+        """
+        Sets the amount of every node, ordered like the nodes of its compiled topology (see
+        get_state()).
+
+        :param amounts: sequence of numbers
+        """
+
+        self.compile()
+        for (node, amount) in zip(self._node_data, amounts):
+            node['amount'] = amount
+
+    def compact(self, topology = None):
+        """
+        Returns a CompactBacteria with the same state as this bacterium (see
+        BactSim.Bacteria.CompactBacteria). Changes to one do not affect the other.
+
+        :param topology: (default: this bacterium's compiled topology) Topology to share with
+        the compact cell. Must have the same nodes and edges as this bacterium.
+        :returns: a CompactBacteria
+        """
+
+        if topology is None:
+            topology = self.compile()
+        elif not topology.matches(self):
+            raise ValueError(f'Bacteria {self.id} has a different structure from the topology')
+        amounts, weights = self.get_state()
+        return CompactBacteria(topology, amounts, weights, self.id, self.generation, self.timestep,
+                               None if self.last_food is None else self.last_food.copy())
 
 
     ## Simulation functions: survival and reproduction ##
@@ -248,39 +368,38 @@ class Bacteria(object):
 
         self.timestep += 1
 
+        topology = self.compile()
+        nodes = self._node_data
+        atp = nodes[topology.atp]
         # sum of weights of outgoing edges for each node
-        out_weights = {}
-        for (src, dest, weight) in self.graph.edges.data('weight'):
-            if src in out_weights:
-                out_weights[src] += weight
-            else:
-                out_weights[src] = weight
+        out_weights = self._out_weights
+        max_amount_per_step = self.max_amount_per_step
 
         # update the graph
-        increase_by = {}
-        for (src, dest, data) in self.graph.edges.data():
-            if dest not in increase_by:
-                increase_by[dest] = 0
+        increase_by = [0] * topology.num_nodes
+        for (src, dest, data, scale, atp_needed) in self._edge_data:
+            weight = data['weight']
+            src_node = nodes[src]
 
             # Not sure if this is a realistic way to distribute the src nodes between multiple products
             # but at least we don't have to reset all the amounts every generation
-            src_available = self.get_amount(src) * data['weight'] / out_weights[src]
-            src_used = data['weight'] * min(src_available, self.max_amount_per_step)
-            dest_produced = src_used * data['scale']
+            src_available = src_node['amount'] * weight / out_weights[src]
+            src_used = weight * min(src_available, max_amount_per_step)
+            dest_produced = src_used * scale
 
-            self.graph.nodes[src]['amount'] -= src_used # deduct src (substrate) used
+            src_node['amount'] -= src_used # deduct src (substrate) used
             increase_by[dest] += dest_produced # increase dest (product) synthesized (at the end of timestep)
             if self.penalize_edges:
-                self.graph.nodes['atp']['amount'] -= data['atp_needed'] * max(dest_produced, data['weight'])
+                atp['amount'] -= atp_needed * max(dest_produced, weight)
             else:
-                self.graph.nodes['atp']['amount'] -= data['atp_needed'] * dest_produced
+                atp['amount'] -= atp_needed * dest_produced
 
         # increase the amounts for each node
-        for (node, amount) in increase_by.items():
+        for (node, amount) in zip(nodes, increase_by):
             if amount > 0:
                 # it's not possible for a TF to actually decrease the amount of protein
                 # only decrease its rate of production (?)
-                self.graph.nodes[node]['amount'] += amount
+                node['amount'] += amount
 
     def survive(self, food):
         """
@@ -324,32 +443,67 @@ class Bacteria(object):
         The cloned cell also inherits the age of the parent cell. The amount of each node in
         both this cell and its clone halve.
 
+        Only the state which changes during a simulation is copied: the graph with its node
+        and edge attribute dicts, the evolution object of each edge and last_food. The
+        compiled topology and any other attributes are shared with the parent cell.
+
         :param id: ID of cloned cell
         :returns: the cloned cell
         """
 
-        cloned_cell = copy.deepcopy(self)
+        topology = self.compile()
+
+        cloned_cell = copy.copy(self)
         cloned_cell.id = id
         cloned_cell.generation += 1
+        if self.last_food is not None:
+            cloned_cell.last_food = self.last_food.copy()
+
+        cloned_cell.graph = self.graph.copy()
+        cloned_cell._bind(topology)
+        for (src, dest, data, scale, atp_needed) in cloned_cell._edge_data:
+            data['evolution'] = copy.copy(data['evolution'])
 
         # half amount of all nodes in this and parent
-        for cell in (self, cloned_cell):
-            for node_name in cell.graph.nodes:
-                cell.graph.nodes[node_name]['amount'] /= 2
+        for (node, cloned_node) in zip(self._node_data, cloned_cell._node_data):
+            node['amount'] = cloned_node['amount'] = node['amount'] / 2
 
         return cloned_cell
 
-    def evolve(self):
-        """Evolves (ie. possibly mutates) weights of all edges in this bacterium's graph"""
+    def evolve(self, rng = None):
+        """
+        Evolves (ie. possibly mutates) weights of all edges in this bacterium's graph. All the
+        edges are mutated at once with Evolution.mutate, using the current `initial` and `sd`
+        of each edge's evolution object. If an edge's evolution object overrides how weights
+        mutate (see Evolution.batchable), every edge is mutated by its own getMutated instead.
 
-        for (src, dest, evolution) in self.graph.edges.data('evolution'):
-            self.graph.edges[src, dest]['weight'] = evolution.getMutated()
+        :param rng: (default: the global np.random state) np.random.Generator to draw the
+        mutations from (see BactSim.Random.RandomStreams)
+        """
 
-    def divide(self, id):
-        """Equivalent to this.clone(id) and using evolve() on the daughter cell."""
+        self.compile()
+        edge_data = self._edge_data
+        evolutions = [data['evolution'] for (src, dest, data, scale, atp_needed) in edge_data]
+        if all(cls.batchable() for cls in {type(evolution) for evolution in evolutions}):
+            weights = [data['weight'] for (src, dest, data, scale, atp_needed) in edge_data]
+            initial = [evolution.initial for evolution in evolutions]
+            sd = [evolution.sd for evolution in evolutions]
+            mutated = Evolution.mutate(weights, initial, sd, rng).tolist()
+        else:
+            mutated = []
+            for ((src, dest, data, scale, atp_needed), evolution) in zip(edge_data, evolutions):
+                evolution.weight = data['weight']
+                mutated.append(evolution.getMutated(rng))
+        for ((src, dest, data, scale, atp_needed), weight) in zip(edge_data, mutated):
+            data['weight'] = weight
+            data['evolution'].weight = weight
+        self.refresh_weights()
+
+    def divide(self, id, rng = None):
+        """Equivalent to this.clone(id) and using evolve(rng) on the daughter cell."""
 
         daughter = self.clone(id)
-        daughter.evolve()
+        daughter.evolve(rng)
         return daughter
 
 
@@ -505,7 +659,7 @@ def testing():
     print(bac2.get_amount('glucose'))
     wt = bac2.get_weight('glucose', 'transported_glucose')
     print(wt)
-    print(type(wt)) # TODO fix this
+    print(type(wt))
 
     print(bac1 is bac2)
     print(bac1.graph is bac2.graph)
@@ -0,0 +1,247 @@
+import numpy as np
+from BactSim.Evolution import Evolution
+
+class CompactBacteria(object):
+    """
+    A bacterial cell which shares its structure (see BactSim.Bacteria.Topology) with the
+    rest of the population, and only stores its own state. It behaves like a Bacteria with
+    the same nodes and edges, but takes a few hundred bytes instead of a full NetworkX graph,
+    so a simulator can hold millions of them.
+
+    Create one with Bacteria.compact(). All cells cloned from it share the same Topology:
+
+        cell = make_basic_bacteria(1).compact()
+        simulator = IntSimulator(food_source, [cell])
+
+    Attributes
+    -----------
+    - topology (BactSim.Bacteria.Topology) : structure shared with the rest of the population.
+    Never modified.
+    - amounts (np.ndarray) : amount of each node, ordered like `topology.nodes`
+    - weights (np.ndarray) : weight of each edge, ordered like `topology.edges`
+    - id, generation, timestep, last_food : same as Bacteria
+
+    The constructor parameters of the bacteria (survival_atp, penalize_edges, ...) are read
+    from the topology, eg. `cell.survival_atp`. See Bacteria for what the functions do.
+    """
+
+    __slots__ = ('topology', 'amounts', 'weights', 'id', 'generation', 'timestep', 'last_food')
+
+    def __init__(self, topology, amounts, weights, id, generation = 0, timestep = 0, last_food = None):
+        """
+        :param topology: Topology shared with the rest of the population
+        :param amounts: amount of each node, ordered like `topology.nodes`
+        :param weights: weight of each edge, ordered like `topology.edges`
+        :param id: ID of this bacteria
+
+        Optional parameters:
+        :param generation: (default: 0) number of ancestors
+        :param timestep: (default: 0) age of this bacteria
+        :param last_food: (default: None) dict of the food fed in the last timestep
+        """
+
+        self.topology = topology
+        self.amounts = np.array(amounts, dtype=float)
+        self.weights = np.array(weights, dtype=float)
+        self.id = id
+        self.generation = generation
+        self.timestep = timestep
+        self.last_food = last_food
+
+    def __getattr__(self, name):
+        # constructor parameters of the bacteria, eg. cell.survival_atp
+        if name in CompactBacteria.__slots__:
+            raise AttributeError(name)
+        config = self.topology.config
+        if name in config:
+            return config[name]
+        raise AttributeError(f"'CompactBacteria' object has no attribute '{name}'")
+
+    def compile(self):
+        """Returns the shared topology of this bacterium (see Bacteria.compile)"""
+
+        return self.topology
+
+    def get_state(self):
+        """Returns copies of the (amounts, weights) arrays of this bacterium"""
+
+        return self.amounts.copy(), self.weights.copy()
+
+    def set_amounts(self, amounts):
+        """Sets the amount of every node (see Bacteria.set_amounts)"""
+
+        self.amounts[:] = amounts
+
+
+    ## Simulation functions: survival and reproduction ##
+
+    def is_alive(self):
+        return self.amounts[self.topology.atp] >= self.survival_atp
+
+    def can_reproduce(self):
+        return self.amounts[self.topology.atp] >= self.repro_atp
+
+    def set_food(self, food, record):
+        node_index = self.topology.node_index
+        for (food_src, amount) in food.items():
+            self.amounts[node_index[food_src]] = amount
+        if record:
+            self.last_food = food.copy()
+
+    def reset_nodes(self):
+        atp = self.topology.atp
+        atp_amount = self.amounts[atp]
+        self.amounts[:] = 0
+        self.amounts[atp] = atp_amount
+
+    def next_timestep(self):
+        """Same as Bacteria.next_timestep"""
+
+        self.timestep += 1
+
+        topology = self.topology
+        # evaluated with python floats, which is much faster than indexing numpy arrays
+        amounts = self.amounts.tolist()
+        weights = self.weights.tolist()
+        atp = topology.atp
+        max_amount_per_step = self.max_amount_per_step
+        penalize_edges = self.penalize_edges
+
+        # sum of weights of outgoing edges for each node
+        out_weights = [0] * len(amounts)
+        for (weight, (src, dest, scale, atp_needed)) in zip(weights, topology.edge_list):
+            out_weights[src] += weight
+
+        increase_by = [0] * len(amounts)
+        for (weight, (src, dest, scale, atp_needed)) in zip(weights, topology.edge_list):
+            src_available = amounts[src] * weight / out_weights[src]
+            src_used = weight * min(src_available, max_amount_per_step)
+            dest_produced = src_used * scale
+
+            amounts[src] -= src_used
+            increase_by[dest] += dest_produced
+            if penalize_edges:
+                amounts[atp] -= atp_needed * max(dest_produced, weight)
+            else:
+                amounts[atp] -= atp_needed * dest_produced
+
+        for (node, amount) in enumerate(increase_by):
+            if amount > 0:
+                amounts[node] += amount
+        self.amounts[:] = amounts
+
+    def survive(self, food):
+        """Same as Bacteria.survive"""
+
+        self.set_food(food, record = True)
+
+        self.next_timestep()
+        # reset food amount
+        if self.survive_reset_food:
+            zero_food = dict.fromkeys(food, 0)
+            self.set_food(zero_food, record = False)
+
+        # run remaining timesteps
+        for i in range(self.survive_num_timesteps -1):
+            self.next_timestep()
+
+        if self.survive_reset_nodes:
+            self.reset_nodes()
+
+        return self.is_alive()
+
+    def clone(self, id):
+        """Same as Bacteria.clone. The clone shares this cell's topology."""
+
+        self.amounts /= 2
+        return CompactBacteria(self.topology, self.amounts, self.weights, id,
+                               self.generation + 1, self.timestep,
+                               None if self.last_food is None else self.last_food.copy())
+
+    def evolve(self, rng = None):
+        """Same as Bacteria.evolve"""
+
+        topology = self.topology
+        self.weights = Evolution.mutate(self.weights, topology.evo_initial, topology.evo_sd, rng)
+
+    def divide(self, id, rng = None):
+        """Equivalent to this.clone(id) and using evolve(rng) on the daughter cell."""
+
+        daughter = self.clone(id)
+        daughter.evolve(rng)
+        return daughter
+
+
+    ## Getting node amounts and edge weights ##
+
+    def get_amount(self, node):
+        if self.has_node(node):
+            return self.amounts[self.topology.node_index[node]].item()
+        else:
+            raise ValueError(f'No node called {node}')
+
+    def get_weight(self, src, dest):
+        if self.has_edge(src, dest):
+            return self.weights[self.topology.edge_index[(src, dest)]].item()
+        else:
+            raise ValueError(f'No edge from {src} to {dest}')
+
+
+    ## Getting nodes and edges ##
+
+    def has_node(self, name):
+        return name in self.topology.node_index
+
+    def has_edge(self, src, dest):
+        return (src, dest) in self.topology.edge_index
+
+    def get_node(self, name):
+        """
+        Returns the attributes of the named node, if it exists, otherwise throws a ValueError.
+        Unlike Bacteria.get_node, changing the returned dict does not change this bacterium.
+        """
+
+        if self.has_node(name):
+            n = self.topology.node_index[name]
+            return {'amount': self.amounts[n].item(), 'description': self.topology.node_descriptions[n]}
+        raise ValueError(f'No node called {name}')
+
+    def get_all_nodes(self, names_only = False):
+        if names_only:
+            return list(self.topology.nodes)
+        else:
+            return {name: self.get_node(name) for name in self.topology.nodes}
+
+    def get_edge(self, src, dest):
+        """
+        Returns the attributes of the edge from src node to dest node, if it exists,
+        otherwise a ValueError is thrown. Unlike Bacteria.get_edge, changing the returned dict
+        does not change this bacterium, and the evolution object is shared by all cells.
+        """
+
+        if self.has_edge(src, dest):
+            topology = self.topology
+            e = topology.edge_index[(src, dest)]
+            return {'weight': self.weights[e].item(), 'atp_needed': topology.atp_needed[e].item(),
+                    'evolution': topology.evolutions[e], 'scale': topology.scale[e].item(),
+                    'description': topology.edge_descriptions[e]}
+        raise ValueError(f'No edge from {src} to {dest}')
+
+    def get_all_edges(self, names_only = False):
+        if names_only:
+            return list(self.topology.edges)
+        else:
+            return {name: self.get_edge(*name) for name in self.topology.edges}
+
+    def __str__(self):
+        string = f'CompactBacteria {self.id}, generation: {self.generation}, age: {self.timestep}\n' \
+            + f'Last food: {self.last_food}\n' \
+            + 'NODES\n'
+        for name, data in sorted(self.get_all_nodes().items()):
+            string += f'{name} {data}\n'
+        string += 'EDGES\n'
+        for name, data in sorted(self.get_all_edges().items()):
+            string += f'{name} {data}\n'
+        return string
+
+    __repr__ = __str__
@@ -0,0 +1,148 @@
+import copy
+import numpy as np
+from BactSim.Evolution import Evolution
+
+# attributes of a Bacteria which are set in its constructor and never change afterwards
+CONFIG_ATTRS = ('survival_atp', 'repro_atp', 'initial_atp',
+                'max_amount_per_step', 'penalize_edges',
+                'survive_num_timesteps', 'survive_reset_nodes', 'survive_reset_food')
+
+class Topology(object):
+    """
+    Compiled form of the structure of a bacterium: everything about a Bacteria which does
+    not change from timestep to timestep, with nodes and edges identified by integer indices.
+    A Topology is never modified after it is created, so it can be shared by any number of
+    cells (see BactSim.Bacteria.CompactBacteria and BactSim.Population).
+
+    Attributes
+    -----------
+    - nodes (tuple of str) : node names, in the same order as `bact.graph.nodes`
+    - node_index (dict) : node name to index in `nodes`
+    - node_descriptions (tuple of str)
+    - edges (tuple of (str, str)) : edge names, in the same order as `bact.graph.edges`
+    - edge_index (dict) : edge name to index in `edges`
+    - src, dest (np.ndarray of int) : index of the source/destination node of each edge
+    - scale, atp_needed (np.ndarray of float) : `scale` and `atp_needed` of each edge
+    - edge_list (list of tuples) : (src, dest, scale, atp_needed) of each edge as python
+    ints/floats, for code which evaluates the edges one at a time
+    - evolutions (tuple of BactSim.Evolution.Evolution) : copies of the evolution object of
+    each edge in the bacterium this topology was compiled from. Only `initial` and `sd` are
+    meaningful.
+    - evo_initial, evo_sd (np.ndarray of float) : `initial` and `sd` of the evolution object
+    of each edge when the topology was compiled, for Evolution.mutate. CompactBacteria and
+    populations mutate with these; a Bacteria reads its own evolution objects (see
+    Bacteria.evolve)
+    - edge_descriptions (tuple of str)
+    - atp (int) : index of the ATP node
+    - config (dict) : the constructor parameters of the bacterium (see CONFIG_ATTRS)
+    """
+
+    def __init__(self, nodes, node_descriptions, edges, edge_attrs, config):
+        """
+        :param nodes: list of node names
+        :param node_descriptions: list of node descriptions
+        :param edges: list of (src, dest) node names
+        :param edge_attrs: list of dicts with the keys `scale`, `atp_needed`, `evolution` and
+        `description`, one per edge
+        :param config: dict of constructor parameters (see CONFIG_ATTRS)
+        """
+
+        self.nodes = tuple(nodes)
+        self.node_index = {name: i for i, name in enumerate(self.nodes)}
+        self.node_descriptions = tuple(node_descriptions)
+
+        self.edges = tuple(edges)
+        self.edge_index = {name: i for i, name in enumerate(self.edges)}
+        self.src = np.array([self.node_index[src] for (src, dest) in self.edges], dtype=np.intp)
+        self.dest = np.array([self.node_index[dest] for (src, dest) in self.edges], dtype=np.intp)
+        self.scale = np.array([attrs['scale'] for attrs in edge_attrs], dtype=float)
+        self.atp_needed = np.array([attrs['atp_needed'] for attrs in edge_attrs], dtype=float)
+        self.edge_list = list(zip(self.src.tolist(), self.dest.tolist(),
+                                  self.scale.tolist(), self.atp_needed.tolist()))
+        self.evolutions = tuple(copy.copy(attrs['evolution']) for attrs in edge_attrs)
+        self.evo_initial = np.array([evolution.initial for evolution in self.evolutions], dtype=float)
+        self.evo_sd = np.array([evolution.sd for evolution in self.evolutions], dtype=float)
+        self.edge_descriptions = tuple(attrs['description'] for attrs in edge_attrs)
+
+        self.atp = self.node_index['atp']
+        self.config = dict(config)
+
+    @classmethod
+    def from_bacteria(cls, bacteria):
+        """
+        Compiles the topology of the given bacterium.
+
+        :param bacteria: a Bacteria
+        :returns: its Topology
+        """
+
+        graph = bacteria.graph
+        return cls(nodes = list(graph.nodes),
+                   node_descriptions = [data.get('description', '') for (_, data) in graph.nodes.data()],
+                   edges = list(graph.edges),
+                   edge_attrs = [data for (_, _, data) in graph.edges.data()],
+                   config = {attr: getattr(bacteria, attr) for attr in CONFIG_ATTRS})
+
+    def to_dict(self):
+        """
+        Returns a dict of python lists/numbers/strings describing this topology, eg. for saving
+        as JSON. The evolution objects are described by their `initial` and `sd` only.
+        """
+
+        return {'nodes': list(self.nodes),
+                'node_descriptions': list(self.node_descriptions),
+                'edges': [list(edge) for edge in self.edges],
+                'scale': self.scale.tolist(),
+                'atp_needed': self.atp_needed.tolist(),
+                'evo_initial': self.evo_initial.tolist(),
+                'evo_sd': self.evo_sd.tolist(),
+                'edge_descriptions': list(self.edge_descriptions),
+                'config': dict(self.config)}
+
+    @classmethod
+    def from_dict(cls, d):
+        """
+        Creates a topology from a dict returned by to_dict(). The edges get Evolution objects.
+
+        :param d: dict
+        :returns: a Topology
+        """
+
+        edge_attrs = [{'scale': scale, 'atp_needed': atp_needed,
+                       'evolution': Evolution(initial, sd), 'description': description}
+                      for (scale, atp_needed, initial, sd, description)
+                      in zip(d['scale'], d['atp_needed'], d['evo_initial'], d['evo_sd'], d['edge_descriptions'])]
+        return cls(nodes = d['nodes'],
+                   node_descriptions = d['node_descriptions'],
+                   edges = [tuple(edge) for edge in d['edges']],
+                   edge_attrs = edge_attrs,
+                   config = d['config'])
+
+    @property
+    def num_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def num_edges(self):
+        return len(self.edges)
+
+    def matches(self, bacteria):
+        """
+        Returns whether the given bacterium (Bacteria or CompactBacteria) has the same nodes
+        and edges, in the same order
+        """
+
+        other = bacteria.compile()
+        return other is self or (other.nodes == self.nodes and other.edges == self.edges)
+
+    def __str__(self):
+        return f'Topology({self.num_nodes} nodes, {self.num_edges} edges)'
+
+    __repr__ = __str__
+
+def as_float(value):
+    """Converts a number or a 1-element array (as returned by older Evolution code) to a float"""
+
+    if isinstance(value, float):
+        return value
+    return float(np.asarray(value, dtype=float).reshape(-1)[0])
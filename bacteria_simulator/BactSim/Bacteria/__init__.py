@@ -1 +1,3 @@
 from BactSim.Bacteria.Bacteria import Bacteria, make_basic_bacteria
+from BactSim.Bacteria.CompactBacteria import CompactBacteria
+from BactSim.Bacteria.Topology import Topology
@@ -0,0 +1,259 @@
+"""
+Non-interactive runs of a simulator, for scripts and the command line.
+
+    python3 -m BactSim.Batch --generations 10000 --seed 1 --output run.bslog
+
+runs an IntSimulator with make_basic_bacteria and FoodGenerator as fast as it can, writes a
+run log (see BactSim.RunLog) and reports the number of generations per second. Run it from
+the bacteria_simulator directory. See `python3 -m BactSim.Batch --help` for the options.
+"""
+import argparse
+import functools
+import importlib
+import sys
+import time
+
+from BactSim.Bacteria.Topology import CONFIG_ATTRS
+from BactSim.FoodGenerators import TraceGenerator
+from BactSim.Population import Population, CohortPopulation
+from BactSim.RunLog import RunLogWriter
+from BactSim.Simulator import Simulator, IntSimulator, Profiler
+from BactSim.Simulator.Allocation import ALLOCATIONS, make_allocation
+from BactSim.Simulator.Engine import MULTICORE_THRESHOLD
+from BactSim.Simulator.Memory import MemoryUsage
+from BactSim.Simulator.Profiler import PHASES, COUNTERS
+
+SIMULATORS = {'int': IntSimulator, 'simple': Simulator}
+REPRESENTATIONS = ('bacteria', 'compact', 'population', 'cohorts')
+
+def resolve(name, default_module):
+    """
+    Returns the object with the given name, eg. a bacteria factory or food generator class
+    :param name: 'module.path:name', or just a name in default_module
+    :param default_module: name of the module to look in if name has no module
+    :raises: ValueError if there is no such object
+    """
+    module, _, attr = name.rpartition(':')
+    try:
+        return getattr(importlib.import_module(module or default_module), attr)
+    except (ImportError, AttributeError):
+        raise ValueError(f'No such object: {name}')
+
+def configure_bacteria(bacteria, evo_sd = None, **params):
+    """
+    Changes the parameters of a newly created Bacteria
+    :param bacteria: a Bacteria
+    :param evo_sd: (default: unchanged) standard deviation of the mutations of every edge
+    :param params: constructor parameters of the bacteria (see CONFIG_ATTRS), eg. survival_atp
+    :returns: the bacteria
+    :raises: ValueError for an unknown parameter
+    """
+    for name, value in params.items():
+        if name not in CONFIG_ATTRS:
+            raise ValueError(f'Unknown bacteria parameter {name}')
+        setattr(bacteria, name, value)
+    if evo_sd is not None:
+        for (_, _, evolution) in bacteria.graph.edges.data('evolution'):
+            evolution.sd = evo_sd
+    # the compiled topology holds the old parameters
+    bacteria.invalidate()
+    return bacteria
+
+def make_simulator(bacteria_factory = 'make_basic_bacteria', food_generator = 'FoodGenerator',
+                   simulator = 'int', food_unit = 1, representation = 'bacteria', cores = None,
+                   bacteria_params = None, seed = None, max_cells = None, memory_budget = None,
+                   allocation = None, multicore_threshold = MULTICORE_THRESHOLD):
+    """
+    Creates a simulator with 1 initial bacterium
+    :param bacteria_factory: (default: make_basic_bacteria) function of an ID returning a
+    Bacteria, or its name (see resolve; names are looked up in BactSim.Bacteria)
+    :param food_generator: (default: FoodGenerator) food generator class (called with no
+    arguments) or its name (names are looked up in BactSim.FoodGenerators)
+    :param simulator: (default: 'int') 'int' for IntSimulator or 'simple' for Simulator
+    :param food_unit: (default: 1) food_unit of an IntSimulator
+    :param representation: (default: 'bacteria') simulate the cells as a list of Bacteria
+    ('bacteria'), a list of CompactBacteria ('compact'), a Population ('population') or a
+    CohortPopulation, which simulates each group of identical cells once ('cohorts')
+    :param cores: (default: number of CPUs) worker processes of the simulator
+    :param multicore_threshold: (default: MULTICORE_THRESHOLD) size of the lists of bacteria
+    which survive on their state arrays, split between the worker processes (see
+    BactSim.Simulator.Engine)
+    :param bacteria_params: (default: None) dict of parameters to change in the initial
+    bacterium (see configure_bacteria), eg. {'survival_atp': 6, 'evo_sd': 0.1}
+    :param seed: (default: None) seed of the simulator's random streams (see
+    BactSim.Random.RandomStreams)
+    :param max_cells: (default: None, no limit) carrying capacity of the simulator, above
+    which a random sample of the population is simulated (see Engine.sample)
+    :param memory_budget: (default: None, no limit) bytes the population may take (see
+    BactSim.Simulator.Memory.MemoryBudget)
+    :param allocation: (default: the simulator's) food allocation strategy, or its name (see
+    BactSim.Simulator.Allocation.ALLOCATIONS; strategies in units use food_unit)
+    :returns: the simulator
+    :raises: ValueError for an unknown simulator, representation, allocation or bacteria
+    parameter
+    """
+    if isinstance(bacteria_factory, str):
+        bacteria_factory = resolve(bacteria_factory, 'BactSim.Bacteria')
+    if isinstance(food_generator, str):
+        food_generator = resolve(food_generator, 'BactSim.FoodGenerators')
+    if simulator not in SIMULATORS:
+        raise ValueError(f'Unknown simulator {simulator}, must be one of {", ".join(SIMULATORS)}')
+    if representation not in REPRESENTATIONS:
+        raise ValueError(f'Unknown representation {representation}, must be one of {", ".join(REPRESENTATIONS)}')
+    if isinstance(allocation, str):
+        allocation = make_allocation(allocation, food_unit)
+
+    bacteria = [configure_bacteria(bacteria_factory(1), **(bacteria_params or {}))]
+    if representation == 'compact':
+        bacteria = [bacteria[0].compact()]
+    elif representation == 'population':
+        bacteria = Population.from_bacteria(bacteria)
+    elif representation == 'cohorts':
+        bacteria = CohortPopulation.from_bacteria(bacteria)
+
+    if simulator == 'int':
+        return IntSimulator(food_generator(), bacteria, food_unit = food_unit, cores = cores,
+                            multicore_threshold = multicore_threshold, max_cells = max_cells, seed = seed,
+                            memory_budget = memory_budget, allocation = allocation)
+    return Simulator(food_generator(), bacteria, seed = seed, memory_budget = memory_budget, max_cells = max_cells,
+                     allocation = allocation, cores = cores, multicore_threshold = multicore_threshold)
+
+def run(simulator, generations, output = None, metadata = None, report_every = 0, file = sys.stdout):
+    """
+    Runs a simulator until it has run the given number of generations, or the population
+    dies out
+    :param simulator: Simulator or IntSimulator
+    :param generations: number of generations to run
+    :param output: (default: None) run log file to write a row to every generation, with the
+    estimated memory of the population (see BactSim.Simulator.Memory.MemoryUsage). If the
+    simulator has a profiler, its records are written too.
+    :param metadata: (default: None) dict of anything else to save in the run log header
+    :param report_every: (default: 0, never) print the population every this many generations
+    :param file: (default: stdout) where to print to
+    :returns: dict of 'generations' (number of generations run), 'population' (final population
+    size), 'seconds' and 'generations_per_second'
+    """
+    profiler = simulator.profiler
+    log = None
+    if output is not None:
+        extra_columns = MemoryUsage._fields
+        if profiler is not None:
+            extra_columns += ('total',) + PHASES + COUNTERS
+        log = RunLogWriter.for_simulator(output, simulator, metadata, extra_columns)
+    start_generation = simulator.generation
+    start = time.perf_counter()
+    try:
+        for i in range(generations):
+            try:
+                simulator.progress()
+            except ZeroDivisionError:
+                # all the bacteria have died
+                break
+            if log is not None:
+                extra = simulator.memory_usage._asdict()
+                if profiler is not None:
+                    extra.update(profiler.records[-1])
+                log.log(simulator, extra)
+            if report_every and simulator.generation % report_every == 0:
+                print(f'Generation: {simulator.generation} Population size: {simulator.population_size}', file = file)
+            if len(simulator.bacteria) == 0:
+                break
+    finally:
+        if log is not None:
+            log.close()
+
+    seconds = time.perf_counter() - start
+    run_generations = simulator.generation - start_generation
+    return {'generations': run_generations,
+            'population': simulator.population_size,
+            'seconds': seconds,
+            'generations_per_second': run_generations / seconds if seconds > 0 else float('inf')}
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog = 'python3 -m BactSim.Batch',
+                                     description = 'Run a bacteria simulation without any interaction')
+    parser.add_argument('-g', '--generations', type = int, default = 10000,
+                        help = 'number of generations to run (default: 10000)')
+    parser.add_argument('-b', '--bacteria', default = 'make_basic_bacteria',
+                        help = 'function creating the initial bacterium from an ID, as a name in '
+                        'BactSim.Bacteria or module:name (default: make_basic_bacteria)')
+    parser.add_argument('-f', '--food-generator', default = 'FoodGenerator',
+                        help = 'food generator class, as a name in BactSim.FoodGenerators or '
+                        'module:name (default: FoodGenerator)')
+    parser.add_argument('--food-trace', default = None,
+                        help = 'replay the food trace in this directory, .npy or raw binary file '
+                        '(see BactSim.FoodGenerators.Trace) instead of using --food-generator')
+    parser.add_argument('--trace-foods', nargs = '+', default = None,
+                        help = 'sugars of the columns of a .npy or raw food trace')
+    parser.add_argument('--trace-step', type = float, default = 1,
+                        help = 'generations each sample of the food trace lasts (default: 1)')
+    parser.add_argument('--trace-interpolate', action = 'store_true',
+                        help = 'interpolate the food trace linearly between samples')
+    parser.add_argument('--trace-loop', action = 'store_true',
+                        help = 'start the food trace again after its end')
+    parser.add_argument('-s', '--seed', type = int, default = None,
+                        help = 'random seed (default: random)')
+    parser.add_argument('-o', '--output', default = None,
+                        help = 'run log file to write (default: none)')
+    parser.add_argument('--simulator', choices = SIMULATORS, default = 'int',
+                        help = 'IntSimulator (int) or Simulator (simple) (default: int)')
+    parser.add_argument('--food-unit', type = float, default = 1,
+                        help = 'food unit of the IntSimulator, and of the integer and competitive '
+                        'allocations (default: 1)')
+    parser.add_argument('--allocation', choices = ALLOCATIONS, default = None,
+                        help = 'how food is split between the cells (see BactSim.Simulator.Allocation; '
+                        'default: integer for the IntSimulator, equal for the Simulator)')
+    parser.add_argument('--representation', choices = REPRESENTATIONS, default = 'bacteria',
+                        help = 'how the cells are simulated (default: bacteria)')
+    parser.add_argument('--cores', type = int, default = None,
+                        help = 'worker processes for large populations (default: number of CPUs)')
+    parser.add_argument('--multicore-threshold', type = int, default = MULTICORE_THRESHOLD,
+                        help = 'run survive for lists of at least this many bacteria on their state '
+                        f'arrays, split between the worker processes (default: {MULTICORE_THRESHOLD})')
+    parser.add_argument('--max-cells', type = int, default = None,
+                        help = 'simulate a random sample of at most this many cells of the population '
+                        '(default: no limit)')
+    parser.add_argument('--memory-budget', type = float, default = None,
+                        help = 'MiB the population may take; larger populations are converted to a '
+                        'smaller representation or sampled (default: no limit)')
+    parser.add_argument('--profile', action = 'store_true',
+                        help = 'time each phase of every generation (see BactSim.Simulator.Profiler), '
+                        'and write the times to the run log')
+    parser.add_argument('--report-every', type = int, default = 0,
+                        help = 'print the population size every this many generations (default: never)')
+    return parser
+
+def main(argv = None):
+    args = make_parser().parse_args(argv)
+    food_generator = args.food_generator
+    if args.food_trace is not None:
+        food_generator = functools.partial(TraceGenerator, args.food_trace, args.trace_foods, step = args.trace_step,
+                                           interpolate = args.trace_interpolate, loop = args.trace_loop)
+    try:
+        simulator = make_simulator(args.bacteria, food_generator, args.simulator,
+                                   args.food_unit, args.representation, args.cores, seed = args.seed,
+                                   max_cells = args.max_cells, allocation = args.allocation,
+                                   multicore_threshold = args.multicore_threshold,
+                                   memory_budget = None if args.memory_budget is None else int(args.memory_budget * 2 ** 20))
+    except (ValueError, OSError) as e:
+        sys.exit(str(e))
+
+    if args.profile:
+        simulator.profiler = Profiler()
+    metadata = {name: value for (name, value) in vars(args).items() if name != 'output'}
+    with simulator:
+        result = run(simulator, args.generations, args.output, metadata, args.report_every)
+
+    print(f"Ran {result['generations']} generations in {result['seconds']:.2f} s "
+          f"({result['generations_per_second']:.1f} generations/s), "
+          f"final population size: {result['population']}")
+    usage = simulator.memory_usage
+    print(f'Estimated memory: {usage.bytes_per_cell:.0f} bytes per cell, {usage.population_bytes / 2 ** 20:.1f} MiB in total')
+    if simulator.memory_budget is not None:
+        for generation, change in simulator.memory_budget.changes:
+            print(f'Generation {generation}: {change} to keep within the memory budget')
+    if args.profile:
+        totals = simulator.profiler.totals()
+        print('Time in each phase: ' + ', '.join(f'{phase} {totals[phase]:.2f} s' for phase in PHASES))
+        print('Cells: ' + ', '.join(f'{name.replace("_", " ")} {totals[name]}' for name in COUNTERS))
+    return result
@@ -0,0 +1 @@
+from BactSim.Batch.Batch import make_simulator, run, main
@@ -0,0 +1,3 @@
+from BactSim.Batch.Batch import main
+
+main()
@@ -0,0 +1,300 @@
+"""
+Benchmarks of the hot paths of a simulation at different population sizes.
+
+    python3 -m BactSim.Benchmark --sizes 100 1000 10000 --output benchmark.json
+
+times each operation on populations of make_basic_bacteria cells of each size, for each
+representation of the cells (see BactSim.Batch.make_simulator), and saves the results as
+JSON. Giving the results of an earlier run with --compare prints how much faster or slower
+each benchmark has become. Every population and simulator is created from a fixed seed, so
+two runs time exactly the same work. Run it from the bacteria_simulator directory.
+
+The benchmarks are:
+- next_timestep: Bacteria.next_timestep for every cell (Population.next_timestep for a
+Population)
+- clone: Bacteria.clone of every cell (lists of bacteria only)
+- getMutated: Evolution.getMutated of one Evolution object per cell
+- evolve: mutating the edge weights of every cell (Bacteria.evolve, or Evolution.mutate of all
+the weights of a Population)
+- food_allocation: IntSimulator.food_allocation for the population size
+- generation: one call of progress() of a Simulator and an IntSimulator with a population of
+the given size, and food for about that many cells
+
+Each benchmark is run `repeats` times, on a newly created population each time (which is not
+timed). The peak memory is the most memory allocated by one more run of the benchmark (as
+measured by tracemalloc, which includes numpy arrays), above what was allocated before it.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from BactSim.Bacteria import make_basic_bacteria
+from BactSim.Batch.Batch import REPRESENTATIONS
+from BactSim.Evolution import Evolution
+from BactSim.FoodGenerators import StaticGenerator
+from BactSim.Population import Population, CohortPopulation
+from BactSim.Simulator import Simulator, IntSimulator
+
+SIZES = (100, 1000, 10000, 100000, 1000000)
+# food of StaticGenerator per cell, which keeps the population about the same size
+FOOD_PER_CELL = {'glucose': 1, 'sucrose': 5, 'lactose': 0}
+
+def make_population(size, seed = 0):
+    """
+    Returns a Population of make_basic_bacteria cells, whose edge weights have been mutated
+    once so that the cells are all different
+    :param size: number of cells
+    :param seed: (default: 0) seed of the mutations
+    """
+    population = Population.from_bacteria([make_basic_bacteria(1)])
+    population = population.select(np.zeros(size, dtype=int))
+    population.ids = np.arange(1, size + 1)
+    topology = population.topology
+    population.weights = Evolution.mutate(population.weights, topology.evo_initial, topology.evo_sd,
+                                          np.random.default_rng(seed))
+    return population
+
+def make_cells(population, representation):
+    """
+    Returns the cells of a population in a representation (see BactSim.Batch.make_simulator)
+    """
+    if representation == 'bacteria':
+        return population.to_bacteria()
+    if representation == 'compact':
+        return population.to_bacteria(compact = True)
+    if representation == 'cohorts':
+        return CohortPopulation(population.topology, population.amounts.copy(), population.weights.copy(),
+                                ids = population.ids.copy())
+    return population.select(np.arange(len(population)))
+
+
+## Benchmarks: each returns a function which runs the operation once ##
+
+def next_timestep(cells, size, seed):
+    if isinstance(cells, Population):
+        return cells.next_timestep
+    def run():
+        for bac in cells:
+            bac.next_timestep()
+    return run
+
+def clone(cells, size, seed):
+    def run():
+        for (i, bac) in enumerate(cells):
+            bac.clone(size + i + 1)
+    return run
+
+def get_mutated(cells, size, seed):
+    evolutions = [Evolution(0.5, 0.2) for _ in range(size)]
+    rng = np.random.default_rng(seed)
+    def run():
+        for evolution in evolutions:
+            evolution.getMutated(rng)
+    return run
+
+def evolve(cells, size, seed):
+    rng = np.random.default_rng(seed)
+    if isinstance(cells, Population):
+        topology = cells.topology
+        def run():
+            cells.weights = Evolution.mutate(cells.weights, topology.evo_initial, topology.evo_sd, rng)
+        return run
+    def run():
+        for bac in cells:
+            bac.evolve(rng)
+    return run
+
+def make_food_generator(size):
+    return StaticGenerator(food = {food: amount * size for (food, amount) in FOOD_PER_CELL.items()})
+
+def food_allocation(cells, size, seed):
+    simulator = IntSimulator(make_food_generator(size), [], food_unit = 1, seed = seed)
+    return lambda: simulator.food_allocation(size)
+
+def generation(simulator_class):
+    def prepare(cells, size, seed):
+        np.random.seed(seed)
+        if simulator_class is IntSimulator:
+            simulator = IntSimulator(make_food_generator(size), cells, food_unit = 1, cores = 1, seed = seed)
+        else:
+            simulator = Simulator(make_food_generator(size), cells, seed = seed)
+        return simulator.progress
+    return prepare
+
+# benchmark name -> (function preparing it, representations it is run for (None if it does
+# not use the cells), simulator name)
+BENCHMARKS = {
+    'next_timestep': (next_timestep, ('bacteria', 'compact', 'population'), None),
+    'clone': (clone, ('bacteria', 'compact'), None),
+    'getMutated': (get_mutated, None, None),
+    'evolve': (evolve, ('bacteria', 'compact', 'population'), None),
+    'food_allocation': (food_allocation, None, 'int'),
+    'generation:int': (generation(IntSimulator), REPRESENTATIONS, 'int'),
+    'generation:simple': (generation(Simulator), REPRESENTATIONS, 'simple'),
+}
+
+
+def measure(prepare, repeats):
+    """
+    Times a benchmark
+    :param prepare: function returning a function which runs the benchmark once
+    :param repeats: number of times to time it
+    :returns: tuple of (list of seconds taken by each run, peak memory in bytes)
+    """
+    seconds = []
+    for _ in range(repeats):
+        run = prepare()
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+
+    run = prepare()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+def run_benchmarks(names = None, sizes = SIZES, representations = REPRESENTATIONS, repeats = 3,
+                   seed = 0, max_object_cells = 10000, callback = None):
+    """
+    Runs benchmarks
+    :param names: (default: all) names of the benchmarks to run (see BENCHMARKS)
+    :param sizes: (default: 10^2 to 10^6) population sizes
+    :param representations: (default: all) representations of the cells to run them for
+    :param repeats: (default: 3) number of times to time each benchmark
+    :param seed: (default: 0) seed of the populations and simulators
+    :param max_object_cells: (default: 10000) largest population of Bacteria or
+    CompactBacteria objects to run the benchmarks for. Lists of a million Bacteria take
+    hours and gigabytes.
+    :param callback: (default: None) called with each result when it has been measured
+    :returns: list of results, dicts of 'benchmark', 'simulator', 'representation', 'size',
+    'repeats', 'seconds' (fastest run), 'median_seconds', 'cells_per_second' (population
+    size / fastest run), 'generations_per_second' (for the generation benchmarks) and
+    'peak_memory' (bytes)
+    :raises: ValueError for an unknown benchmark or representation
+    """
+    names = list(BENCHMARKS) if names is None else list(names)
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError(f'Unknown benchmark {name}, must be one of {", ".join(BENCHMARKS)}')
+    for representation in representations:
+        if representation not in REPRESENTATIONS:
+            raise ValueError(f'Unknown representation {representation}, must be one of {", ".join(REPRESENTATIONS)}')
+
+    results = []
+    for name in names:
+        function, benchmark_representations, simulator = BENCHMARKS[name]
+        for size in sizes:
+            for representation in benchmark_representations or (None,):
+                if representation is not None and representation not in representations:
+                    continue
+                if representation in ('bacteria', 'compact') and size > max_object_cells:
+                    continue
+                population = make_population(size, seed)
+
+                def prepare():
+                    cells = None if representation is None else make_cells(population, representation)
+                    return function(cells, size, seed)
+
+                seconds, peak = measure(prepare, repeats)
+                best = min(seconds)
+                result = {'benchmark': name, 'simulator': simulator, 'representation': representation,
+                          'size': size, 'repeats': repeats, 'seconds': best,
+                          'median_seconds': statistics.median(seconds),
+                          'cells_per_second': size / best if best > 0 else float('inf'),
+                          'generations_per_second': None, 'peak_memory': peak}
+                if name.startswith('generation'):
+                    result['generations_per_second'] = 1 / best if best > 0 else float('inf')
+                results.append(result)
+                if callback is not None:
+                    callback(result)
+    return results
+
+def metadata(seed):
+    """Returns a dict describing this machine and run, to save with the results"""
+    return {'seed': seed, 'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def save(path, results, seed):
+    """Saves results as JSON: a dict of 'metadata' (see metadata) and 'results'"""
+    with open(path, 'w') as file:
+        json.dump({'metadata': metadata(seed), 'results': results}, file, indent = 1)
+
+def load(path):
+    """Returns the results saved in a file by save"""
+    with open(path) as file:
+        return json.load(file)['results']
+
+def key(result):
+    return (result['benchmark'], result['representation'], result['size'])
+
+def compare(results, baseline):
+    """
+    Compares results with the results of an earlier run
+    :param results: list of results
+    :param baseline: list of earlier results
+    :returns: dict of (benchmark, representation, size) to the speedup (earlier time /
+    time) of each benchmark in both
+    """
+    earlier = {key(result): result['seconds'] for result in baseline}
+    return {key(result): earlier[key(result)] / result['seconds']
+            for result in results if key(result) in earlier and result['seconds'] > 0}
+
+def format_result(result):
+    representation = f" {result['representation']}" if result['representation'] else ''
+    line = (f"{result['benchmark']}{representation} x {result['size']}: {result['seconds'] * 1000:.2f} ms, "
+            f"{result['cells_per_second']:.4g} cells/s")
+    if result['generations_per_second'] is not None:
+        line += f", {result['generations_per_second']:.4g} generations/s"
+    return line + f", peak memory {result['peak_memory'] / 2 ** 20:.1f} MiB"
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog = 'python3 -m BactSim.Benchmark',
+                                     description = 'Time the hot paths of a simulation')
+    parser.add_argument('-b', '--benchmarks', nargs = '+', choices = BENCHMARKS, default = None,
+                        help = 'benchmarks to run (default: all)')
+    parser.add_argument('--sizes', type = int, nargs = '+', default = list(SIZES),
+                        help = 'population sizes (default: 100 1000 10000 100000 1000000)')
+    parser.add_argument('--representations', nargs = '+', choices = REPRESENTATIONS, default = list(REPRESENTATIONS),
+                        help = 'representations of the cells (default: all)')
+    parser.add_argument('-r', '--repeats', type = int, default = 3,
+                        help = 'number of times to time each benchmark (default: 3)')
+    parser.add_argument('-s', '--seed', type = int, default = 0,
+                        help = 'seed of the populations and simulators (default: 0)')
+    parser.add_argument('--max-object-cells', type = int, default = 10000,
+                        help = 'largest list of Bacteria or CompactBacteria to benchmark (default: 10000)')
+    parser.add_argument('-o', '--output', default = None,
+                        help = 'JSON file to save the results to (default: none)')
+    parser.add_argument('-c', '--compare', default = None,
+                        help = 'JSON file of earlier results to compare with')
+    return parser
+
+def main(argv = None):
+    args = make_parser().parse_args(argv)
+    baseline = None if args.compare is None else load(args.compare)
+
+    def report(result):
+        print(format_result(result), flush = True)
+
+    try:
+        results = run_benchmarks(args.benchmarks, args.sizes, args.representations, args.repeats,
+                                 args.seed, args.max_object_cells, report)
+    except ValueError as e:
+        sys.exit(str(e))
+    if args.output is not None:
+        save(args.output, results, args.seed)
+    if baseline is not None:
+        print(f'Compared with {args.compare} (speedup = earlier time / time):')
+        for (name, representation, size), speedup in compare(results, baseline).items():
+            print(f"{name}{' ' + representation if representation else ''} x {size}: {speedup:.2f}x")
+    return results
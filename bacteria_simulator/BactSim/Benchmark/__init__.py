@@ -0,0 +1 @@
+from BactSim.Benchmark.Benchmark import run_benchmarks, compare, main
@@ -0,0 +1,3 @@
+from BactSim.Benchmark.Benchmark import main
+
+main()
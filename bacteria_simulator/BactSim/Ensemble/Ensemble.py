@@ -0,0 +1,226 @@
+"""
+Independent replicate simulations, run in parallel.
+
+    python3 -m BactSim.Ensemble --replicates 20 --generations 2000 --seed 1 --output-dir runs
+
+runs 20 replicates of an IntSimulator with make_basic_bacteria and FoodGenerator in a pool of
+processes. A grid of parameter settings can be given instead of (or as well as) replicates,
+eg. `--food-unit 1 10 --evo-sd 0.1 0.2` runs every combination. Each run gets its own random
+stream (from np.random.SeedSequence(seed).spawn), so the whole ensemble, and every single run
+in it, can be reproduced from the seed. Each run writes its own run log, and the runs of each
+setting are combined into a summary run log of the mean and standard deviation across
+replicates of every column, for every generation. Run it from the bacteria_simulator directory.
+"""
+import argparse
+import itertools
+import os
+import sys
+from multiprocessing import Pool
+import numpy as np
+
+from BactSim.Batch import make_simulator, run
+from BactSim.Batch.Batch import REPRESENTATIONS
+from BactSim.RunLog import RunLogWriter, RunLogReader
+
+# parameters which can be varied, and whether they are a parameter of the simulator (True) or
+# of the bacteria (False)
+PARAMETERS = {'food_unit': True, 'survival_atp': False, 'repro_atp': False, 'evo_sd': False}
+
+class Aggregate(object):
+    """
+    Per-generation mean and standard deviation of the run log columns of the replicates of
+    one parameter setting, updated as each run finishes. Runs which die out early only count
+    towards the generations they reached, and NaN values (eg. the weights once a population
+    has died out) are left out.
+    """
+
+    def __init__(self, columns):
+        """
+        :param columns: run log columns of the runs
+        """
+        self.columns = list(columns)
+        self.runs = 0
+        # number of runs which reached each generation, number of values of each column in
+        # each generation, and sums of each column
+        self.replicates = np.zeros(0, dtype = int)
+        self.count = np.zeros((0, len(self.columns)), dtype = int)
+        self.sum = np.zeros((0, len(self.columns)))
+        self.sum_sq = np.zeros((0, len(self.columns)))
+
+    def add(self, rows):
+        """
+        Adds a finished run
+        :param rows: array (generations x columns) of its run log
+        """
+        rows = np.asarray(rows)
+        if len(rows) > len(self.replicates):
+            extra = len(rows) - len(self.replicates)
+            self.replicates = np.concatenate((self.replicates, np.zeros(extra, dtype = int)))
+            self.count = np.vstack((self.count, np.zeros((extra, len(self.columns)), dtype = int)))
+            self.sum = np.vstack((self.sum, np.zeros((extra, len(self.columns)))))
+            self.sum_sq = np.vstack((self.sum_sq, np.zeros((extra, len(self.columns)))))
+        valid = ~np.isnan(rows)
+        rows = np.where(valid, rows, 0)
+        self.runs += 1
+        self.replicates[:len(rows)] += 1
+        self.count[:len(rows)] += valid
+        self.sum[:len(rows)] += rows
+        self.sum_sq[:len(rows)] += np.square(rows)
+
+    def mean(self):
+        """Returns an array (generations x columns) of the mean of each column (NaN if no values)"""
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            return self.sum / self.count
+
+    def sd(self):
+        """Returns an array (generations x columns) of the standard deviation of each column"""
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            return np.sqrt(np.maximum(self.sum_sq / self.count - np.square(self.mean()), 0))
+
+    def save(self, path, metadata = None):
+        """
+        Writes a run log with the columns 'replicates' (number of runs which reached each
+        generation), 'mean:<column>' and 'sd:<column>'
+        """
+        columns = ['replicates'] + [f'mean:{name}' for name in self.columns] + [f'sd:{name}' for name in self.columns]
+        with RunLogWriter(path, columns, dict(metadata or {}, runs = self.runs)) as log:
+            for row in np.column_stack((self.replicates, self.mean(), self.sd())):
+                log.write(row)
+
+def make_settings(replicates = 1, **grid):
+    """
+    Returns the list of runs of an ensemble
+    :param replicates: (default: 1) number of runs of each parameter setting
+    :param grid: lists of values of parameters (see PARAMETERS), eg. food_unit = [1, 10]. Every
+    combination is run.
+    :returns: list of (setting number, replicate number, dict of parameters)
+    :raises: ValueError for an unknown parameter
+    """
+    for name in grid:
+        if name not in PARAMETERS:
+            raise ValueError(f'Unknown parameter {name}, must be one of {", ".join(PARAMETERS)}')
+    names = list(grid)
+    settings = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    return [(i, replicate, params) for (i, params) in enumerate(settings) for replicate in range(replicates)]
+
+def run_replicate(task):
+    """
+    Runs one simulation of an ensemble, in a worker process
+    :param task: dict of 'run' (number of the run), 'params' (parameters, see PARAMETERS),
+    'seed' (np.random.SeedSequence of the run), 'output' (run log file) and the other
+    arguments of run_ensemble
+    :returns: tuple of (task, result of BactSim.Batch.run, array (generations x columns) of
+    the run log)
+    """
+    params = task['params']
+    simulator = make_simulator(task['bacteria_factory'], task['food_generator'],
+                               representation = task['representation'], cores = 1,
+                               food_unit = params.get('food_unit', task['food_unit']),
+                               bacteria_params = {name: value for (name, value) in params.items()
+                                                  if not PARAMETERS[name]},
+                               seed = task['seed'])
+    metadata = {'params': params, 'run': task['run'], 'seed': task['seed'].entropy,
+                'spawn_key': list(task['seed'].spawn_key)}
+    with simulator:
+        result = run(simulator, task['generations'], task['output'], metadata)
+    return task, result, np.array(RunLogReader(task['output']).rows)
+
+def run_ensemble(generations, output_dir, replicates = 1, grid = None, seed = None,
+                 bacteria_factory = 'make_basic_bacteria', food_generator = 'FoodGenerator',
+                 food_unit = 1, representation = 'bacteria', processes = None, callback = None):
+    """
+    Runs independent simulations with IntSimulator in a pool of processes
+    :param generations: number of generations of each run
+    :param output_dir: directory for the run logs. Run n of setting s is written to
+    run_<s>_<n>.bslog, and the summary of setting s to summary_<s>.bslog (see Aggregate.save)
+
+    Optional parameters:
+    :param replicates: (default: 1) number of runs of each parameter setting
+    :param grid: (default: None) dict of parameter name to list of values (see make_settings)
+    :param seed: (default: random) seed of the ensemble
+    :param bacteria_factory, food_generator, food_unit, representation: see
+    BactSim.Batch.make_simulator. The bacteria factory and food generator must be given by
+    name, or be importable by the worker processes.
+    :param processes: (default: number of CPUs) number of runs at once
+    :param callback: (default: None) called as callback(task, result, aggregate) in this
+    process when each run finishes, with the Aggregate of its setting
+    :returns: dict of setting number to (dict of parameters, Aggregate)
+    """
+    os.makedirs(output_dir, exist_ok = True)
+    runs = make_settings(replicates, **(grid or {}))
+    # with no seed, the random entropy is saved in the run logs so the runs can be repeated
+    seed_sequence = np.random.SeedSequence(seed)
+    seeds = seed_sequence.spawn(len(runs))
+    tasks = [{'run': n, 'setting': setting, 'replicate': replicate, 'params': params, 'seed': run_seed,
+              'output': os.path.join(output_dir, f'run_{setting}_{replicate}.bslog'),
+              'generations': generations, 'bacteria_factory': bacteria_factory,
+              'food_generator': food_generator, 'food_unit': food_unit,
+              'representation': representation}
+             for (n, ((setting, replicate, params), run_seed)) in enumerate(zip(runs, seeds))]
+
+    aggregates = {}
+    with Pool(processes = processes) as pool:
+        for (task, result, rows) in pool.imap_unordered(run_replicate, tasks):
+            setting = task['setting']
+            if setting not in aggregates:
+                columns = RunLogReader(task['output']).columns
+                aggregates[setting] = (task['params'], Aggregate(columns))
+            aggregate = aggregates[setting][1]
+            aggregate.add(rows)
+            if callback is not None:
+                callback(task, result, aggregate)
+
+    for setting, (params, aggregate) in aggregates.items():
+        aggregate.save(os.path.join(output_dir, f'summary_{setting}.bslog'),
+                       {'params': params, 'seed': seed_sequence.entropy})
+    return aggregates
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog = 'python3 -m BactSim.Ensemble',
+                                     description = 'Run independent bacteria simulations in parallel')
+    parser.add_argument('-g', '--generations', type = int, default = 10000,
+                        help = 'number of generations of each run (default: 10000)')
+    parser.add_argument('-r', '--replicates', type = int, default = 1,
+                        help = 'number of runs of each parameter setting (default: 1)')
+    parser.add_argument('-s', '--seed', type = int, default = None,
+                        help = 'random seed of the ensemble (default: random)')
+    parser.add_argument('-o', '--output-dir', default = 'ensemble',
+                        help = 'directory for the run logs (default: ensemble)')
+    parser.add_argument('-b', '--bacteria', default = 'make_basic_bacteria',
+                        help = 'function creating the initial bacterium (default: make_basic_bacteria)')
+    parser.add_argument('-f', '--food-generator', default = 'FoodGenerator',
+                        help = 'food generator class (default: FoodGenerator)')
+    parser.add_argument('--representation', choices = REPRESENTATIONS,
+                        default = 'bacteria', help = 'how the cells are simulated (default: bacteria)')
+    parser.add_argument('-p', '--processes', type = int, default = None,
+                        help = 'number of runs at once (default: number of CPUs)')
+    parser.add_argument('--food-unit', type = float, nargs = '+', default = [1],
+                        help = 'food unit(s) of the IntSimulator (default: 1)')
+    parser.add_argument('--survival-atp', type = float, nargs = '+',
+                        help = 'survival ATP value(s) of the bacteria (default: from the factory)')
+    parser.add_argument('--repro-atp', type = float, nargs = '+',
+                        help = 'reproduction ATP value(s) of the bacteria (default: from the factory)')
+    parser.add_argument('--evo-sd', type = float, nargs = '+',
+                        help = 'mutation standard deviation(s) of every edge (default: from the factory)')
+    return parser
+
+def main(argv = None):
+    args = make_parser().parse_args(argv)
+    grid = {name: getattr(args, name) for name in PARAMETERS if getattr(args, name) is not None}
+
+    def report(task, result, aggregate):
+        print(f"Run {task['run']} {task['params']} replicate {task['replicate']}: "
+              f"{result['generations']} generations, final population size {result['population']}, "
+              f"{result['generations_per_second']:.1f} generations/s")
+
+    try:
+        aggregates = run_ensemble(args.generations, args.output_dir, args.replicates, grid, args.seed,
+                                  args.bacteria, args.food_generator, representation = args.representation,
+                                  processes = args.processes, callback = report)
+    except ValueError as e:
+        sys.exit(str(e))
+    for setting, (params, aggregate) in sorted(aggregates.items()):
+        population = aggregate.mean()[-1, aggregate.columns.index('population')]
+        print(f'Setting {setting} {params}: {aggregate.runs} runs, mean final population size '
+              f'{population:.1f}, summary in {os.path.join(args.output_dir, f"summary_{setting}.bslog")}')
+    return aggregates
@@ -0,0 +1 @@
+from BactSim.Ensemble.Ensemble import Aggregate, make_settings, run_ensemble, main
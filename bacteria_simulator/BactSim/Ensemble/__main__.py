@@ -0,0 +1,3 @@
+from BactSim.Ensemble.Ensemble import main
+
+main()
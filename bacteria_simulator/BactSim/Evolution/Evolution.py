@@ -29,25 +29,64 @@ class Evolution(object):
         """
         return np.log(abs((1 / self.initial - 1) / (1 / weight - 1)))
 
-    def error(self):
+    def error(self, rng = None):
         """
         Generate error given sd
+        :param rng: (default: the global np.random state) np.random.Generator to draw from
         :return: error within self.sd
         """
-        return np.random.normal(scale=self.sd, size=1)
+        return (np.random if rng is None else rng).normal(scale=self.sd)
 
-    def getMutated(self):
+    def getMutated(self, rng = None):
         """
         Generate next mutated weight
-        :return: new weight with slight mutation from the previous weight
+        :param rng: (default: the global np.random state) np.random.Generator to draw from
+        :return: new weight (float) with slight mutation from the previous weight
         """
-        self.weight = self.evolve(self.inverse(self.weight) + self.error())
-        if (self.weight > 1):
-            self.weight = 1
-        if (self.weight < 0):
-            self.weight = 0
+        if type(self).batchable():
+            self.weight = Evolution.mutate(self.weight, self.initial, self.sd, rng)
+        else:
+            self.weight = float(np.clip(self.evolve(self.inverse(self.weight) + self.error(rng)), 0, 1))
         return self.weight
 
+    @classmethod
+    def batchable(cls):
+        """
+        Returns whether the weights of objects of this class can be mutated with mutate(), ie.
+        the class does not override evolve, inverse, error or getMutated
+        """
+        return all(getattr(cls, name) is getattr(Evolution, name)
+                   for name in ('evolve', 'inverse', 'error', 'getMutated'))
+
+    @staticmethod
+    def mutate(weights, initial, sd, rng = None):
+        """
+        Mutate many weights at once. Equivalent to calling getMutated() on an Evolution object
+        for each weight, but all the errors are drawn in one call. The arguments are broadcast
+        against each other, eg. weights can be an array (cells x edges) and initial and sd
+        arrays with one value per edge.
+        :param weights: current weights
+        :param initial: initial weights (see __init__)
+        :param sd: standard deviations of errors (see __init__)
+        :param rng: (default: the global np.random state) np.random.Generator to draw the
+        errors from. The errors are drawn in row-major order of the broadcast shape, so
+        mutating cells one at a time from the same Generator gives the same weights as
+        mutating them all at once.
+        :return: new weights, clipped to [0, 1]. A float if all the arguments are numbers,
+        otherwise a np.ndarray
+        """
+        weights, initial, sd = np.broadcast_arrays(np.asarray(weights, dtype=float),
+                                                   np.asarray(initial, dtype=float),
+                                                   np.asarray(sd, dtype=float))
+        A = 1 / initial - 1
+        errors = (np.random if rng is None else rng).normal(scale=sd, size=weights.shape)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            time = np.log(np.abs(A / (1 / weights - 1))) + errors
+            mutated = np.clip(1 / (A * np.exp(-time) + 1), 0, 1)
+        if mutated.ndim == 0:
+            return float(mutated)
+        return mutated
+
     def __str__(self):
         return f'SD: {self.sd} Current weight: {self.weight} Initial weight: {self.initial}'
 
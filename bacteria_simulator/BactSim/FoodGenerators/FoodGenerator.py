@@ -1,24 +1,43 @@
 import math
+import numpy as np
+
+from BactSim.FoodGenerators.Schedule import CHUNK_SIZE, check_range, schedule_chunks
 
 class FoodGenerator(object):
 
+    # names of the sugars, in the order of the columns of schedule
+    foods = ("glucose", "lactose", "sucrose")
+
     def __init__(self):
-        self.food = {"glucose": 0,
-                     "lactose": 0,
-                     "sucrose": 0}
+        self.food = dict.fromkeys(self.foods, 0)
         self.generation = 0
 
+    def schedule(self, start, stop):
+        """
+        Get the food available in generations start to stop - 1 at once
+        :return: array (stop - start x foods) of the amount of each sugar in each generation
+        """
+        check_range(start, stop)
+        rad = np.arange(start, stop) * math.pi / 180 / 0.2
+        schedule = np.empty((stop - start, len(self.foods)))
+        schedule[:, 0] = 500 * np.cos(rad) + 500  # glucose
+        schedule[:, 1] = 500 * np.cos(0.9 * rad) + 500  # lactose
+        schedule[:, 2] = 500 * np.sin(rad + 1.5 * math.pi) + 500  # sucrose
+        return schedule
+
+    def chunks(self, start = 0, stop = None, chunk_size = CHUNK_SIZE):
+        """See BactSim.FoodGenerators.Schedule.schedule_chunks"""
+        return schedule_chunks(self, start, stop, chunk_size)
+
     def getAvailable(self):
         """
         Get available food at current generation
-        :return: Dictionary of food, value pairs
+        :return: new dictionary of food, value pairs (self.food keeps the same amounts)
         """
-        rad = self.generation * math.pi / 180 / 0.2
-        self.food["glucose"] = 500 * math.cos(rad) + 500 #+ 500  # to generate the amount of glucose in generation self.generation
-        self.food["lactose"] = 500 * math.cos(0.9 * rad) + 500 #+ 500 to generate the amount of lactose in generation self.generation
-        self.food["sucrose"] = 500 * math.sin(rad + 1.5 * math.pi) + 500 # to generate the amount of sucrose in generation self.generation
+        row = self.schedule(self.generation, self.generation + 1)[0]
+        self.food = dict(zip(self.foods, row.tolist()))
         self.generation += 1
-        return self.food  # returns a dictionary of amounts of each type of sugar
+        return dict(self.food)  # returns a dictionary of amounts of each type of sugar
 
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+"""
+Food schedules: the food available in a range of generations as one array.
+
+Every food generator has a tuple `foods` of the names of its sugars and a method
+schedule(start, stop), which returns an array (stop - start x foods) of the amount of each
+sugar in generations start to stop - 1, computed at once. The schedule of a generator does not
+depend on its current generation, so it can be computed in advance and shared by any number
+of simulators, eg. the replicates of an ensemble:
+
+    schedule = FoodGenerator().schedule(0, 10000)
+    simulators = [IntSimulator(ScheduleGenerator(FoodGenerator.foods, schedule), make_bacteria())
+                  for _ in range(replicates)]
+
+schedule_chunks computes a long schedule lazily, a chunk of generations at a time.
+"""
+import numpy as np
+
+# default number of generations in each chunk of schedule_chunks
+CHUNK_SIZE = 4096
+
+def schedule_chunks(generator, start = 0, stop = None, chunk_size = CHUNK_SIZE):
+    """
+    Computes the schedule of a food generator lazily, a chunk of generations at a time
+    :param generator: food generator with a schedule method
+    :param start: (default: 0) first generation
+    :param stop: (default: None, never stop) generation to stop before
+    :param chunk_size: (default: CHUNK_SIZE) number of generations in each chunk
+    :returns: iterator of tuples of (first generation of the chunk, array (generations x
+    foods) of the amounts of food in the chunk)
+    :raises: ValueError if chunk_size is not positive
+    """
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be positive')
+    while stop is None or start < stop:
+        end = start + chunk_size if stop is None else min(start + chunk_size, stop)
+        yield start, generator.schedule(start, end)
+        start = end
+
+def check_range(start, stop):
+    """Raises ValueError unless 0 <= start <= stop"""
+    if start < 0 or stop < start:
+        raise ValueError(f'invalid range of generations {start} to {stop}')
+
+class ScheduleGenerator(object):
+    """
+    Food generator replaying a schedule computed in advance (see the module docstring). The
+    schedule is not copied, so simulators can share it.
+
+    Attributes
+    -----------
+    - foods (tuple) : names of the sugars, in the order of the columns of the schedule
+    - values (np.ndarray) : amount of each sugar in each generation
+    - food (dict) : amount of each sugar in the last generation returned by getAvailable
+    - generation (int) : next generation getAvailable returns
+    """
+
+    def __init__(self, foods, values):
+        """
+        :param foods: names of the sugars
+        :param values: array (generations x foods) of the amount of each sugar in each
+        generation, eg. the schedule of another generator
+        :raises: ValueError if values is not an array with a column for each sugar
+        """
+        self.foods = tuple(foods)
+        if np.ndim(values) != 2 or np.shape(values)[1] != len(self.foods):
+            raise ValueError(f'the schedule must have a column for each of {len(self.foods)} foods')
+        self.values = values
+        self.food = dict.fromkeys(self.foods, 0)
+        self.generation = 0
+
+    @classmethod
+    def from_generator(cls, generator, generations):
+        """
+        Returns a ScheduleGenerator replaying the first generations of another food generator
+        :param generator: food generator with a schedule method
+        :param generations: number of generations to compute
+        """
+        return cls(generator.foods, generator.schedule(0, generations))
+
+    def __len__(self):
+        """Number of generations in the schedule"""
+        return len(self.values)
+
+    def schedule(self, start, stop):
+        """
+        Returns the amount of each sugar in generations start to stop - 1, as a view of the
+        schedule
+        :raises: ValueError if the range is not in the schedule
+        """
+        check_range(start, stop)
+        if stop > len(self.values):
+            raise ValueError(f'the schedule only has {len(self.values)} generations')
+        return self.values[start:stop]
+
+    def chunks(self, start = 0, stop = None, chunk_size = CHUNK_SIZE):
+        """See schedule_chunks. stop defaults to the end of the schedule."""
+        return schedule_chunks(self, start, len(self.values) if stop is None else stop, chunk_size)
+
+    def getAvailable(self):
+        """
+        Get available food at current generation
+        :return: new dictionary of food, value pairs
+        :raises: ValueError after the end of the schedule
+        """
+        row = self.schedule(self.generation, self.generation + 1)[0]
+        self.food = dict(zip(self.foods, row.tolist()))
+        self.generation += 1
+        return dict(self.food)
@@ -1,5 +1,6 @@
-import math
+import numpy as np
 
+from BactSim.FoodGenerators.Schedule import CHUNK_SIZE, check_range, schedule_chunks
 
 default_food = {"glucose":1000,
                 "sucrose":5000,
@@ -8,8 +9,23 @@ default_food = {"glucose":1000,
 class StaticGenerator(object):
 
     def __init__(self, food = default_food):
-        self.food = food
+        # copied, so that neither the caller's dict nor default_food is shared
+        self.food = dict(food)
+        self.foods = tuple(self.food)
         self.generation = 0
 
+    def schedule(self, start, stop):
+        """
+        Get the food available in generations start to stop - 1 at once
+        :return: array (stop - start x foods) of the amount of each sugar in each generation
+        """
+        check_range(start, stop)
+        return np.tile(np.array([self.food[food] for food in self.foods], dtype=float), (stop - start, 1))
+
+    def chunks(self, start = 0, stop = None, chunk_size = CHUNK_SIZE):
+        """See BactSim.FoodGenerators.Schedule.schedule_chunks"""
+        return schedule_chunks(self, start, stop, chunk_size)
+
     def getAvailable(self):
-        return self.food  # returns a dictionary of amounts of each type of sugar
+        self.generation += 1
+        return dict(self.food)  # returns a dictionary of amounts of each type of sugar
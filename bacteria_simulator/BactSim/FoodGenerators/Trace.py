@@ -0,0 +1,165 @@
+"""
+Food generator replaying a measured food trace from a file, through a memory map, so that
+traces of millions of generations are read a generation (or a chunk, see
+BactSim.FoodGenerators.Schedule) at a time instead of being loaded.
+
+A trace is a table of the amount of each sugar at each sample, stored either
+- in columns: a directory with a .npy file of the samples of each sugar (eg. glucose.npy),
+which is what save_trace writes,
+- as a .npy file of a 2-D array (samples x sugars), or
+- as a raw binary file of the samples (samples x sugars, row-major) of a given dtype.
+
+Each sample lasts `step` generations. Between samples, the amounts are held at the last
+sample, or interpolated linearly. After the last sample, the trace starts again if it loops;
+otherwise asking for food raises ValueError.
+
+    generator = TraceGenerator('trace', loop = True)
+    simulator = IntSimulator(generator, bacteria)
+"""
+import math
+import os
+import numpy as np
+
+from BactSim.FoodGenerators.Schedule import CHUNK_SIZE, check_range, schedule_chunks
+
+def save_trace(directory, trace):
+    """
+    Saves a food trace in columns (see the module docstring)
+    :param directory: directory to save the trace to (created if it does not exist)
+    :param trace: dict of sugar to 1-D array of its amount at each sample, all the same
+    length
+    :raises: ValueError if the arrays are not all 1-D and the same length
+    """
+    lengths = {np.shape(samples) for samples in trace.values()}
+    if len(lengths) != 1 or len(next(iter(lengths))) != 1:
+        raise ValueError('the samples of every sugar must be 1-D arrays of the same length')
+    os.makedirs(directory, exist_ok=True)
+    for food, samples in trace.items():
+        np.save(os.path.join(directory, f'{food}.npy'), np.asarray(samples))
+
+def open_trace(path, foods = None, dtype = 'float64'):
+    """
+    Memory-maps a food trace (see the module docstring)
+    :param path: directory of a trace in columns, .npy file or raw binary file
+    :param foods: names of the sugars, in the order of the columns of a .npy or raw file.
+    Required for those; for a directory, the sugars to read (default: every .npy file in it,
+    in alphabetical order)
+    :param dtype: (default: float64) dtype of the samples of a raw file
+    :returns: tuple of (tuple of sugars, list of 1-D memory-mapped arrays of their samples)
+    :raises: ValueError if the trace is not a table with a column for each sugar
+    """
+    path = os.fspath(path)
+    if os.path.isdir(path):
+        if foods is None:
+            foods = sorted(name[:-len('.npy')] for name in os.listdir(path) if name.endswith('.npy'))
+        columns = [np.load(os.path.join(path, f'{food}.npy'), mmap_mode='r') for food in foods]
+    else:
+        if foods is None:
+            raise ValueError('the foods of a .npy or raw trace must be given')
+        if path.endswith('.npy'):
+            table = np.load(path, mmap_mode='r')
+        else:
+            table = np.memmap(path, dtype=dtype, mode='r')
+            if len(table) % len(foods):
+                raise ValueError(f'the size of {path} is not a multiple of {len(foods)} samples')
+            table = table.reshape(-1, len(foods))
+        if table.ndim != 2 or table.shape[1] != len(foods):
+            raise ValueError(f'{path} must have a column for each of {len(foods)} foods')
+        columns = [table[:, j] for j in range(len(foods))]
+
+    if not foods:
+        raise ValueError(f'{path} has no foods')
+    if any(column.ndim != 1 or len(column) != len(columns[0]) for column in columns):
+        raise ValueError(f'the columns of {path} must be 1-D and the same length')
+    if len(columns[0]) == 0:
+        raise ValueError(f'{path} has no samples')
+    return tuple(foods), columns
+
+class TraceGenerator(object):
+    """
+    Food generator replaying a food trace (see the module docstring)
+
+    Attributes
+    -----------
+    - foods (tuple) : names of the sugars, in the order of the columns of schedule
+    - samples (int) : number of samples in the trace
+    - step (float) : generations each sample lasts
+    - interpolate (bool) : whether the amounts between samples are interpolated linearly
+    - loop (bool) : whether the trace starts again after its end
+    - generations (int) : number of generations before the trace ends (None if it loops)
+    - food (dict) : amount of each sugar in the last generation returned by getAvailable
+    - generation (int) : next generation getAvailable returns
+    """
+
+    def __init__(self, path, foods = None, dtype = 'float64', step = 1, interpolate = False, loop = False):
+        """
+        :param path, foods, dtype: see open_trace
+        :param step: (default: 1) generations each sample lasts
+        :param interpolate: (default: False) interpolate linearly between samples instead of
+        holding each sample for step generations. The last sample is interpolated with the
+        first one if the trace loops.
+        :param loop: (default: False) start the trace again after its end
+        :raises: ValueError for an invalid trace or step
+        """
+        if step <= 0:
+            raise ValueError('step must be positive')
+        self.foods, self.columns = open_trace(path, foods, dtype)
+        self.samples = len(self.columns[0])
+        self.step = step
+        self.interpolate = interpolate
+        self.loop = loop
+        if loop:
+            self.generations = None
+        elif interpolate:
+            # generation g is at sample g / step, which must be at most the last sample
+            self.generations = math.floor((self.samples - 1) * step) + 1
+        else:
+            self.generations = math.ceil(self.samples * step)
+        self.food = dict.fromkeys(self.foods, 0)
+        self.generation = 0
+
+    def schedule(self, start, stop):
+        """
+        Get the food available in generations start to stop - 1 at once, reading only the
+        samples they need from the trace
+        :return: array (stop - start x foods) of the amount of each sugar in each generation
+        :raises: ValueError if the trace ends before stop
+        """
+        check_range(start, stop)
+        if self.generations is not None and stop > self.generations:
+            raise ValueError(f'the food trace ends after {self.generations} generations')
+        position = np.arange(start, stop) / self.step
+        if self.loop:
+            position %= self.samples
+        below = np.minimum(position.astype(np.int64), self.samples - 1)
+        schedule = np.empty((stop - start, len(self.foods)))
+        if not self.interpolate:
+            for j, column in enumerate(self.columns):
+                schedule[:, j] = column[below]
+            return schedule
+
+        above = below + 1
+        if self.loop:
+            above %= self.samples
+        else:
+            np.minimum(above, self.samples - 1, out=above)
+        fraction = position - below
+        for j, column in enumerate(self.columns):
+            schedule[:, j] = column[below] * (1 - fraction) + column[above] * fraction
+        return schedule
+
+    def chunks(self, start = 0, stop = None, chunk_size = CHUNK_SIZE):
+        """See BactSim.FoodGenerators.Schedule.schedule_chunks. stop defaults to the end of the
+        trace (or never, if it loops)."""
+        return schedule_chunks(self, start, self.generations if stop is None else stop, chunk_size)
+
+    def getAvailable(self):
+        """
+        Get available food at current generation
+        :return: new dictionary of food, value pairs
+        :raises: ValueError after the end of a trace which does not loop
+        """
+        row = self.schedule(self.generation, self.generation + 1)[0]
+        self.food = dict(zip(self.foods, row.tolist()))
+        self.generation += 1
+        return dict(self.food)
@@ -1,2 +1,4 @@
 from BactSim.FoodGenerators.FoodGenerator import FoodGenerator
 from BactSim.FoodGenerators.Static import StaticGenerator
+from BactSim.FoodGenerators.Schedule import ScheduleGenerator, schedule_chunks
+from BactSim.FoodGenerators.Trace import TraceGenerator, save_trace
@@ -0,0 +1,181 @@
+import numpy as np
+from BactSim.Evolution import Evolution
+from BactSim.Population.Population import Population
+
+class CohortPopulation(Population):
+    """
+    A Population where each row is a cohort of identical cells: cells with the same node
+    amounts and edge weights are stored once, with the number of cells in `counts`. Cells of a
+    cohort behave the same way in every timestep, so survive() is run once per cohort, and a
+    cohort is only split when its cells stop being identical:
+
+    - replicate(): the daughter cells of a cohort are only split into one cohort per cell when
+    their edges mutate (ie. some edge has an evolution sd other than 0)
+    - split(): used by IntSimulator to give some cells of a cohort an extra unit of food
+
+    replicate() merges cohorts which have become identical again before dividing them, so
+    with evo_sd = 0 the number of cohorts stays small however large the population grows.
+
+    len() is the number of cells, like a Population; the number of cohorts is num_cohorts.
+    The ids, generations and timesteps of a cohort are those of one of its cells, and a
+    cohort's cells share its last_food.
+
+        population = CohortPopulation.from_bacteria([make_basic_bacteria(1)])
+        simulator = IntSimulator(food_source, population)
+
+    Attributes (see Population for the others)
+    -----------
+    - counts (np.ndarray of int, cohorts) : number of cells in each cohort
+    """
+
+    def __init__(self, topology, amounts, weights, ids = None, generations = None, timesteps = None,
+                 last_food = None, counts = None):
+        """
+        See Population.__init__
+        :param counts: (default: all 1) array of the number of cells in each cohort
+        """
+
+        super().__init__(topology, amounts, weights, ids, generations, timesteps, last_food)
+        size = len(self.amounts)
+        self.counts = np.ones(size, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        if len(self.counts) != size:
+            raise ValueError('counts must have one value per cohort')
+
+    def __len__(self):
+        return int(self.counts.sum())
+
+    @property
+    def num_cohorts(self):
+        return len(self.amounts)
+
+    def expand(self):
+        """
+        Returns a Population with one row for every cell. The cells of a cohort share its id.
+        """
+
+        rows = np.repeat(np.arange(self.num_cohorts), self.counts)
+        return Population.select(self, rows)
+
+    def to_bacteria(self, compact = False):
+        """
+        Creates a Bacteria object for every cell in this population (see Population.to_bacteria)
+        """
+
+        return self.expand().to_bacteria(compact)
+
+    def merge(self):
+        """
+        Combines the cohorts with the same node amounts and edge weights. The merged cohort
+        keeps the id, generation, timestep and last food of the first of them.
+
+        :returns: a CohortPopulation (this one if no cohorts are the same)
+        """
+
+        state = np.hstack((self.amounts, self.weights))
+        _, first, inverse = np.unique(state, axis=0, return_index=True, return_inverse=True)
+        if len(first) == self.num_cohorts:
+            return self
+        counts = np.zeros(len(first), dtype=np.int64)
+        np.add.at(counts, inverse.ravel(), self.counts)
+        # keep the cohorts in the order they first appear
+        order = np.argsort(first)
+        merged = self.select(first[order])
+        merged.counts = counts[order]
+        return merged
+
+    def split(self, counts):
+        """
+        Splits each cohort into a cohort of the given number of its cells and a cohort of the
+        rest. Empty cohorts are left out.
+
+        :param counts: array of the number of cells to split off each cohort (0 to counts)
+        :returns: tuple of (new CohortPopulation, array of the index of the cohort of this
+        population each new cohort comes from, bool array of whether each new cohort is
+        the part which was split off)
+        """
+
+        counts = np.asarray(counts, dtype=np.int64)
+        parts = np.column_stack((counts, self.counts - counts)).ravel()
+        keep = parts > 0
+        rows = np.repeat(np.arange(self.num_cohorts), 2)[keep]
+        split_off = np.tile([True, False], self.num_cohorts)[keep]
+        new_population = self.select(rows)
+        new_population.counts = parts[keep]
+        return new_population, rows, split_off
+
+    def select(self, cells):
+        """
+        Returns a new population with only the given cohorts.
+
+        :param cells: bool array (eg. from survive) or array of cohort indices
+        :returns: a CohortPopulation
+        """
+
+        last_food = None
+        if self.last_food is not None:
+            last_food = {food: amounts[cells] for (food, amounts) in self.last_food.items()}
+        return CohortPopulation(self.topology, self.amounts[cells], self.weights[cells],
+                                ids = self.ids[cells],
+                                generations = self.generations[cells],
+                                timesteps = self.timesteps[cells],
+                                last_food = last_food,
+                                counts = self.counts[cells])
+
+    def replicate(self, first_id, streams = None, generation = 0):
+        """
+        Every cell that can reproduce divides (see Bacteria.divide); the others are removed.
+        The new population has the parent cohorts first, followed by the daughter cohorts.
+        The daughter cells are numbered in the order of their parent cohorts, and get the
+        same mutations from the same streams as the daughter cells of a Population with one
+        row per cell in that order.
+
+        :param first_id: ID of the first daughter cell. The next daughter cells (or cohorts)
+        get first_id + 1, first_id + 2...
+        :param streams: (default: the global np.random state) RandomStreams to draw the
+        mutations of the daughter cells from (see BactSim.Random.RandomStreams)
+        :param generation: (default: 0) generation number, which selects the streams
+        :returns: a new CohortPopulation with the parent and daughter cells
+        """
+
+        cohorts = self.merge()
+        parents = cohorts.select(cohorts.can_reproduce())
+        parents.amounts /= 2
+        num_daughters = len(parents)
+
+        topology = self.topology
+        if not np.any(topology.evo_sd):
+            # the daughter cells are identical to their parents: one cohort for each parent cohort
+            daughters = parents.select(np.arange(parents.num_cohorts))
+            daughters.ids = first_id + np.cumsum(parents.counts) - parents.counts
+        else:
+            daughters = parents.select(np.repeat(np.arange(parents.num_cohorts), parents.counts))
+            daughters.counts[:] = 1
+            daughters.ids = np.arange(first_id, first_id + num_daughters)
+            if streams is None:
+                daughters.weights = Evolution.mutate(daughters.weights, topology.evo_initial, topology.evo_sd)
+            else:
+                for (start, stop, rng) in streams.mutation_blocks(generation, 0, num_daughters):
+                    daughters.weights[start:stop] = Evolution.mutate(daughters.weights[start:stop],
+                                                                     topology.evo_initial, topology.evo_sd, rng)
+        daughters.generations += 1
+        return concatenate(parents, daughters)
+
+    def __str__(self):
+        return f'CohortPopulation of {len(self)} cells in {self.num_cohorts} cohorts, {self.topology}'
+
+    __repr__ = __str__
+
+def concatenate(first, second):
+    """Returns a CohortPopulation of the cohorts of 2 populations with the same topology"""
+
+    last_food = None
+    if first.last_food is not None and second.last_food is not None:
+        last_food = {food: np.concatenate((amounts, second.last_food[food]))
+                     for (food, amounts) in first.last_food.items()}
+    return CohortPopulation(first.topology, np.vstack((first.amounts, second.amounts)),
+                            np.vstack((first.weights, second.weights)),
+                            ids = np.concatenate((first.ids, second.ids)),
+                            generations = np.concatenate((first.generations, second.generations)),
+                            timesteps = np.concatenate((first.timesteps, second.timesteps)),
+                            last_food = last_food,
+                            counts = np.concatenate((first.counts, second.counts)))
@@ -0,0 +1,349 @@
+import copy
+import numpy as np
+from BactSim.Bacteria.Bacteria import Bacteria
+from BactSim.Bacteria.CompactBacteria import CompactBacteria
+from BactSim.Evolution import Evolution
+
+class Population(object):
+    """
+    A population of bacteria which all share the same topology, stored as arrays so that
+    a timestep can be run for every cell at once.
+
+    The simulation functions (next_timestep, survive, ...) give the same results as calling
+    the corresponding Bacteria function on every cell, but work on the whole population.
+
+    Attributes
+    -----------
+    - topology (BactSim.Bacteria.Topology) : structure shared by every cell
+    - amounts (np.ndarray, cells x nodes) : amount of each node in each cell. Columns are
+    ordered like `topology.nodes`.
+    - weights (np.ndarray, cells x edges) : weight of each edge in each cell. Columns are
+    ordered like `topology.edges`.
+    - ids, generations, timesteps (np.ndarray, cells) : see the Bacteria attributes of the
+    same names (timestep is called age in the Bacteria docs)
+    - last_food (None or dict) : dict of food name to an array of the amount fed to each cell
+    in the last timestep, or None if the population has not been given any food before.
+
+    The constructor parameters of the bacteria (survival_atp, penalize_edges, ...) are
+    available as attributes too, eg. `population.survival_atp`.
+    """
+
+    def __init__(self, topology, amounts, weights, ids = None, generations = None, timesteps = None,
+                 last_food = None):
+        """
+        :param topology: Topology of every cell
+        :param amounts: array (cells x nodes) of node amounts
+        :param weights: array (cells x edges) of edge weights
+
+        Float arrays of the right shape are used as they are, not copied, so a population can
+        work directly on (part of) an existing array.
+
+        Optional parameters:
+        :param ids: (default: 0, 1, 2...) array of cell ids
+        :param generations: (default: all 0) array of cell generations
+        :param timesteps: (default: all 0) array of cell ages
+        :param last_food: (default: None) dict of food name to array of the last food of each cell
+        """
+
+        self.topology = topology
+        self.amounts = np.asarray(amounts, dtype=float).reshape(-1, topology.num_nodes)
+        self.weights = np.asarray(weights, dtype=float).reshape(-1, topology.num_edges)
+        size = len(self.amounts)
+        if len(self.weights) != size:
+            raise ValueError('amounts and weights must have the same number of cells')
+
+        self.ids = np.arange(size) if ids is None else np.asarray(ids)
+        self.generations = np.zeros(size, dtype=int) if generations is None else np.asarray(generations)
+        self.timesteps = np.zeros(size, dtype=int) if timesteps is None else np.asarray(timesteps)
+        self.last_food = last_food
+
+    @classmethod
+    def from_bacteria(cls, bacteria, topology = None):
+        """
+        Creates a population from Bacteria or CompactBacteria objects. All bacteria must have
+        the same nodes and edges, added in the same order (eg. descendants of the same
+        make_basic_bacteria cell). Customized survive functions (see Bacteria.survive) are not
+        carried over.
+
+        :param bacteria: list of Bacteria or CompactBacteria
+        :param topology: (default: compiled from the first bacterium) Topology of the bacteria
+        :returns: a Population with the states of the bacteria
+        :raises: ValueError if bacteria is empty and no topology is given, or a bacterium has
+        a different structure
+        """
+
+        if topology is None:
+            if not bacteria:
+                raise ValueError('cannot compile a topology from an empty list of bacteria')
+            topology = bacteria[0].compile()
+
+        for bac in bacteria:
+            if not topology.matches(bac):
+                raise ValueError(f'Bacteria {bac.id} has a different structure from the population')
+
+        states = [bac.get_state() for bac in bacteria]
+        amounts = [amounts for (amounts, weights) in states]
+        weights = [weights for (amounts, weights) in states]
+
+        last_food = None
+        fed = [bac.last_food for bac in bacteria if bac.last_food is not None]
+        if len(fed) == len(bacteria) and fed:
+            last_food = {food: np.array([f[food] for f in fed], dtype=float) for food in fed[0]}
+
+        return cls(topology, amounts, weights,
+                   ids = [bac.id for bac in bacteria],
+                   generations = [bac.generation for bac in bacteria],
+                   timesteps = [bac.timestep for bac in bacteria],
+                   last_food = last_food)
+
+    def to_bacteria(self, compact = False):
+        """
+        Creates a Bacteria object for every cell in this population. Changes to the returned
+        bacteria do not affect this population.
+
+        :param compact: (default: False) whether to create CompactBacteria sharing this
+        population's topology instead of Bacteria
+        :returns: list of Bacteria or CompactBacteria
+        """
+
+        if compact:
+            return [self.make_compact_bacteria(i) for i in range(len(self))]
+        return [self.make_bacteria(i) for i in range(len(self))]
+
+    def make_compact_bacteria(self, i):
+        """
+        Creates a CompactBacteria with the state of the cell at index i.
+
+        :param i: index of the cell
+        :returns: a CompactBacteria
+        """
+
+        id = self.ids[i]
+        last_food = None
+        if self.last_food is not None:
+            last_food = {food: amounts[i].item() for (food, amounts) in self.last_food.items()}
+        return CompactBacteria(self.topology, self.amounts[i], self.weights[i],
+                               id.item() if isinstance(id, np.generic) else id,
+                               int(self.generations[i]), int(self.timesteps[i]), last_food)
+
+    def make_bacteria(self, i):
+        """
+        Creates a Bacteria object with the state of the cell at index i.
+
+        :param i: index of the cell
+        :returns: a Bacteria
+        """
+
+        topology = self.topology
+        id = self.ids[i]
+        bac = Bacteria(id.item() if isinstance(id, np.generic) else id, **topology.config)
+        bac.generation = int(self.generations[i])
+        bac.timestep = int(self.timesteps[i])
+        if self.last_food is not None:
+            bac.last_food = {food: amounts[i].item() for (food, amounts) in self.last_food.items()}
+
+        for n, name in enumerate(topology.nodes):
+            bac.graph.add_node(name, amount = self.amounts[i, n].item(), description = topology.node_descriptions[n])
+        for e, (src, dest) in enumerate(topology.edges):
+            weight = self.weights[i, e].item()
+            evolution = copy.copy(topology.evolutions[e])
+            evolution.weight = weight
+            bac.graph.add_edge(src, dest, weight = weight, atp_needed = topology.atp_needed[e].item(),
+                               evolution = evolution, scale = topology.scale[e].item(),
+                               description = topology.edge_descriptions[e])
+        return bac
+
+    def __getattr__(self, name):
+        # constructor parameters of the bacteria, eg. population.survival_atp
+        topology = self.__dict__.get('topology')
+        if topology is not None and name in topology.config:
+            return topology.config[name]
+        raise AttributeError(f"'Population' object has no attribute '{name}'")
+
+    def __len__(self):
+        return len(self.amounts)
+
+
+    ## Simulation functions: survival and reproduction ##
+
+    def is_alive(self):
+        """Returns a bool array of whether each cell is alive (see Bacteria.is_alive)"""
+
+        return self.amounts[:, self.topology.atp] >= self.survival_atp
+
+    def can_reproduce(self):
+        """Returns a bool array of whether each cell can reproduce (see Bacteria.can_reproduce)"""
+
+        return self.amounts[:, self.topology.atp] >= self.repro_atp
+
+    def set_food(self, food, record):
+        """
+        Set the food nodes in every cell to the given quantities.
+
+        :param food: dict of food name to amount, either a number (same for every cell) or an
+        array with one amount per cell
+        :param record: bool for whether to set `last_food` to the food given
+        """
+
+        node_index = self.topology.node_index
+        for (food_src, amount) in food.items():
+            self.amounts[:, node_index[food_src]] = amount
+        if record:
+            self.last_food = {food_src: np.broadcast_to(np.asarray(amount, dtype=float), (len(self.amounts),)).copy()
+                              for (food_src, amount) in food.items()}
+
+    def reset_nodes(self):
+        """Set the amounts of all nodes, except for ATP, to 0 in every cell."""
+
+        atp = self.amounts[:, self.topology.atp].copy()
+        self.amounts[:] = 0
+        self.amounts[:, self.topology.atp] = atp
+
+    def next_timestep(self):
+        """
+        Runs Bacteria.next_timestep for every cell. The edges are evaluated in the same order
+        as in Bacteria.next_timestep, with each edge evaluated for the whole population at once.
+        """
+
+        topology = self.topology
+        amounts = self.amounts
+        weights = self.weights
+        atp = topology.atp
+        self.timesteps += 1
+
+        # sum of weights of outgoing edges for each node
+        out_weights = np.zeros_like(amounts)
+        for e, src in enumerate(topology.src):
+            out_weights[:, src] += weights[:, e]
+
+        increase_by = np.zeros_like(amounts)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            for e, (src, dest) in enumerate(zip(topology.src, topology.dest)):
+                weight = weights[:, e]
+                src_available = amounts[:, src] * weight / out_weights[:, src]
+                src_used = weight * np.minimum(src_available, self.max_amount_per_step)
+                dest_produced = src_used * topology.scale[e]
+
+                amounts[:, src] -= src_used
+                increase_by[:, dest] += dest_produced
+                if self.penalize_edges:
+                    amounts[:, atp] -= topology.atp_needed[e] * np.maximum(dest_produced, weight)
+                else:
+                    amounts[:, atp] -= topology.atp_needed[e] * dest_produced
+
+        np.add(amounts, increase_by, out = amounts, where = increase_by > 0)
+
+    def survive(self, food):
+        """
+        Runs Bacteria.survive for every cell.
+
+        :param food: dict of food name to amount, either a number (same for every cell) or an
+        array with one amount per cell
+        :returns: a bool array of whether each cell survives
+        """
+
+        self.set_food(food, record = True)
+
+        self.next_timestep()
+        # reset food amount
+        if self.survive_reset_food:
+            zero_food = dict.fromkeys(food, 0)
+            self.set_food(zero_food, record = False)
+
+        # run remaining timesteps
+        for i in range(self.survive_num_timesteps - 1):
+            self.next_timestep()
+
+        if self.survive_reset_nodes:
+            self.reset_nodes()
+
+        return self.is_alive()
+
+    def select(self, cells):
+        """
+        Returns a new population with only the given cells.
+
+        :param cells: bool array (eg. from survive) or array of cell indices
+        :returns: a Population
+        """
+
+        last_food = None
+        if self.last_food is not None:
+            last_food = {food: amounts[cells] for (food, amounts) in self.last_food.items()}
+        return Population(self.topology, self.amounts[cells], self.weights[cells],
+                          ids = self.ids[cells],
+                          generations = self.generations[cells],
+                          timesteps = self.timesteps[cells],
+                          last_food = last_food)
+
+    def replicate(self, first_id, streams = None, generation = 0):
+        """
+        Every cell that can reproduce divides (see Bacteria.divide); the others are removed.
+        The cells are ordered like the list built by Simulator.replicate: each parent cell is
+        followed by its daughter cell.
+
+        :param first_id: ID of the first daughter cell. The next daughter cells get
+        first_id + 1, first_id + 2...
+        :param streams: (default: the global np.random state) RandomStreams to draw the
+        mutations of the daughter cells from (see BactSim.Random.RandomStreams)
+        :param generation: (default: 0) generation number, which selects the streams
+        :returns: a new Population with the parent and daughter cells
+        """
+
+        parents = np.flatnonzero(self.can_reproduce())
+        num_parents = len(parents)
+
+        new_population = self.select(np.repeat(parents, 2))
+        new_population.amounts /= 2
+
+        daughters = slice(1, None, 2)
+        new_population.ids = new_population.ids.astype(np.result_type(self.ids, int))
+        new_population.ids[daughters] = np.arange(first_id, first_id + num_parents)
+        new_population.generations[daughters] += 1
+
+        # evolve the weights of all the daughter cells (of each block of streams) at once
+        topology = self.topology
+        if streams is None:
+            new_population.weights[daughters] = Evolution.mutate(new_population.weights[daughters],
+                                                                 topology.evo_initial, topology.evo_sd)
+        else:
+            for (start, stop, rng) in streams.mutation_blocks(generation, 0, num_parents):
+                rows = slice(2 * start + 1, 2 * stop, 2)
+                new_population.weights[rows] = Evolution.mutate(new_population.weights[rows],
+                                                                topology.evo_initial, topology.evo_sd, rng)
+        return new_population
+
+
+    ## Getting node amounts and edge weights ##
+
+    def get_amounts(self, node):
+        """
+        Get the amount of a node in every cell.
+
+        :param node: name of node
+        :returns: array of its amount in each cell
+        :raises: ValueError if the node doesn't exist
+        """
+
+        if node in self.topology.node_index:
+            return self.amounts[:, self.topology.node_index[node]]
+        raise ValueError(f'No node called {node}')
+
+    def get_weights(self, src, dest):
+        """
+        Get the weight of an edge in every cell.
+
+        :param src: name of source node
+        :param dest: name of destination node
+        :returns: array of the weight in each cell
+        :raises: ValueError if the edge doesn't exist
+        """
+
+        if (src, dest) in self.topology.edge_index:
+            return self.weights[:, self.topology.edge_index[(src, dest)]]
+        raise ValueError(f'No edge from {src} to {dest}')
+
+    def __str__(self):
+        return f'Population of {len(self)} cells, {self.topology}'
+
+    __repr__ = __str__
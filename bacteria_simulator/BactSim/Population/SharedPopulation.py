@@ -0,0 +1,355 @@
+import math
+import os
+from collections import namedtuple
+from multiprocessing import Pool, shared_memory
+import numpy as np
+from BactSim.Evolution import Evolution
+from BactSim.Population.Population import Population
+from BactSim.Random import RandomStreams
+
+# state of each cell which is kept in shared memory: field name -> (dtype, columns per cell)
+FIELDS = {
+    'amounts': (np.float64, lambda topology: topology.num_nodes),
+    'weights': (np.float64, lambda topology: topology.num_edges),
+    'ids': (np.int64, None),
+    'generations': (np.int64, None),
+    'timesteps': (np.int64, None),
+}
+
+# everything another process needs to attach to a SharedArray
+ArraySpec = namedtuple('ArraySpec', ('name', 'shape', 'dtype'))
+
+class SharedArray(object):
+    """A numpy array in shared memory, which other processes can attach to using its spec"""
+
+    def __init__(self, shape, dtype):
+        dtype = np.dtype(dtype)
+        size = max(math.prod(shape) * dtype.itemsize, 1)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray(shape, dtype, buffer=self.shm.buf)
+        self.spec = ArraySpec(self.shm.name, tuple(shape), dtype.str)
+
+    def __len__(self):
+        return len(self.array)
+
+    def close(self):
+        """Frees the shared memory. The array must not be used afterwards."""
+        del self.array
+        self.shm.close()
+        self.shm.unlink()
+
+class SharedPopulation(Population):
+    """
+    A Population whose state is kept in shared memory and which uses a pool of worker
+    processes to replicate and survive. Each worker works on a range of cells in place, so
+    only small control messages (shared memory names and index ranges) are sent between the
+    processes, instead of pickled cells.
+
+    Unlike Population, replicate() and select() change this population in place and return
+    it, so a SharedPopulation can be given to Simulator or IntSimulator like a Population:
+
+        with SharedPopulation(Population.from_bacteria([make_basic_bacteria(1)])) as population:
+            simulator = IntSimulator(food_source, population)
+            ...
+
+    The amounts, weights, ids, generations and timesteps attributes are views of the shared
+    memory. They are only valid until the next call to replicate() or select().
+
+    Call close() (or use a `with` block) to stop the worker processes and free the shared
+    memory.
+    """
+
+    def __init__(self, population, cores = None, min_chunk_size = 4096):
+        """
+        :param population: Population to copy into shared memory. Its ids must be integers.
+
+        Optional parameters:
+        :param cores: (default: number of CPUs) number of worker processes
+        :param min_chunk_size: (default: 4096) minimum number of cells given to a worker at a
+        time. Populations smaller than this are simulated in this process.
+        """
+
+        self.topology = population.topology
+        self.last_food = population.last_food
+        self.cores = cores or os.cpu_count()
+        self.min_chunk_size = min_chunk_size
+        self.size = 0
+        self._pool = None
+
+        capacity = max(len(population), 1)
+        # 2 sets of state arrays: the current population, and space to write the next one
+        self._banks = [self._make_bank(capacity), self._make_bank(capacity)]
+        self._parents = SharedArray((capacity,), np.intp)
+        self._alive = SharedArray((capacity,), np.bool_)
+        self._food = SharedArray((capacity, 0), np.float64)
+
+        bank = self._banks[0]
+        for field in FIELDS:
+            bank[field].array[:len(population)] = getattr(population, field)
+        self.size = len(population)
+
+    def _make_bank(self, capacity):
+        bank = {}
+        for field, (dtype, columns) in FIELDS.items():
+            shape = (capacity,) if columns is None else (capacity, columns(self.topology))
+            bank[field] = SharedArray(shape, dtype)
+        return bank
+
+    def _reserve(self, index, capacity):
+        """Make sure bank number index can hold `capacity` cells"""
+        if len(self._banks[index]['ids']) < capacity:
+            for array in self._banks[index].values():
+                array.close()
+            self._banks[index] = self._make_bank(max(capacity, 2 * len(self._banks[0]['ids'])))
+
+    def _reserve_scratch(self, name, shape, dtype):
+        array = getattr(self, name)
+        capacity = len(array)
+        if capacity < shape[0] or array.array.shape[1:] != shape[1:]:
+            array.close()
+            array = SharedArray((max(shape[0], 2 * capacity),) + shape[1:], dtype)
+            setattr(self, name, array)
+        return array
+
+    def _swap(self, size):
+        self._banks.reverse()
+        self.size = size
+
+    def _chunks(self, size, multiple = 1):
+        """
+        Returns (start, stop) ranges which split range(size) between the workers. Every range
+        starts at a multiple of `multiple`.
+        """
+        chunk_size = max(math.ceil(size / (self.cores * 4)), self.min_chunk_size)
+        chunk_size = math.ceil(chunk_size / multiple) * multiple
+        return [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+
+    def _run(self, function, tasks):
+        """Calls function for each task (tuple of arguments, which may contain ArraySpecs)"""
+        if len(tasks) <= 1:
+            # not worth sending to the workers
+            arrays = {array.spec.name: array.array for array in self._shared_arrays()}
+            for task in tasks:
+                function(*_resolve(task, lambda spec: arrays[spec.name]), topology = self.topology)
+        else:
+            self.pool.starmap(_run_in_worker, [(function, task) for task in tasks])
+
+    def _shared_arrays(self):
+        for bank in self._banks:
+            yield from bank.values()
+        yield from (self._parents, self._alive, self._food)
+
+    @property
+    def pool(self):
+        """The pool of worker processes, which is started the first time it is used"""
+        if self._pool is None:
+            self._pool = Pool(processes = self.cores, initializer = _init_worker,
+                              initargs = (self.topology,))
+        return self._pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stops the worker processes and frees the shared memory"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        if self._banks is not None:
+            for array in self._shared_arrays():
+                array.close()
+            self._banks = None
+
+    def __len__(self):
+        return self.size
+
+    def to_population(self):
+        """Returns a copy of this population as a (not shared) Population"""
+        return Population(self.topology, self.amounts.copy(), self.weights.copy(),
+                          ids = self.ids.copy(), generations = self.generations.copy(),
+                          timesteps = self.timesteps.copy(),
+                          last_food = None if self.last_food is None else
+                          {food: amounts.copy() for (food, amounts) in self.last_food.items()})
+
+
+    ## Simulation functions: survival and reproduction ##
+
+    def survive(self, food):
+        """
+        Runs Bacteria.survive for every cell, split between the worker processes.
+
+        :param food: dict of food name to amount, either a number (same for every cell) or an
+        array with one amount per cell
+        :returns: a bool array of whether each cell survives
+        """
+
+        size = self.size
+        values = {name: float(amount) for (name, amount) in food.items() if np.ndim(amount) == 0}
+        columns = [name for name in food if name not in values]
+        food_array = self._reserve_scratch('_food', (size, len(columns)), np.float64)
+        for j, name in enumerate(columns):
+            food_array.array[:size, j] = food[name]
+        alive = self._reserve_scratch('_alive', (size,), np.bool_)
+
+        bank = {field: array.spec for (field, array) in self._banks[0].items()}
+        self._run(survive_cells, [(bank, food_array.spec, columns, values, alive.spec, start, stop)
+                                  for (start, stop) in self._chunks(size)])
+
+        self.last_food = {name: np.broadcast_to(np.asarray(amount, dtype=float), (size,)).copy()
+                          for (name, amount) in food.items()}
+        return alive.array[:size].copy()
+
+    def select(self, cells):
+        """
+        Keeps only the given cells.
+
+        :param cells: bool array (eg. from survive) or array of cell indices
+        :returns: this population
+        """
+
+        cells = np.asarray(cells)
+        if cells.dtype == np.bool_:
+            cells = np.flatnonzero(cells)
+        self._reserve(1, len(cells))
+        current, other = self._banks
+        for field in FIELDS:
+            np.take(current[field].array[:self.size], cells, axis = 0,
+                    out = other[field].array[:len(cells)])
+        if self.last_food is not None:
+            self.last_food = {food: amounts[cells] for (food, amounts) in self.last_food.items()}
+        self._swap(len(cells))
+        return self
+
+    def replicate(self, first_id, streams = None, generation = 0):
+        """
+        Same as Population.replicate, split between the worker processes. The cells are split
+        at the blocks of the random streams, so the result does not depend on the number of
+        workers.
+
+        :param first_id: ID of the first daughter cell
+        :param streams: (default: new streams seeded from np.random) RandomStreams to draw the
+        mutations of the daughter cells from
+        :param generation: (default: 0) generation number, which selects the streams
+        :returns: this population
+        """
+
+        parents = np.flatnonzero(self.can_reproduce())
+        num_parents = len(parents)
+        self._reserve(1, 2 * num_parents)
+        parents_array = self._reserve_scratch('_parents', (num_parents,), np.intp)
+        parents_array.array[:num_parents] = parents
+
+        if streams is None:
+            streams = RandomStreams()
+        current, other = ({field: array.spec for (field, array) in bank.items()} for bank in self._banks)
+        chunks = self._chunks(num_parents, streams.block_size)
+        self._run(replicate_cells, [(current, other, parents_array.spec, start, stop, first_id, streams, generation)
+                                    for (start, stop) in chunks])
+
+        if self.last_food is not None:
+            self.last_food = {food: np.repeat(amounts[parents], 2) for (food, amounts) in self.last_food.items()}
+        self._swap(2 * num_parents)
+        return self
+
+def _state_property(field):
+    def getter(self):
+        return self._banks[0][field].array[:self.size]
+
+    def setter(self, value):
+        # eg. `population.timesteps += 1` assigns the (already updated) view back
+        self._banks[0][field].array[:self.size] = value
+
+    return property(getter, setter, doc = f'{field} of each cell (view of the shared memory)')
+
+for _field in FIELDS:
+    setattr(SharedPopulation, _field, _state_property(_field))
+
+
+## Functions run by the worker processes ##
+
+# set by _init_worker in each worker process
+_topology = None
+# shared memory blocks this process has attached to, by name
+_attached = {}
+
+def _init_worker(topology):
+    global _topology
+    _topology = topology
+
+def _run_in_worker(function, task):
+    # detach from shared memory which is not used by this task (eg. after the parent
+    # process made a bigger array)
+    names = set()
+    arguments = _resolve(task, lambda spec: names.add(spec.name) or attach(spec))
+    for name in list(_attached):
+        if name not in names:
+            _attached.pop(name).close()
+    function(*arguments, topology = _topology)
+
+def _resolve(task, get_array):
+    """Replaces every ArraySpec in task (including in dicts) with get_array(spec)"""
+    arguments = []
+    for item in task:
+        if isinstance(item, ArraySpec):
+            item = get_array(item)
+        elif isinstance(item, dict):
+            item = dict(zip(item, _resolve(item.values(), get_array)))
+        arguments.append(item)
+    return arguments
+
+def attach(spec):
+    """Returns the numpy array in shared memory described by spec (see SharedArray.spec)"""
+    if spec.name not in _attached:
+        _attached[spec.name] = shared_memory.SharedMemory(name = spec.name)
+    return np.ndarray(spec.shape, spec.dtype, buffer = _attached[spec.name].buf)
+
+def survive_cells(state, food_array, columns, values, alive, start, stop, topology):
+    """
+    Runs survive for the cells in range(start, stop), in place.
+
+    :param state: dict of field name to array of the population state
+    :param food_array: array (cells x foods) of food for each cell
+    :param columns: names of the foods in the columns of food_array
+    :param values: dict of food name to the amount given to every cell
+    :param alive: bool array to write whether each cell survives to
+    :param topology: Topology of the cells
+    """
+    population = Population(topology, **{field: array[start:stop] for (field, array) in state.items()})
+    food = dict(values)
+    for j, name in enumerate(columns):
+        food[name] = food_array[start:stop, j]
+    alive[start:stop] = population.survive(food)
+
+def replicate_cells(current, new, parents, start, stop, first_id, streams, generation, topology):
+    """
+    Divides the parent cells parents[start:stop] of the current population, writing the parents
+    and their daughters to rows 2 * start to 2 * stop of the new population (see
+    Population.replicate).
+
+    :param current: dict of field name to array of the current population state
+    :param new: dict of field name to array to write the new population state to
+    :param parents: array of indices of the parent cells
+    :param first_id: ID of the daughter of parents[0]
+    :param streams: RandomStreams to mutate the daughter cells with. start must be at the
+    start of one of its blocks.
+    :param generation: generation number, which selects the streams
+    :param topology: Topology of the cells
+    """
+    parents = parents[start:stop]
+    rows = slice(2 * start, 2 * stop)
+    daughters = slice(2 * start + 1, 2 * stop, 2)
+
+    for field in FIELDS:
+        new[field][rows] = np.repeat(current[field][parents], 2, axis = 0)
+    new['amounts'][rows] /= 2
+    new['ids'][daughters] = np.arange(first_id + start, first_id + stop)
+    new['generations'][daughters] += 1
+
+    for (block_start, block_stop, rng) in streams.mutation_blocks(generation, start, stop):
+        rows = slice(2 * block_start + 1, 2 * block_stop, 2)
+        new['weights'][rows] = Evolution.mutate(new['weights'][rows], topology.evo_initial,
+                                                topology.evo_sd, rng)
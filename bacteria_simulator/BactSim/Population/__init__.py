@@ -0,0 +1,3 @@
+from BactSim.Population.Population import Population
+from BactSim.Population.SharedPopulation import SharedPopulation
+from BactSim.Population.CohortPopulation import CohortPopulation
@@ -0,0 +1,111 @@
+import numpy as np
+
+# first element of the spawn key of each kind of stream
+FOOD = 0
+MUTATION = 1
+SAMPLE = 2
+
+class RandomStreams(object):
+    """
+    The random numbers of a simulation, as independent numpy.random.Generator streams derived
+    from one np.random.SeedSequence. Each stream is identified by what it is used for and the
+    generation (and for mutations, the block of daughter cells), and is the child of the seed
+    sequence with that spawn key (ie. what SeedSequence.spawn would create at that position
+    of the tree), so any stream can be created on its own, in any process and in any order.
+
+    The daughter cells of each generation are numbered in the order they are born, and split
+    into blocks of `block_size`. The mutations of each block come from the block's own stream,
+    so a simulation gives the same results whether its cells are divided in 1 process or
+    split between many, as long as each process starts at the beginning of a block.
+
+        streams = RandomStreams(1)
+        rng = streams.food(generation)
+        for (start, stop, rng) in streams.mutation_blocks(generation, 0, num_daughters):
+            ...
+    """
+
+    def __init__(self, seed = None, block_size = 4096):
+        """
+        :param seed: (default: drawn from np.random) int, sequence of ints or
+        np.random.SeedSequence. With no seed, the entropy is drawn from the global np.random
+        state, so seeding np.random beforehand still makes a simulation reproducible.
+        :param block_size: (default: 4096) number of daughter cells mutated with each stream
+        """
+        if seed is None:
+            seed = np.random.randint(2 ** 32, size = 4, dtype = np.int64).tolist()
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.block_size = block_size
+
+    def stream(self, *key):
+        """Returns a new Generator for the stream with the given key (tuple of ints)"""
+        seed = self.seed_sequence
+        child = np.random.SeedSequence(seed.entropy, spawn_key = seed.spawn_key + key,
+                                       pool_size = seed.pool_size)
+        return np.random.Generator(np.random.PCG64(child))
+
+    def food(self, generation):
+        """Returns the Generator for allocating food in a generation"""
+        return self.stream(FOOD, generation)
+
+    def mutation(self, generation, block):
+        """Returns the Generator for mutating a block of daughter cells of a generation"""
+        return self.stream(MUTATION, generation, block)
+
+    def sample(self, generation):
+        """Returns the Generator for sampling the population in a generation"""
+        return self.stream(SAMPLE, generation)
+
+    def mutation_blocks(self, generation, start, stop):
+        """
+        Splits the daughter cells start to stop of a generation into blocks
+        :param generation: generation number
+        :param start: number of the first daughter cell. Must be at the start of a block.
+        :param stop: number after the last daughter cell
+        :returns: iterator of (start, stop, Generator) of each block
+        :raises: ValueError if start is not at the start of a block
+        """
+        if start % self.block_size:
+            raise ValueError(f'daughter cell {start} is not at the start of a block of {self.block_size}')
+        for block_start in range(start, stop, self.block_size):
+            yield (block_start, min(block_start + self.block_size, stop),
+                   self.mutation(generation, block_start // self.block_size))
+
+    def daughter_streams(self, generation, start = 0):
+        """
+        Returns an iterator of the Generator to mutate each daughter cell start, start + 1, ...
+        of a generation with (the same Generator for all the cells in a block)
+        :param generation: generation number
+        :param start: (default: 0) number of the first daughter cell. Must be at the start of a
+        block.
+        :raises: ValueError if start is not at the start of a block
+        """
+        if start % self.block_size:
+            raise ValueError(f'daughter cell {start} is not at the start of a block of {self.block_size}')
+        block = start // self.block_size
+        while True:
+            rng = self.mutation(generation, block)
+            for _ in range(self.block_size):
+                yield rng
+            block += 1
+
+    def get_state(self):
+        """Returns a dict of python ints/lists describing these streams, eg. for saving as JSON"""
+        entropy = self.seed_sequence.entropy
+        return {'entropy': entropy if isinstance(entropy, int) else [int(x) for x in entropy],
+                'spawn_key': list(self.seed_sequence.spawn_key),
+                'pool_size': self.seed_sequence.pool_size,
+                'block_size': self.block_size}
+
+    @classmethod
+    def from_state(cls, state):
+        """Creates streams from a dict returned by get_state()"""
+        return cls(np.random.SeedSequence(state['entropy'], spawn_key = tuple(state['spawn_key']),
+                                          pool_size = state['pool_size']),
+                   state['block_size'])
+
+    def __str__(self):
+        return f'RandomStreams(entropy={self.seed_sequence.entropy}, spawn_key={self.seed_sequence.spawn_key})'
+
+    __repr__ = __str__
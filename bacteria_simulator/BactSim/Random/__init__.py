@@ -0,0 +1 @@
+from BactSim.Random.RandomStreams import RandomStreams
@@ -0,0 +1,166 @@
+from collections import namedtuple
+import numpy as np
+
+# block_size: number of rows in each block; rows: index of the first row of each block;
+# mins, maxs, means: arrays (blocks x columns)
+Window = namedtuple('Window', ('block_size', 'rows', 'mins', 'maxs', 'means'))
+
+class Pyramid(object):
+    """
+    Multi-resolution summary of the rows of a run log, for plotting a long run at screen
+    resolution. Level 0 is the rows themselves, which are read from where they are stored
+    (eg. the memory map of a RunLogReader) and not copied. Each entry of level k + 1 holds the
+    minimum, maximum and mean of `factor` entries of level k, ie. of a block of factor ** (k + 1)
+    rows. The levels are updated as rows are added, so adding a row costs O(1) on average, and
+    window() returns any range of rows in at most `points` blocks, whatever the length of
+    the run:
+
+        pyramid = Pyramid(reader)
+        reader.refresh()
+        pyramid.update()
+        window = pyramid.window(0, len(pyramid), points = 800)
+        plt.plot(window.rows, window.means[:, 1])
+
+    NaN values are ignored by the minimum and maximum, but make the mean NaN.
+    """
+
+    def __init__(self, source, factor = 4):
+        """
+        :param source: the rows: an array (rows x columns), or an object whose `rows`
+        attribute is an array which only grows, eg. a RunLogReader. Rows added to it are
+        summarised by update().
+        :param factor: (default: 4) number of entries of each level combined into one entry
+        of the next level
+        """
+        if factor < 2:
+            raise ValueError('factor must be at least 2')
+        self.source = source
+        self.num_columns = self.rows.shape[1]
+        self.factor = factor
+        # (mins, maxs, means) arrays of each level from level 1, with spare capacity at the end
+        self._levels = []
+        # number of entries in each level, from level 0
+        self._sizes = [0]
+        self.update()
+
+    @property
+    def rows(self):
+        """The rows of the source (level 0)"""
+        return getattr(self.source, 'rows', self.source)
+
+    def __len__(self):
+        """Number of rows summarised"""
+        return self._sizes[0]
+
+    @property
+    def num_levels(self):
+        return len(self._sizes)
+
+    def _level(self, level):
+        """Returns the (mins, maxs, means) arrays of a level"""
+        if level == 0:
+            rows = self.rows
+            return rows, rows, rows
+        return self._levels[level - 1]
+
+    def update(self):
+        """
+        Summarises the rows added to the source since the last update
+        :returns: number of new rows
+        """
+        size = len(self.rows)
+        new_rows = size - self._sizes[0]
+        if new_rows > 0:
+            self._sizes[0] = size
+            self._combine(0)
+        return new_rows
+
+    def _append(self, level, mins, maxs, means):
+        if level == len(self._sizes):
+            capacity = max(len(mins), 16)
+            self._levels.append(tuple(np.empty((capacity, self.num_columns)) for _ in range(3)))
+            self._sizes.append(0)
+
+        size = self._sizes[level]
+        arrays = self._levels[level - 1]
+        if size + len(mins) > len(arrays[0]):
+            capacity = max(size + len(mins), 2 * len(arrays[0]))
+            arrays = tuple(np.concatenate((array[:size], np.empty((capacity - size, self.num_columns))))
+                           for array in arrays)
+            self._levels[level - 1] = arrays
+
+        for array, values in zip(arrays, (mins, maxs, means)):
+            array[size:size + len(mins)] = values
+        self._sizes[level] = size + len(mins)
+        self._combine(level)
+
+    def _combine(self, level):
+        """Combines the newly completed blocks of `factor` entries of a level into the next level"""
+        factor = self.factor
+        first = (self._sizes[level + 1] if level + 1 < len(self._sizes) else 0) * factor
+        last = self._sizes[level] // factor * factor
+        if last > first:
+            blocks = [np.asarray(array[first:last], dtype = float).reshape(-1, factor, self.num_columns)
+                      for array in self._level(level)]
+            self._append(level + 1, np.fmin.reduce(blocks[0], axis = 1),
+                         np.fmax.reduce(blocks[1], axis = 1), blocks[2].mean(axis = 1))
+
+    def _tail(self, level):
+        """
+        Returns (mins, maxs, sums, count) of the rows after the last complete entry of the
+        given level
+        """
+        empty = np.full(self.num_columns, np.nan)
+        if level == 0:
+            return empty, empty, np.zeros(self.num_columns), 0
+        mins, maxs, sums, count = self._tail(level - 1)
+        start = self._sizes[level] * self.factor
+        stop = self._sizes[level - 1]
+        if stop > start:
+            lower_mins, lower_maxs, lower_means = (np.asarray(array[start:stop], dtype = float)
+                                                   for array in self._level(level - 1))
+            mins = np.fmin(mins, np.fmin.reduce(lower_mins, axis = 0))
+            maxs = np.fmax(maxs, np.fmax.reduce(lower_maxs, axis = 0))
+            rows_per_entry = self.factor ** (level - 1)
+            sums = sums + lower_means.sum(axis = 0) * rows_per_entry
+            count += (stop - start) * rows_per_entry
+        return mins, maxs, sums, count
+
+    def window(self, start = 0, stop = None, points = 1000):
+        """
+        Returns the rows start to stop in blocks of factor ** level rows, using the lowest level
+        which needs at most `points` blocks (or the highest level there is). The first and last
+        blocks may include rows outside the range, and the last block may have less rows
+        than the others.
+        :param start: (default: 0) index of the first row
+        :param stop: (default: after the last row) index after the last row
+        :param points: (default: 1000) maximum number of blocks wanted, eg. the width of the
+        plot in pixels
+        :returns: Window of the number of rows in each block, the index of the first row of each
+        block and arrays (blocks x columns) of the minimum, maximum and mean of the rows of
+        each block
+        """
+        total = len(self)
+        stop = total if stop is None else min(stop, total)
+        start = max(start, 0)
+        if stop <= start:
+            empty = np.empty((0, self.num_columns))
+            return Window(1, np.empty(0, dtype = int), empty, empty, empty)
+
+        level = 0
+        while True:
+            block_size = self.factor ** level
+            first = start // block_size
+            last = -(-stop // block_size)
+            if last - first <= points or level + 1 == len(self._sizes):
+                break
+            level += 1
+        complete = min(last, self._sizes[level])
+        mins, maxs, means = (np.asarray(array[first:complete], dtype = float) for array in self._level(level))
+        if last > complete:
+            tail_mins, tail_maxs, tail_sums, count = self._tail(level)
+            mins = np.vstack((mins, tail_mins))
+            maxs = np.vstack((maxs, tail_maxs))
+            means = np.vstack((means, tail_sums / count))
+        rows = np.arange(first, first + len(mins)) * block_size
+        return Window(block_size, rows, mins, maxs, means)
@@ -0,0 +1,266 @@
+"""
+Binary run logs: one fixed-width row of float64 columns per generation.
+
+A run log starts with a header describing its columns (see RunLogWriter), followed by the
+rows, so a reader can memory-map the file and take any column or range of rows without
+parsing text. Rows are only ever appended, so a RunLogReader can follow a log which is still
+being written (see RunLogReader.refresh).
+
+    with RunLogWriter.for_simulator('records.bslog', simulator) as log:
+        for i in range(1000):
+            simulator.progress()
+            log.log(simulator)
+
+    reader = RunLogReader('records.bslog')
+    population = reader['population']
+    glucose = reader.column('food:glucose', start = -50)
+
+File layout: the 8 bytes MAGIC, the length of the header as a little-endian uint32, the
+header as JSON (padded with spaces so the rows start at a multiple of 8 bytes), then the rows,
+each len(columns) little-endian float64s.
+"""
+import json
+import os
+import struct
+import numpy as np
+
+MAGIC = b'BSRUNLOG'
+VERSION = 1
+DTYPE = np.dtype('<f8')
+
+def weight_column(src, dest):
+    """Name of the column with the mean weight of the edge from src to dest"""
+    return f'weight:{src}->{dest}'
+
+def food_column(food):
+    """Name of the column with the amount of the food available"""
+    return f'food:{food}'
+
+def read_header(file):
+    """
+    Reads the header of a run log
+    :param file: file opened in binary mode, at the start of the log
+    :returns: tuple of (header dict, size of the header in bytes)
+    :raises: ValueError if the file is not a run log of a supported version
+    """
+    start = file.read(len(MAGIC) + 4)
+    if len(start) < len(MAGIC) + 4 or start[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{file.name} is not a run log')
+    (length,) = struct.unpack('<I', start[len(MAGIC):])
+    header = json.loads(file.read(length).decode('utf-8'))
+    if header.get('version') != VERSION:
+        raise ValueError(f'{file.name} is not a version {VERSION} run log')
+    return header, len(start) + length
+
+class RunLogWriter(object):
+    """
+    Writes a run log. Rows are kept in a buffer and written to the file `buffer_rows` at a
+    time (and by flush() and close()).
+    """
+
+    def __init__(self, path, columns, metadata = None, buffer_rows = 64, append = False):
+        """
+        :param path: file to write to (normally ending in .bslog)
+        :param columns: list of column names
+
+        Optional parameters:
+        :param metadata: (default: None) dict of anything else to save in the header (must be
+        JSON serializable)
+        :param buffer_rows: (default: 64) number of rows to buffer before writing
+        :param append: (default: False) add rows to an existing log with the same columns
+        (eg. when resuming from a checkpoint) instead of overwriting it
+        :raises: ValueError if appending to a log with different columns
+        """
+
+        self.path = path
+        self.columns = list(columns)
+        self.column_index = {name: j for j, name in enumerate(self.columns)}
+        if len(self.column_index) != len(self.columns):
+            raise ValueError('column names must be unique')
+        self.metadata = dict(metadata or {})
+        self._buffer = np.empty((max(buffer_rows, 1), len(self.columns)), dtype = DTYPE)
+        self._buffered = 0
+
+        if append and os.path.exists(path):
+            self.file = open(path, 'r+b')
+            header, header_size = read_header(self.file)
+            if header['columns'] != self.columns:
+                self.file.close()
+                raise ValueError(f'{path} has different columns')
+            # drop a partly written row at the end, eg. if the writing process was killed
+            rows = (os.path.getsize(path) - header_size) // self.row_size
+            self.file.truncate(header_size + rows * self.row_size)
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.file = open(path, 'wb')
+            header = json.dumps({'version': VERSION, 'dtype': DTYPE.str,
+                                 'columns': self.columns, 'metadata': self.metadata})
+            # pad so that the rows are aligned
+            length = len(header.encode('utf-8'))
+            length += -(len(MAGIC) + 4 + length) % DTYPE.itemsize
+            self.file.write(MAGIC + struct.pack('<I', length) + header.encode('utf-8').ljust(length))
+            # so that readers can open the log before any rows are written
+            self.file.flush()
+
+    @classmethod
+    def for_simulator(cls, path, simulator, metadata = None, extra_columns = (), **kwargs):
+        """
+        Creates a run log with the standard columns for a simulator: generation, population,
+        the amount of each food (see food_column) and the mean weight of each edge (see
+        weight_column). Use log() to write a row.
+        :param path: file to write to
+        :param simulator: Simulator or IntSimulator, whose population must not be empty
+        :param metadata: (default: None) dict of anything else to save in the header
+        :param extra_columns: (default: none) names of other columns to add after the standard
+        ones, eg. the phases and counters of a BactSim.Simulator.Profiler
+        :param kwargs: other parameters of RunLogWriter
+        """
+        topology = simulator.statistics.topology
+        columns = ['generation', 'population']
+        columns += [food_column(food) for food in sorted(simulator.food_generator.food)]
+        columns += [weight_column(src, dest) for (src, dest) in topology.edges]
+        columns += [name for name in extra_columns if name not in columns]
+        return cls(path, columns, metadata, **kwargs)
+
+    @property
+    def row_size(self):
+        return len(self.columns) * DTYPE.itemsize
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, row):
+        """
+        Adds a row to the log
+        :param row: list of the value of each column, or dict of column name to value (missing
+        columns are NaN)
+        """
+        if isinstance(row, dict):
+            values = np.full(len(self.columns), np.nan)
+            for name, value in row.items():
+                values[self.column_index[name]] = value
+            row = values
+        self._buffer[self._buffered] = row
+        self._buffered += 1
+        if self._buffered == len(self._buffer):
+            self.flush()
+
+    def log(self, simulator, extra = None):
+        """
+        Adds a row with the current state of a simulator, for a log created by for_simulator.
+        The weights are NaN if the population is empty.
+        :param simulator: Simulator or IntSimulator
+        :param extra: (default: None) dict of the values of the extra columns, eg. a record of
+        a BactSim.Simulator.Profiler
+        """
+        row = {'generation': simulator.generation, 'population': simulator.population_size}
+        for food, amount in simulator.food_generator.food.items():
+            row[food_column(food)] = amount
+        statistics = simulator.statistics
+        if statistics is not None and statistics.count:
+            for (src, dest), mean in zip(statistics.topology.edges, statistics.weight_means().tolist()):
+                row[weight_column(src, dest)] = mean
+        if extra is not None:
+            row.update(extra)
+        self.write(row)
+
+    def flush(self):
+        """Writes the buffered rows to the file"""
+        if self._buffered:
+            self.file.write(self._buffer[:self._buffered].tobytes())
+            self._buffered = 0
+        self.file.flush()
+
+    def close(self):
+        """Writes the buffered rows and closes the file"""
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+class RunLogReader(object):
+    """
+    Reads a run log by memory-mapping it. Columns and rows are numpy arrays (views of the
+    file, which must not be modified).
+
+    Attributes
+    -----------
+    - columns (list of str) : names of the columns
+    - metadata (dict) : the metadata given to the writer
+    - rows (np.ndarray) : array (rows x columns) of the rows read so far
+    """
+
+    def __init__(self, path):
+        """
+        :param path: run log file
+        :raises: ValueError if the file is not a run log of a supported version
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            header, self.header_size = read_header(file)
+        self.columns = header['columns']
+        self.column_index = {name: j for j, name in enumerate(self.columns)}
+        self.metadata = header['metadata']
+        self.rows = np.empty((0, len(self.columns)), dtype = DTYPE)
+        # number of rows returned by read_new
+        self._tail = 0
+        self.refresh()
+
+    @property
+    def row_size(self):
+        return len(self.columns) * DTYPE.itemsize
+
+    def refresh(self):
+        """
+        Maps the rows which have been written since the log was last read. A partly written
+        row at the end of the file is left until it is complete.
+        :returns: number of new rows
+        """
+        num_rows = (os.path.getsize(self.path) - self.header_size) // self.row_size
+        old_rows = len(self.rows)
+        if num_rows > old_rows:
+            self.rows = np.memmap(self.path, dtype = DTYPE, mode = 'r', offset = self.header_size,
+                                  shape = (num_rows, len(self.columns)))
+        return num_rows - old_rows
+
+    def read_new(self):
+        """
+        Returns the rows which have been written since the last call to read_new (all the rows
+        the first time), for following a log while it is being written. Only the new part of
+        the file is read.
+        :returns: array (new rows x columns)
+        """
+        self.refresh()
+        rows = np.array(self.rows[self._tail:])
+        self._tail = len(self.rows)
+        return rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def column(self, name, start = None, stop = None):
+        """
+        :param name: column name
+        :param start: (default: first row) index of first row (negative counts from the end)
+        :param stop: (default: after last row) index after the last row
+        :returns: array of the values of the column in rows start to stop
+        :raises: ValueError if there is no such column
+        """
+        if name not in self.column_index:
+            raise ValueError(f'No column called {name}')
+        return self.rows[start:stop, self.column_index[name]]
+
+    def __getitem__(self, names):
+        """
+        reader['population'] is the array of the whole column; reader[['a', 'b']] is an array
+        (rows x 2) of both columns
+        """
+        if isinstance(names, str):
+            return self.column(names)
+        return self.rows[:, [self.column_index[name] for name in names]]
+
+    def select(self, prefix):
+        """Returns the names of the columns starting with prefix, eg. select('food:')"""
+        return [name for name in self.columns if name.startswith(prefix)]
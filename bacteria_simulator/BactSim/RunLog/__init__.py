@@ -0,0 +1,2 @@
+from BactSim.RunLog.RunLog import RunLogWriter, RunLogReader, weight_column, food_column
+from BactSim.RunLog.Pyramid import Pyramid
@@ -0,0 +1,298 @@
+"""
+Strategies for splitting the food available in a generation between the cells of a
+population. A simulator calls its strategy's allocate() once per generation (see
+BactSim.Simulator.Engine), with the food stream of the generation:
+
+    simulator = Simulator(food_generator, bacteria, allocation = ProportionalShare())
+
+Every strategy works on arrays with one row per cell (a list of bacteria or a Population) or
+per cohort (a CohortPopulation), so none of them needs a loop over the cells. Strategies which
+can give the cells of a cohort different amounts of food split the cohort.
+
+When the population is a sample standing for `cell_weight` cells each (see Engine.sample),
+the food is shared between the cells of the whole population.
+"""
+import math
+import numpy as np
+
+from BactSim.Bacteria.CompactBacteria import CompactBacteria
+from BactSim.Population import Population, CohortPopulation
+
+def cell_counts(population):
+    """
+    Returns the number of cells in each row of a population
+    :param population: list of bacteria, Population, CohortPopulation, or a number of cells
+    :returns: tuple of (number of rows, array of the cells in each row or None if there is
+    one cell per row)
+    """
+    if isinstance(population, CohortPopulation):
+        return population.num_cohorts, population.counts
+    if isinstance(population, (int, np.integer)):
+        return int(population), None
+    return len(population), None
+
+def total_cells(population, cell_weight = 1):
+    """
+    Returns the number of cells of the whole population a population stands for
+    :param population: list of bacteria, Population, CohortPopulation, or a number of cells
+    :param cell_weight: (default: 1) number of cells of the whole population each cell
+    stands for
+    :raises: ZeroDivisionError if the population is empty, like sharing food between no cells
+    """
+    rows, counts = cell_counts(population)
+    cells = rows if counts is None else int(counts.sum())
+    if cells == 0:
+        raise ZeroDivisionError('the population is empty')
+    return cells * cell_weight
+
+def uptake_capacity(population, foods):
+    """
+    Returns how fast each cell takes up each sugar: the sum of the weights of the edges out
+    of the sugar's node (see Population.next_timestep). Sugars which are not nodes of the
+    cells have no capacity. The weights of a list of bacteria are read from the cells (see
+    Bacteria.get_out_weights and CompactBacteria.weights) without converting them.
+    :param population: list of bacteria, Population, CohortPopulation, or a number of cells
+    (which are all alike)
+    :param foods: names of the sugars
+    :returns: array (rows x foods)
+    """
+    rows, _ = cell_counts(population)
+    if isinstance(population, (int, np.integer)):
+        return np.ones((rows, len(foods)))
+    capacity = np.zeros((rows, len(foods)))
+    if rows == 0:
+        return capacity
+    if isinstance(population, Population):
+        topology, weights = population.topology, population.weights
+    elif isinstance(population[0], CompactBacteria):
+        topology, weights = population[0].topology, np.array([bac.weights for bac in population])
+    else:
+        # Bacteria keep the sums of their outgoing weights up to date
+        topology = population[0].compile()
+        out_weights = np.array([bac.get_out_weights() for bac in population], dtype=float)
+        for j, food in enumerate(foods):
+            if food in topology.node_index:
+                capacity[:, j] = out_weights[:, topology.node_index[food]]
+        return capacity
+
+    # added up edge by edge, in the same order as Bacteria.refresh_weights
+    for e, src in enumerate(topology.src.tolist()):
+        for j, food in enumerate(foods):
+            if topology.node_index.get(food) == src:
+                capacity[:, j] += weights[:, e]
+    return capacity
+
+def round_randomly(value, rng):
+    """Rounds a number up or down at random, so that it is right on average"""
+    return math.floor(value) + (rng.random() < value % 1)
+
+class FoodAllocation(object):
+    """
+    Base class of the food allocation strategies (see the module docstring)
+    """
+
+    def allocate(self, available_food, population, rng, cell_weight = 1):
+        """
+        Splits the food of a generation between the cells of a population
+        :param available_food: dict of sugar to the amount available to the whole population
+        :param population: list of bacteria, Population or CohortPopulation, or a number of
+        cells which are all alike
+        :param rng: Generator of the food stream of the generation
+        :param cell_weight: (default: 1) number of cells of the whole population each cell
+        stands for
+        :returns: tuple of (the population, with any cohorts split, dict of sugar to array of
+        food allocated to each row of the population)
+        """
+        raise NotImplementedError
+
+    def __str__(self):
+        return f'{type(self).__name__}()'
+
+    __repr__ = __str__
+
+class EqualShare(FoodAllocation):
+    """
+    Every cell gets the same fraction of each sugar (the allocation of Simulator)
+    """
+
+    def allocate(self, available_food, population, rng, cell_weight = 1):
+        rows, _ = cell_counts(population)
+        cells = total_cells(population, cell_weight)
+        allocation = np.empty((rows, len(available_food)))
+        for j, quantity in enumerate(available_food.values()):
+            allocation[:, j] = quantity / cells
+        return population, dict(zip(available_food, allocation.T))
+
+class IntegerUnits(FoodAllocation):
+    """
+    Food is only allocated in whole units of food_unit, as evenly as possible (the
+    allocation of IntSimulator). Each cell gets food_unit * (amount // food_unit // cells) of
+    each sugar, and the remaining units are given to randomly chosen cells (at most 1 extra
+    unit each). A cohort is split when only some of its cells get an extra unit: the number of
+    cells of each cohort which get one is drawn from the multivariate hypergeometric
+    distribution, ie. as if the cells were chosen one by one.
+    """
+
+    def __init__(self, food_unit = 10):
+        """
+        :param food_unit: (default: 10) allocate food in multiples of this number
+        """
+        if food_unit <= 0:
+            raise ValueError('food_unit must be positive')
+        self.food_unit = food_unit
+
+    def share(self, quantity, cells, rng, cell_weight = 1):
+        """
+        Splits an amount of a sugar between the cells in units of food_unit. When the cells
+        are a sample standing for cell_weight cells each, the amount is split between the
+        cells of the whole population, and the number of cells of the sample which get an
+        extra unit is rounded up or down at random so that it is right on average.
+        :param quantity: amount of the sugar
+        :param cells: number of cells being simulated
+        :param rng: Generator to round the number of extra units with
+        :param cell_weight: (default: 1) cells of the whole population each cell stands for
+        :returns: tuple of (food every cell gets, number of cells which get 1 extra unit)
+        """
+        quantity /= self.food_unit
+        all_cells = cells * cell_weight
+        min_qty = quantity // all_cells
+        get_extra = quantity % all_cells
+        if cell_weight != 1:
+            get_extra = round_randomly(get_extra / cell_weight, rng)
+        return self.food_unit * min_qty, int(get_extra)
+
+    def allocate(self, available_food, population, rng, cell_weight = 1):
+        if isinstance(population, CohortPopulation):
+            return self.allocate_cohorts(available_food, population, rng, cell_weight)
+        food_unit = self.food_unit
+        cells, _ = cell_counts(population)
+        allocation = np.empty((cells, len(available_food)))
+        # a random order of the cells for each sugar, for choosing who gets the extra units
+        order = rng.random((cells, len(available_food))).argsort(axis=0)
+        for j, quantity in enumerate(available_food.values()):
+            min_food, get_extra = self.share(quantity, cells, rng, cell_weight)
+            allocation[:, j] = min_food
+            allocation[order[:get_extra, j], j] += food_unit
+        return population, dict(zip(available_food, allocation.T))
+
+    def allocate_cohorts(self, available_food, population, rng, cell_weight = 1):
+        food_unit = self.food_unit
+        cells = len(population)
+        allocation = np.empty((population.num_cohorts, len(available_food)))
+        for j, quantity in enumerate(available_food.values()):
+            allocation[:, j], get_extra = self.share(quantity, cells, rng, cell_weight)
+            if get_extra:
+                extra = rng.multivariate_hypergeometric(population.counts, get_extra)
+                population, rows, split_off = population.split(extra)
+                allocation = allocation[rows]
+                allocation[split_off, j] += food_unit
+        return population, dict(zip(available_food, allocation.T))
+
+    def __str__(self):
+        return f'IntegerUnits(food_unit={self.food_unit})'
+
+class ProportionalShare(FoodAllocation):
+    """
+    Each sugar is split between the cells in proportion to their uptake capacity for it (see
+    uptake_capacity), so cells which evolve faster transport of a sugar get more of it. A
+    sugar which no cell can take up is shared equally.
+    """
+
+    def allocate(self, available_food, population, rng, cell_weight = 1):
+        rows, counts = cell_counts(population)
+        cells = total_cells(population, cell_weight)
+        capacity = uptake_capacity(population, list(available_food))
+        cell_capacity = capacity if counts is None else capacity * counts[:, None]
+        totals = cell_capacity.sum(axis=0) * cell_weight
+        allocation = np.empty((rows, len(available_food)))
+        for j, quantity in enumerate(available_food.values()):
+            if totals[j] > 0:
+                allocation[:, j] = quantity * capacity[:, j] / totals[j]
+            else:
+                allocation[:, j] = quantity / cells
+        return population, dict(zip(available_food, allocation.T))
+
+class RandomCompetition(FoodAllocation):
+    """
+    Cells compete for each unit of food: each sugar is split into whole units of food_unit,
+    and each unit goes to a cell chosen at random, with a probability proportional to its
+    uptake capacity for the sugar (see uptake_capacity), or the same for every cell if
+    by_capacity is False or no cell can take the sugar up. A cell can win any number of
+    units, or none. The cells of a cohort which win the same number of units stay together.
+    """
+
+    def __init__(self, food_unit = 1, by_capacity = True):
+        """
+        :param food_unit: (default: 1) size of the units of food
+        :param by_capacity: (default: True) whether cells with a greater uptake capacity are
+        more likely to win a unit
+        """
+        if food_unit <= 0:
+            raise ValueError('food_unit must be positive')
+        self.food_unit = food_unit
+        self.by_capacity = by_capacity
+
+    def allocate(self, available_food, population, rng, cell_weight = 1):
+        rows, counts = cell_counts(population)
+        total_cells(population, cell_weight)
+        if self.by_capacity:
+            capacity = uptake_capacity(population, list(available_food))
+        else:
+            capacity = np.ones((rows, len(available_food)))
+        allocation = np.zeros((rows, len(available_food)))
+        for j, quantity in enumerate(available_food.values()):
+            units = quantity // self.food_unit
+            if cell_weight != 1:
+                units = round_randomly(units / cell_weight, rng)
+            units = int(units)
+            if units == 0:
+                continue
+            row_capacity = capacity[:, j] if counts is None else capacity[:, j] * counts
+            if row_capacity.sum() <= 0:
+                row_capacity = np.ones(rows) if counts is None else counts.astype(float)
+            won = rng.multinomial(units, row_capacity / row_capacity.sum())
+            if counts is None:
+                allocation[:, j] = won * self.food_unit
+                continue
+
+            # share the units won by each cohort between its cells at random, and split the
+            # cohort into the groups of cells which won the same number of units
+            unit_rows = np.repeat(np.arange(rows), won)
+            unit_cells = rng.integers(0, counts[unit_rows])
+            winners, cell_units = np.unique(np.column_stack((unit_rows, unit_cells)), axis=0, return_counts=True)
+            groups, group_counts = np.unique(np.column_stack((winners[:, 0], cell_units)), axis=0,
+                                             return_counts=True)
+            losers = counts - np.bincount(winners[:, 0], minlength=rows)
+            new_rows = np.concatenate((np.flatnonzero(losers), groups[:, 0]))
+            new_units = np.concatenate((np.zeros(np.count_nonzero(losers), dtype=int), groups[:, 1]))
+            new_counts = np.concatenate((losers[losers > 0], group_counts))
+            order = np.lexsort((new_units, new_rows))
+            new_rows = new_rows[order]
+            population = population.select(new_rows)
+            population.counts = counts = new_counts[order]
+            allocation = allocation[new_rows]
+            capacity = capacity[new_rows]
+            allocation[:, j] = new_units[order] * self.food_unit
+            rows = len(new_rows)
+        return population, dict(zip(available_food, allocation.T))
+
+    def __str__(self):
+        return f'RandomCompetition(food_unit={self.food_unit}, by_capacity={self.by_capacity})'
+
+# names of the strategies, eg. for the command line
+ALLOCATIONS = {'equal': EqualShare, 'integer': IntegerUnits, 'proportional': ProportionalShare,
+               'competitive': RandomCompetition}
+
+def make_allocation(name, food_unit = None):
+    """
+    Creates a food allocation strategy from its name (see ALLOCATIONS)
+    :param name: name of the strategy
+    :param food_unit: (default: the strategy's default) food_unit of the strategies which
+    allocate food in units
+    :raises: ValueError for an unknown name
+    """
+    if name not in ALLOCATIONS:
+        raise ValueError(f'Unknown food allocation {name}, must be one of {", ".join(ALLOCATIONS)}')
+    if food_unit is not None and name in ('integer', 'competitive'):
+        return ALLOCATIONS[name](food_unit = food_unit)
+    return ALLOCATIONS[name]()
@@ -0,0 +1,132 @@
+"""
+Saving and restoring the state of a Simulator or IntSimulator.
+
+A checkpoint is a single .npz file with one array per column of the population (amounts,
+weights, ids, generations, timesteps, last food and the counts of a CohortPopulation), the
+topology of the bacteria, the simulator's counters, the food generator's generation, the
+seed of the simulator's random streams and the state of np.random, so a long simulation can
+be resumed exactly where it was saved.
+
+    simulator.save_checkpoint('run.npz')
+    ...
+    simulator = IntSimulator(FoodGenerator(), [], food_unit = 1)
+    simulator.load_checkpoint('run.npz')
+"""
+import json
+import os
+import numpy as np
+
+from BactSim.Bacteria.CompactBacteria import CompactBacteria
+from BactSim.Bacteria.Topology import Topology
+from BactSim.Population import Population, CohortPopulation
+from BactSim.Random import RandomStreams
+from BactSim.Simulator.Statistics import PopulationStatistics
+
+VERSION = 4
+# older versions which can still be loaded
+SUPPORTED_VERSIONS = (1, 2, 3, VERSION)
+
+def save_checkpoint(simulator, path):
+    """
+    Saves the state of a simulator. The file is written to a temporary file first, so an
+    existing checkpoint is not lost if this process dies while saving.
+
+    The bacteria are saved as a Population, so customized survive functions (see
+    Bacteria.survive) and extra attributes of the bacteria are not saved. The ids of the
+    bacteria must be numbers.
+
+    :param simulator: Simulator or IntSimulator
+    :param path: file to save to (normally ending in .npz), a str or path-like object
+    """
+
+    bacteria = simulator.bacteria
+    if isinstance(bacteria, Population):
+        representation = 'cohorts' if isinstance(bacteria, CohortPopulation) else 'population'
+        population = bacteria
+    else:
+        representation = 'compact' if bacteria and isinstance(bacteria[0], CompactBacteria) else 'bacteria'
+        population = Population.from_bacteria(bacteria) if bacteria else None
+
+    food_generator = simulator.food_generator
+    state = {
+        'version': VERSION,
+        'representation': representation,
+        'topology': None if population is None else population.topology.to_dict(),
+        'total_population': simulator.total_population,
+        'generation': simulator.generation,
+        'cell_weight': simulator.cell_weight,
+        # including a carrying capacity set by a MemoryBudget
+        'max_cells': simulator.max_cells,
+        'food_generator': {'generation': food_generator.generation, 'food': dict(food_generator.food)},
+        'last_food': None if population is None or population.last_food is None else list(population.last_food),
+        'random_streams': simulator.random.get_state(),
+    }
+    rng_name, rng_keys, rng_pos, rng_has_gauss, rng_cached_gaussian = np.random.get_state()
+    state['random_state'] = [rng_name, rng_pos, rng_has_gauss, rng_cached_gaussian]
+
+    columns = {'rng_keys': rng_keys}
+    if population is not None:
+        columns.update(amounts = population.amounts, weights = population.weights,
+                       ids = population.ids, generations = population.generations,
+                       timesteps = population.timesteps)
+        if isinstance(population, CohortPopulation):
+            columns['counts'] = population.counts
+        for (i, amounts) in enumerate(population.last_food.values() if population.last_food else ()):
+            columns[f'last_food_{i}'] = amounts
+
+    temp_path = os.fspath(path) + '.tmp'
+    with open(temp_path, 'wb') as file:
+        np.savez(file, state = np.array(json.dumps(state)), **columns)
+    os.replace(temp_path, path)
+
+def load_checkpoint(simulator, path):
+    """
+    Restores the state of a simulator saved by save_checkpoint. The simulator must have been
+    created with the same kind of food generator (and the same food_unit etc.) as the one
+    which was saved. The bacteria are restored as the same kind of object as they were saved
+    as (Bacteria, CompactBacteria, Population or CohortPopulation).
+
+    :param simulator: Simulator or IntSimulator
+    :param path: file to load
+    :raises: ValueError if the file is not a checkpoint of a supported version
+    """
+
+    with np.load(path, allow_pickle = False) as data:
+        state = json.loads(data['state'].item())
+        if state.get('version') not in SUPPORTED_VERSIONS:
+            raise ValueError(f'{path} is not a checkpoint of a supported version')
+
+        if state['topology'] is None:
+            bacteria = []
+        else:
+            last_food = None
+            if state['last_food'] is not None:
+                last_food = {food: data[f'last_food_{i}'] for (i, food) in enumerate(state['last_food'])}
+            bacteria = Population(Topology.from_dict(state['topology']), data['amounts'], data['weights'],
+                                  ids = data['ids'], generations = data['generations'],
+                                  timesteps = data['timesteps'], last_food = last_food)
+            if state['representation'] == 'cohorts':
+                bacteria = CohortPopulation(bacteria.topology, bacteria.amounts, bacteria.weights,
+                                            ids = bacteria.ids, generations = bacteria.generations,
+                                            timesteps = bacteria.timesteps, last_food = last_food,
+                                            counts = data['counts'])
+            elif state['representation'] == 'compact':
+                bacteria = bacteria.to_bacteria(compact = True)
+            elif state['representation'] == 'bacteria':
+                bacteria = bacteria.to_bacteria()
+
+        rng_name, rng_pos, rng_has_gauss, rng_cached_gaussian = state['random_state']
+        np.random.set_state((rng_name, data['rng_keys'], rng_pos, rng_has_gauss, rng_cached_gaussian))
+
+    simulator.bacteria = bacteria
+    simulator.statistics = PopulationStatistics.of(bacteria)
+    if 'random_streams' in state:
+        simulator.random = RandomStreams.from_state(state['random_streams'])
+    simulator.total_population = state['total_population']
+    simulator.generation = state['generation']
+    simulator.cell_weight = state.get('cell_weight', 1)
+    if 'max_cells' in state:
+        # older checkpoints keep the simulator's own max_cells
+        simulator.max_cells = state['max_cells']
+    simulator.food_generator.generation = state['food_generator']['generation']
+    simulator.food_generator.food.update(state['food_generator']['food'])
@@ -0,0 +1,476 @@
+from multiprocessing import Pool
+import itertools
+import math
+import operator
+import os
+import numpy as np
+
+from BactSim.Bacteria.Bacteria import Bacteria
+from BactSim.Bacteria.CompactBacteria import CompactBacteria
+from BactSim.Population import Population, CohortPopulation
+from BactSim.Random import RandomStreams
+from BactSim.Simulator import Checkpoint
+from BactSim.Simulator.Memory import MemoryBudget, memory_usage
+from BactSim.Simulator.Profiler import cell_timesteps
+from BactSim.Simulator.Statistics import PopulationStatistics
+
+# default size of the lists of bacteria which survive as arrays (see Engine.survive_multicore).
+# Timed on 1 CPU, survive of the gathered states took 2.5 ms instead of 15 ms for 200
+# CompactBacteria and 99 ms instead of 994 ms for 20000, and 3.6 ms instead of 7 ms for 200
+# Bacteria and 357 ms instead of 729 ms for 20000. For 20 Bacteria it took 1.0 ms instead of
+# 0.7 ms: gathering the states of small lists costs more than it saves.
+MULTICORE_THRESHOLD = 1000
+# default size of the lists of bacteria replicated by the worker processes. Every cell is
+# pickled to a worker and back, which takes longer than dividing it (2-3x slower for
+# CompactBacteria and 6x slower for Bacteria on 1 CPU), so by default only lists too large to
+# simulate otherwise use it.
+REPLICATE_THRESHOLD = 10000000
+# minimum number of cells survive_multicore gives a worker process at a time. Smaller ranges
+# take longer to send than to run.
+MIN_CHUNK_SIZE = 4096
+
+class Engine(object):
+    """
+    The simulation shared by Simulator and IntSimulator, which only differ in their default
+    food allocation strategy (see BactSim.Simulator.Allocation). Each generation, every cell
+    which can reproduce divides, the food of the generation is split between the cells by the
+    strategy, and the cells which do not survive are removed.
+
+    Large lists of bacteria survive (and very large ones are replicated) in a pool of worker
+    processes, which is created the first time it is needed and reused by every later
+    generation. Call close() (or use the simulator in a `with` block) to shut the pool down.
+    """
+
+    def __init__(self, food_generator, initial_bacteria, allocation, cores = None,
+                 multicore_threshold = MULTICORE_THRESHOLD, replicate_threshold = REPLICATE_THRESHOLD,
+                 max_cells = None, checkpoint_path = None, checkpoint_every = 0, seed = None, profiler = None,
+                 memory_budget = None):
+        """
+        :param food_generator: FoodGenerator object to output food available at each generation
+        :param initial_bacteria: list of initial bacteria, or a Population (to simulate all the
+        cells at once), or a CohortPopulation (to simulate each group of identical cells once)
+        :param allocation: FoodAllocation strategy splitting the food of each generation
+        between the cells (see BactSim.Simulator.Allocation)
+        :param cores: number of worker processes used to simulate large populations
+        (default: number of CPUs; with 1, everything runs in this process)
+        :param multicore_threshold: run survive for lists of at least this many bacteria on
+        their state arrays, split between the worker processes (default: MULTICORE_THRESHOLD,
+        see survive_multicore; None for never)
+        :param replicate_threshold: replicate lists of at least this many bacteria with the
+        worker processes (default: REPLICATE_THRESHOLD, see its comment for why it is so high;
+        None for never)
+        :param max_cells: (default: None, no limit) carrying capacity of the simulation. When
+        more than this many cells survive a generation, only a random sample of max_cells of
+        them is kept (see sample), so the memory and time taken by each generation stay
+        bounded however large the population grows.
+        :param checkpoint_path: file to save checkpoints to (see save_checkpoint)
+        :param checkpoint_every: save a checkpoint to checkpoint_path every this many
+        generations (default: 0, never)
+        :param seed: seed of the random streams of the simulation (see
+        BactSim.Random.RandomStreams): an int, a np.random.SeedSequence, or None to draw one
+        from np.random
+        :param profiler: (default: None) Profiler to record the time taken by each phase of
+        every generation, and the numbers of births and deaths, in (see
+        BactSim.Simulator.Profiler)
+        :param memory_budget: (default: None, no limit) bytes the population may take, or a
+        MemoryBudget. When the next generation would take more, the population is converted
+        to a smaller representation, or sampled (see BactSim.Simulator.Memory.MemoryBudget)
+
+        The mean and variance of the edge weights of the population are kept up to date in
+        self.statistics (see BactSim.Simulator.Statistics.PopulationStatistics), which is None
+        while the population is an empty list.
+
+        Once the population has been sampled, each cell stands for `cell_weight` cells of the
+        whole population, whose size is `population_size`. Food is shared between the cells of
+        the whole population, and the statistics are those of the sample.
+        """
+        self.food_generator = food_generator
+        self.bacteria = initial_bacteria
+        self.total_population = len(self.bacteria)
+        self.allocation = allocation
+        self.cores = cores or os.cpu_count()
+        self.multicore_threshold = multicore_threshold
+        self.replicate_threshold = replicate_threshold
+        self.max_cells = max_cells
+        self.cell_weight = 1
+        self.generation = 0
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.statistics = PopulationStatistics.of(initial_bacteria)
+        self.random = RandomStreams(seed)
+        self.profiler = profiler
+        if isinstance(memory_budget, (int, float)):
+            memory_budget = MemoryBudget(memory_budget)
+        self.memory_budget = memory_budget
+        self._pool = None
+
+    @property
+    def population_size(self):
+        """Number of cells in the whole population (see sample)"""
+        return len(self.bacteria) * self.cell_weight
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Shuts down the worker processes, if they have been started"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    @property
+    def pool(self):
+        """The pool of worker processes, which is started the first time it is used"""
+        if self._pool is None:
+            self._pool = Pool(processes=self.cores)
+        return self._pool
+
+    @property
+    def memory_usage(self):
+        """Estimated memory of the population (see BactSim.Simulator.Memory.MemoryUsage)"""
+        return memory_usage(self.bacteria)
+
+    def use_multicore(self, population, threshold):
+        """
+        Returns whether a population is a list of at least `threshold` bacteria (see
+        multicore_threshold and replicate_threshold)
+        """
+        return (not isinstance(population, Population) and threshold is not None
+                and len(population) >= threshold)
+
+    def progress(self):
+        """
+        Move forward by 1 generation/time-step
+        :returns: Update self.bacteria with new population at next time-step
+        """
+        if self.memory_budget is not None:
+            self.memory_budget.check(self)
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start()
+            parents = len(self.bacteria)
+        if self.use_multicore(self.bacteria, self.replicate_threshold):
+            new_population = self.replicate_multicore()
+        else:
+            new_population = self.replicate()
+        if profiler is not None:
+            profiler.lap('replicate')
+            births = len(new_population) // 2
+            profiler.count(births = births, cannot_reproduce = parents - births)
+
+        new_population, current_food = self.food_allocation(new_population)
+        if profiler is not None:
+            profiler.lap('food')
+            profiler.count(timesteps = cell_timesteps(new_population))
+        if isinstance(new_population, Population):
+            alive = new_population.survive(current_food)
+            if isinstance(new_population, CohortPopulation):
+                died = new_population.select(~alive)
+            else:
+                died = new_population.weights[~alive]
+            self.bacteria = new_population.select(alive)
+        else:
+            if self.use_multicore(new_population, self.multicore_threshold):
+                self.bacteria, died = self.survive_multicore(new_population, current_food)
+            else:
+                food_alloc = {food: amounts.tolist() for (food, amounts) in current_food.items()}
+                self.bacteria, died = survive_chunk((new_population, food_alloc))
+            died = [new_population[i] for i in died]
+        if profiler is not None:
+            profiler.lap('survive')
+            profiler.count(deaths = len(died))
+
+        self.generation += 1
+        if self.statistics is not None:
+            self.statistics.update(died = died)
+            self.statistics.end_generation(self.bacteria)
+        if profiler is not None:
+            profiler.lap('statistics')
+        if self.max_cells is not None and len(self.bacteria) > self.max_cells:
+            self.sample(self.max_cells)
+        if self.checkpoint_every and self.generation % self.checkpoint_every == 0:
+            self.save_checkpoint(self.checkpoint_path)
+        if profiler is not None:
+            profiler.end(self.generation)
+
+    def replicate(self):
+        """
+        All members in current population replicate
+        :returns: List containing all new bacteria cells (cells from previous generation + progeny),
+        or a Population if the current population is a Population
+        """
+        if isinstance(self.bacteria, CohortPopulation):
+            new_population = self.bacteria.replicate(self.total_population + 1, self.random, self.generation)
+            self.total_population += len(new_population) // 2
+            if self.statistics is not None:
+                # the parent cells keep their weights, so this adds the daughter cells and
+                # removes the cells which cannot reproduce
+                self.statistics.update(born = new_population, died = self.bacteria)
+            return new_population
+        if isinstance(self.bacteria, Population):
+            died = self.bacteria.weights[~self.bacteria.can_reproduce()]
+            new_population = self.bacteria.replicate(self.total_population + 1, self.random, self.generation)
+            self.total_population += len(new_population) // 2
+            if self.statistics is not None:
+                self.statistics.update(born = new_population.weights[1::2], died = died)
+            return new_population
+
+        new_population, died = [], []
+        rngs = self.random.daughter_streams(self.generation)
+        for bacteria in self.bacteria:
+            if not bacteria.can_reproduce():
+                died.append(bacteria)
+                continue
+            new_population.append(bacteria)
+            self.total_population += 1
+            new_population.append(bacteria.divide(self.total_population, next(rngs)))
+        if self.statistics is not None:
+            self.statistics.update(born = new_population[1::2], died = died)
+        return new_population
+
+    def replicate_multicore(self):
+        """
+        Same as replicate(), but the bacteria are divided by the worker processes. The
+        bacteria are split into contiguous chunks at the blocks of the random streams, so the
+        new population is the same as with replicate().
+        :returns: List containing all new bacteria cells (cells from previous generation + progeny)
+        """
+        new_population, died = replicate_multicore(self.bacteria, self.total_population + 1,
+                                                   self.pool, self.cores, self.random, self.generation)
+        self.total_population += len(new_population) // 2
+        if self.statistics is not None:
+            self.statistics.update(born = new_population[1::2], died = died)
+        return new_population
+
+
+    def survive_multicore(self, new_population, current_food):
+        """
+        Runs survive for every bacterium with the worker processes. Only the state of the
+        cells is sent to the workers, not the cells: the node amounts and edge weights of the
+        bacteria are gathered into arrays, which are split into contiguous ranges of cells, and
+        each worker runs Population.survive on a range (see survive_states). The new amounts
+        are written back into the bacteria, so the result is the same as running survive in
+        this process. With 1 core, the ranges are run in this process.
+
+        Bacteria with a customized survive function (see Bacteria.survive), or a different
+        structure or parameters from the first bacterium, run survive in this process.
+        :param new_population: list of bacteria
+        :param current_food: dict of sugar to array of food allocated to each bacterium
+        :returns: tuple of (list of the bacteria which survive, list of the indices of the bacteria
+        which die)
+        """
+        topology = new_population[0].compile()
+        food_alloc = {food: amounts.tolist() for (food, amounts) in current_food.items()}
+        standard = [survives_like_population(bac, topology) for bac in new_population]
+        rows = [i for (i, is_standard) in enumerate(standard) if is_standard]
+        alive = np.zeros(len(new_population), dtype=bool)
+
+        if rows:
+            amounts, weights = gather_states([new_population[i] for i in rows], topology)
+            food = {name: np.asarray(values)[rows] for (name, values) in current_food.items()}
+            chunk_size = max(math.ceil(len(rows) / (self.cores * 4)), MIN_CHUNK_SIZE)
+            tasks = [(topology, amounts[start:start + chunk_size], weights[start:start + chunk_size],
+                      {name: values[start:start + chunk_size] for (name, values) in food.items()})
+                     for start in range(0, len(rows), chunk_size)]
+            if len(tasks) > 1 and self.cores > 1:
+                results = self.pool.map(survive_states, tasks)
+            else:
+                results = [survive_states(task) for task in tasks]
+            amounts = np.concatenate([part_amounts for (part_amounts, _) in results])
+            alive[rows] = np.concatenate([part_alive for (_, part_alive) in results])
+
+            timesteps = topology.config['survive_num_timesteps']
+            for (i, cell_amounts) in zip(rows, amounts.tolist()):
+                bac = new_population[i]
+                bac.set_amounts(cell_amounts)
+                bac.timestep += timesteps
+                bac.last_food = {food: lst[i] for food, lst in food_alloc.items()}
+
+        for (i, is_standard) in enumerate(standard):
+            if not is_standard:
+                alive[i] = new_population[i].survive({food: lst[i] for food, lst in food_alloc.items()})
+        survivors = [bac for (bac, survives) in zip(new_population, alive.tolist()) if survives]
+        return survivors, np.flatnonzero(~alive).tolist()
+
+    def food_allocation(self, population):
+        """
+        Gets the food of the current generation from the food generator and splits it between
+        the cells of a population with the allocation strategy, and the food stream of the
+        current generation (see BactSim.Random.RandomStreams)
+        :param population: list of bacteria, Population or CohortPopulation, or a number of
+        cells which are all alike
+        :returns: tuple of (the population, with any cohorts split by the strategy, dict of
+        sugar to array of food allocated to each row of the population)
+        """
+        available_food = self.food_generator.getAvailable()
+        return self.allocation.allocate(available_food, population, self.random.food(self.generation),
+                                        self.cell_weight)
+
+    def sample(self, size):
+        """
+        Keeps a random sample of `size` cells of the population, chosen with the sample stream
+        of the current generation (see BactSim.Random.RandomStreams). Every cell is equally
+        likely to be kept, so the statistics of the sample are unbiased estimates of those of
+        the whole population, and the kept cells stand for the cells that were left out:
+        cell_weight is multiplied by the population size / size.
+        :param size: number of cells to keep (at most the population size)
+        """
+        rng = self.random.sample(self.generation)
+        population_size = len(self.bacteria)
+        if isinstance(self.bacteria, CohortPopulation):
+            counts = rng.multivariate_hypergeometric(self.bacteria.counts, size)
+            sample = self.bacteria.select(counts > 0)
+            sample.counts = counts[counts > 0]
+        else:
+            keep = np.sort(rng.choice(population_size, size, replace = False))
+            if isinstance(self.bacteria, Population):
+                sample = self.bacteria.select(keep)
+            else:
+                sample = [self.bacteria[i] for i in keep]
+        self.bacteria = sample
+        self.cell_weight *= population_size / size
+        if self.statistics is not None:
+            self.statistics.reset(self.bacteria)
+
+    def save_checkpoint(self, path):
+        """
+        Save the population, counters, food generator generation and random state to a file
+        (see BactSim.Simulator.Checkpoint)
+        :param path: file to save to (normally ending in .npz)
+        """
+        Checkpoint.save_checkpoint(self, path)
+
+    def load_checkpoint(self, path):
+        """
+        Restore the state saved by save_checkpoint. This simulator must have the same kind of
+        food generator and allocation strategy as the one which was saved.
+        :param path: file to load
+        """
+        Checkpoint.load_checkpoint(self, path)
+
+def func(args):
+    """
+    Replicates a chunk of the population in a worker process (see Engine.replicate)
+    :param args: tuple of (list of bacteria, ID of the first daughter cell, number of the first
+    daughter cell in this generation, RandomStreams, generation number)
+    :returns: list of the parent and daughter cells
+    """
+    bacteria_pop, next_id, first_daughter, streams, generation = args
+    rngs = streams.daughter_streams(generation, first_daughter)
+
+    output = []
+    for bac in bacteria_pop:
+        if not bac.can_reproduce():
+            continue
+        output.append(bac)
+        output.append(bac.divide(next_id, next(rngs)))
+        next_id += 1
+    return output
+
+def survive_chunk(args):
+    """
+    Runs survive for a chunk of the population (see Engine.progress)
+    :param args: tuple of (list of bacteria, dict of sugar to list of food allocated to each
+    bacterium)
+    :returns: tuple of (list of the bacteria which survive, list of the indices of the bacteria
+    which die)
+    """
+    bacteria_pop, food_alloc = args
+
+    survivors, died = [], []
+    for i, bac in enumerate(bacteria_pop):
+        current_food = {}
+        for food, lst in food_alloc.items():
+            current_food[food] = lst[i]
+        if bac.survive(current_food):
+            survivors.append(bac)
+        else:
+            died.append(i)
+    return survivors, died
+
+def survives_like_population(bac, topology):
+    """
+    Returns whether survive of a bacterium gives the same result as Population.survive of its
+    state with the given topology (see Engine.survive_multicore): it has the same structure and
+    parameters, and its survive function is not customized
+    """
+    if isinstance(bac, CompactBacteria):
+        return topology.matches(bac)
+    config = topology.config
+    return (type(bac).survive is Bacteria.survive and 'survive' not in vars(bac) and topology.matches(bac)
+            and operator.attrgetter(*config)(bac) == tuple(config.values()))
+
+def gather_states(bacteria, topology):
+    """
+    Returns the state of a list of bacteria as arrays
+    :param bacteria: non-empty list of bacteria with the given topology
+    :param topology: Topology of the bacteria
+    :returns: tuple of (array (cells x nodes) of amounts, array (cells x edges) of weights)
+    """
+    if all(isinstance(bac, CompactBacteria) for bac in bacteria):
+        amounts = [bac.amounts for bac in bacteria]
+        weights = [bac.weights for bac in bacteria]
+    else:
+        states = [bac.get_state() for bac in bacteria]
+        amounts = [amounts for (amounts, _) in states]
+        weights = [weights for (_, weights) in states]
+    return (np.array(amounts).reshape(-1, topology.num_nodes),
+            np.array(weights).reshape(-1, topology.num_edges))
+
+def survive_states(args):
+    """
+    Runs survive for the state of a chunk of the population, in a worker process (see
+    Engine.survive_multicore)
+    :param args: tuple of (Topology of the cells, array (cells x nodes) of their amounts, array
+    (cells x edges) of their weights, dict of sugar to array of food allocated to each cell)
+    :returns: tuple of (array of the new amounts, bool array of whether each cell survives)
+    """
+    topology, amounts, weights, food = args
+    population = Population(topology, amounts, weights)
+    alive = population.survive(food)
+    return population.amounts, alive
+
+def chunk(input, chunks = 8):
+    """
+    Splits a list into contiguous chunks of (almost) equal size
+    :param input: list
+    :param chunks: number of chunks
+    :returns: list of at most `chunks` non-empty lists
+    """
+    size = math.ceil(len(input) / chunks) if input else 1
+    return [input[i:i + size] for i in range(0, len(input), size)]
+
+def replicate_multicore(bacteria_pop, first_id, pool, cores, streams, generation):
+    """
+    Replicates a list of bacteria with a pool of worker processes
+    :param bacteria_pop: list of bacteria
+    :param first_id: ID of the first daughter cell
+    :param pool: multiprocessing.Pool to use
+    :param cores: number of processes in the pool
+    :param streams: RandomStreams to mutate the daughter cells with
+    :param generation: generation number, which selects the streams
+    :returns: tuple of (list of parent and daughter cells, list of the bacteria which cannot
+    reproduce)
+    """
+    reproduces = np.array([bac.can_reproduce() for bac in bacteria_pop], dtype=bool)
+    died = [bac for (bac, reproducing) in zip(bacteria_pop, reproduces) if not reproducing]
+    births = int(reproduces.sum())
+
+    # a few chunks per process so that the processes finish at about the same time. Each chunk
+    # starts at a block of the random streams, so the daughter cells are mutated the same way
+    # as by Engine.replicate.
+    blocks = math.ceil(births / streams.block_size)
+    daughters_per_chunk = max(math.ceil(blocks / (cores * 4)), 1) * streams.block_size
+    first_daughters = list(range(0, births, daughters_per_chunk)) or [0]
+    # split after the parent of the last daughter of each chunk
+    splits = np.searchsorted(np.cumsum(reproduces), first_daughters[1:]) + 1
+    split_pop = [bacteria_pop[start:stop] for (start, stop)
+                 in zip([0, *splits.tolist()], [*splits.tolist(), len(bacteria_pop)])]
+
+    output = pool.map(func, [(part, first_id + first_daughter, first_daughter, streams, generation)
+                             for (part, first_daughter) in zip(split_pop, first_daughters)])
+    return list(itertools.chain.from_iterable(output)), died
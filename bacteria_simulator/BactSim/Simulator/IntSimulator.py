@@ -1,108 +1,47 @@
-import random
-from multiprocessing import Pool
-import functools
+from BactSim.Simulator.Allocation import IntegerUnits
+from BactSim.Simulator.Engine import Engine, MULTICORE_THRESHOLD, REPLICATE_THRESHOLD
 
-class IntSimulator(object):
+class IntSimulator(Engine):
     """IntSimulator only allocates integer food values to bacteria as evenly as possible.
     All bacteria are first allocated amount // number of bacteria units of food.
     The remainder is then randomly allocated (at most 1 extra unit of food per bacteria).
+    (see BactSim.Simulator.Allocation.IntegerUnits)
+
+    Large lists of bacteria survive (and very large ones are replicated) in a pool of worker
+    processes, which is created the first time it is needed and reused by every later
+    generation. Call close() (or use the simulator in a `with` block) to shut the pool down.
     """
 
-    def __init__(self, food_generator, initial_bacteria, food_unit = 10):
+    def __init__(self, food_generator, initial_bacteria, food_unit = 10,
+                 cores = None, multicore_threshold = MULTICORE_THRESHOLD,
+                 replicate_threshold = REPLICATE_THRESHOLD, max_cells = None,
+                 checkpoint_path = None, checkpoint_every = 0, seed = None, profiler = None,
+                 memory_budget = None, allocation = None):
         """
         Initialize Simulator class
         :param food_generator: FoodGenerator object to output food available at each generation
-        :param initial_bacteria: list of initial bacteria
+        :param initial_bacteria: list of initial bacteria, or a Population (to simulate all the
+        cells at once), or a CohortPopulation (to simulate each group of identical cells once)
         :param food_unit: allocate food in mutiples of this number (default: multiples of 10)
+        :param cores: number of worker processes used to simulate large populations
+        (default: number of CPUs)
+        :param multicore_threshold: run survive for lists of at least this many bacteria on
+        their state arrays, split between the worker processes (default: 1000, see
+        BactSim.Simulator.Engine.MULTICORE_THRESHOLD)
+        :param replicate_threshold: replicate lists of at least this many bacteria with the
+        worker processes (default: 10000000). Pickling the cells for the workers costs more
+        than it saves for smaller lists (see BactSim.Simulator.Engine.REPLICATE_THRESHOLD).
+        :param allocation: (default: IntegerUnits(food_unit)) another food allocation strategy
+        (see BactSim.Simulator.Allocation)
+
+        See BactSim.Simulator.Engine for the other parameters
         """
-        self.food_generator = food_generator
-        self.bacteria = initial_bacteria
-        self.total_population = len(self.bacteria)
         self.food_unit = food_unit
-
-    def progress(self):
-        """
-        Move forward by 1 generation/time-step
-        :returns: Update self.bacteria with new population at next time-step
-        """
-        if (len(self.bacteria) < 10000000):
-            new_population = self.replicate()
-        else:
-            new_population = replicate_multicore(self.bacteria)
-        food_alloc = self.food_allocation(len(new_population))
-        self.bacteria = []
-        for i, bac in enumerate(new_population):
-            current_food = {}
-            for food, lst in food_alloc.items():
-                current_food[food] = lst[i]
-            #print(current_food)
-            # print(bac)
-            # print(bac.survive(current_food))
-            if bac.survive(current_food):
-                self.bacteria.append(bac)
-
-    def replicate(self):
-        """
-        All members in current population replicate
-        :returns: List containing all new bacteria cells (cells from previous generation + progeny)
-        """
-        new_population = []
-        for bacteria in self.bacteria:
-            if not bacteria.can_reproduce():
-                continue
-            new_population.append(bacteria)
-            self.total_population += 1
-            new_population.append(bacteria.divide(self.total_population))
-        return new_population
-
-
-    def food_allocation(self, population_size):
-        """Generates food allocation scheme
-        "param population_size: number of bacteria to allocate food to
-        :returns: dict of sugar to list of food allocated to each bacterium"""
-        food_unit = self.food_unit
-        available_food = {}
-        for food, quantity in self.food_generator.getAvailable().items():
-            quantity /= food_unit
-            min_qty = quantity // population_size
-            lst = [food_unit * min_qty] * population_size
-            get_extra = int(quantity % population_size)
-            for i in range(get_extra):
-                lst[i] += food_unit
-            random.shuffle(lst)
-            available_food[food] = lst
-        #print(available_food)
-        return available_food
-
-def func(bacteria_pop):
-
-    def __helper(bacteria):
-        if not bacteria.can_reproduce():
-            return [bacteria]
-        else:
-            return [bacteria, bacteria.divide(0)]
-
-    output = []
-
-    for bac in bacteria_pop:
-        for b in __helper(bac):
-            output.append(b)
-
-    return output
-
-def chunk(input, chunks = 8):
-    output = []
-    for i in range(1, chunks + 1):
-        output.append(input[i-1::chunks])
-    return output
-
-def replicate_multicore(bacteria_pop, cores = 8):
-    pool = Pool(processes=cores)
-    split_pop = chunk(bacteria_pop, chunks = 8)
-    output = pool.map(func, split_pop)
-    output = functools.reduce(lambda a, b: a + b, output)
-
-    return output
+        super().__init__(food_generator, initial_bacteria, allocation or IntegerUnits(food_unit), cores = cores,
+                         multicore_threshold = multicore_threshold, replicate_threshold = replicate_threshold,
+                         max_cells = max_cells,
+                         checkpoint_path = checkpoint_path, checkpoint_every = checkpoint_every, seed = seed,
+                         profiler = profiler, memory_budget = memory_budget)
 
 # to run this file as a script:
 # run BactSim.Simuator.IntSimulator from the bacteria_simulator directory
@@ -111,8 +50,6 @@ if __name__ == '__main__':
     from BactSim.FoodGenerators import StaticGenerator
     gen = StaticGenerator(food = {'glucose':139,'lactose':100})
     simulator = IntSimulator(gen, [], 10)
-    print(gen.getAvailable().items())
-    print(simulator.food_allocation(1))
-    print(simulator.food_allocation(2))
-    print(simulator.food_allocation(3))
-    print(simulator.food_allocation(4))
+    print(gen.schedule(0, 1))
+    for cells in range(1, 5):
+        print(simulator.food_allocation(cells)[1])
@@ -0,0 +1,171 @@
+"""
+Estimates of the memory taken by a population, and a memory budget which a simulator keeps
+its population within.
+
+The memory of a Population is the size of its arrays. The memory of a list of Bacteria or
+CompactBacteria is estimated from the first cell, counting every object it refers to (its
+graph, dicts, Evolution objects, arrays...) except the structure shared by the whole
+population (the Topology), so it is only an estimate for cells of different sizes.
+"""
+import sys
+import types
+from collections import namedtuple
+import numpy as np
+
+from BactSim.Bacteria.CompactBacteria import CompactBacteria
+from BactSim.Bacteria.Topology import Topology
+from BactSim.Population import Population, CohortPopulation
+
+# bytes_per_cell (float) : estimated memory of each cell; population_bytes (int) : estimated
+# memory of the whole population
+MemoryUsage = namedtuple('MemoryUsage', ('bytes_per_cell', 'population_bytes'))
+
+# memory taken during a generation, at its peak, as a multiple of the memory of the
+# population at the start of the generation. A list of cells holds the old cells and the
+# daughter cells; a Population holds the old population, the replicated population (twice
+# the size), the temporary arrays of survive and the survivors.
+PEAK_FACTOR = {'bacteria': 2, 'compact': 2, 'population': 5, 'cohorts': 6}
+
+# representations of the cells, from the largest to the smallest, and their descriptions
+REPRESENTATIONS = ('bacteria', 'compact', 'population')
+DESCRIPTIONS = {'bacteria': 'Bacteria', 'compact': 'CompactBacteria', 'population': 'a Population',
+                'cohorts': 'a CohortPopulation'}
+
+# objects which are not counted as part of a cell (strings are mostly node names and
+# descriptions, which every cell shares)
+SHARED_TYPES = (Topology, str, type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                types.MethodType)
+
+def deep_sizeof(obj, seen = None):
+    """
+    Returns the number of bytes taken by an object and every object it refers to, except
+    shared objects (see SHARED_TYPES). Objects are only counted once.
+    :param obj: any object
+    :param seen: (default: empty) set of ids of objects already counted
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        # sys.getsizeof includes the data of an array which owns it
+        return sys.getsizeof(obj) if obj.base is None else sys.getsizeof(obj) + obj.nbytes
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for (key, value) in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    if hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    for name in getattr(type(obj), '__slots__', ()):
+        if hasattr(obj, name):
+            size += deep_sizeof(getattr(obj, name), seen)
+    return size
+
+def representation(bacteria):
+    """Returns the name of the representation of a population (see BactSim.Batch.make_simulator)"""
+    if isinstance(bacteria, CohortPopulation):
+        return 'cohorts'
+    if isinstance(bacteria, Population):
+        return 'population'
+    if bacteria and isinstance(bacteria[0], CompactBacteria):
+        return 'compact'
+    return 'bacteria'
+
+def memory_usage(bacteria):
+    """
+    Estimates the memory taken by a population
+    :param bacteria: list of bacteria, Population or CohortPopulation
+    :returns: MemoryUsage
+    """
+    if isinstance(bacteria, Population):
+        arrays = [bacteria.amounts, bacteria.weights, bacteria.ids, bacteria.generations, bacteria.timesteps]
+        arrays += list((bacteria.last_food or {}).values())
+        if isinstance(bacteria, CohortPopulation):
+            arrays.append(bacteria.counts)
+        population_bytes = sum(array.nbytes for array in arrays)
+        return MemoryUsage(population_bytes / len(bacteria) if len(bacteria) else 0.0, population_bytes)
+    if not bacteria:
+        return MemoryUsage(0.0, 0)
+    # the list holds a pointer to each cell
+    bytes_per_cell = deep_sizeof(bacteria[0]) + 8
+    return MemoryUsage(float(bytes_per_cell), int(bytes_per_cell * len(bacteria)))
+
+def convert(bacteria, new_representation):
+    """
+    Returns the cells of a population in a smaller representation. Customized survive
+    functions (see Bacteria.survive) are not carried over.
+    :param bacteria: non-empty list of bacteria or a Population
+    :param new_representation: 'compact' or 'population'
+    """
+    if new_representation == 'compact':
+        topology = bacteria[0].compile()
+        return [bac if isinstance(bac, CompactBacteria) else bac.compact(topology) for bac in bacteria]
+    return Population.from_bacteria(bacteria)
+
+class MemoryBudget(object):
+    """
+    Keeps the memory taken by a simulator's population within a budget. Before each
+    generation, the simulator asks check() whether the peak memory of the generation (see
+    PEAK_FACTOR) would be over the budget. If it would, the population is converted to a
+    smaller representation (Bacteria -> CompactBacteria -> Population), and if that is not
+    enough, the simulator keeps a random sample of the population (see Engine.sample) from
+    then on.
+
+        simulator = IntSimulator(food_generator, bacteria, memory_budget = MemoryBudget(2 * 2 ** 30))
+
+    Attributes
+    -----------
+    - budget (int) : bytes
+    - changes (list) : (generation, description) of each change made to keep within the budget
+    """
+
+    def __init__(self, budget):
+        """
+        :param budget: bytes the population may take at the peak of a generation
+        """
+        if budget <= 0:
+            raise ValueError('the memory budget must be positive')
+        self.budget = budget
+        self.changes = []
+
+    def peak_bytes(self, bacteria, usage = None):
+        """
+        Returns the estimated peak memory of the next generation of a population
+        :param bacteria: list of bacteria or a Population
+        :param usage: (default: estimated) MemoryUsage of the population
+        """
+        usage = memory_usage(bacteria) if usage is None else usage
+        return PEAK_FACTOR[representation(bacteria)] * usage.population_bytes
+
+    def check(self, simulator):
+        """
+        Called by the simulators before each generation. Changes the simulator's population
+        if its next generation would take more memory than the budget.
+        :param simulator: Simulator or IntSimulator
+        :raises: MemoryError if the budget is too small for 1 cell
+        """
+        bacteria = simulator.bacteria
+        if len(bacteria) == 0 or self.peak_bytes(bacteria) <= self.budget:
+            return
+
+        current = representation(bacteria)
+        if current in REPRESENTATIONS:
+            for smaller in REPRESENTATIONS[REPRESENTATIONS.index(current) + 1:]:
+                bacteria = convert(bacteria, smaller)
+                self.changes.append((simulator.generation, f'converted the population to {DESCRIPTIONS[smaller]}'))
+                if self.peak_bytes(bacteria) <= self.budget:
+                    break
+            simulator.bacteria = bacteria
+            if self.peak_bytes(bacteria) <= self.budget:
+                return
+
+        usage = memory_usage(bacteria)
+        max_cells = int(self.budget // (PEAK_FACTOR[representation(bacteria)] * usage.bytes_per_cell))
+        if max_cells < 1:
+            raise MemoryError(f'the memory budget of {self.budget} bytes is too small for 1 cell')
+        simulator.sample(max_cells)
+        if simulator.max_cells is None or simulator.max_cells > max_cells:
+            simulator.max_cells = max_cells
+        self.changes.append((simulator.generation, f'sampled {max_cells} cells of the population'))
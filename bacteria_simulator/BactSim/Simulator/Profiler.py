@@ -0,0 +1,97 @@
+import time
+
+from BactSim.Population import Population, CohortPopulation
+
+# phases of a generation which are timed, in the order they are run
+PHASES = ('replicate', 'food', 'survive', 'statistics')
+# numbers of cells counted in each generation
+COUNTERS = ('births', 'cannot_reproduce', 'deaths', 'timesteps')
+
+class Profiler(object):
+    """
+    Wall time of each phase of Simulator.progress and IntSimulator.progress, and numbers of
+    cells, for every generation. Give one to a simulator to use it:
+
+        profiler = Profiler()
+        simulator = IntSimulator(food_generator, bacteria, profiler = profiler)
+        simulator.progress()
+        profiler.records[-1]['survive']
+
+    Each record is a dict of:
+    - generation: the generation number at the end of the generation
+    - replicate, food, survive, statistics (float) : seconds spent replicating the cells,
+    allocating food, running survive and updating the statistics (see PHASES)
+    - total (float) : seconds spent in progress(), including anything else (eg. checkpoints)
+    - births (int) : number of daughter cells
+    - cannot_reproduce (int) : number of cells which did not have enough ATP to reproduce
+    - deaths (int) : number of cells which did not survive
+    - timesteps (int) : number of cell timesteps run by survive (ie. calls of
+    Bacteria.next_timestep, or rows of a Population times the number of timesteps)
+
+    A simulator with no profiler (the default) does not time anything.
+    """
+
+    def __init__(self, callback = None, keep = True):
+        """
+        :param callback: (default: None) called with each record at the end of its generation,
+        eg. to write it to a run log
+        :param keep: (default: True) whether to keep the records in self.records
+        """
+        self.callback = callback
+        self.keep = keep
+        self.records = []
+        self.current = None
+        self._start = self._last = None
+
+    def start(self):
+        """Called by the simulators at the start of a generation"""
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.current.update(dict.fromkeys(COUNTERS, 0))
+        self._start = self._last = time.perf_counter()
+
+    def lap(self, phase):
+        """Adds the time since the last lap (or the start) to a phase of the current generation"""
+        now = time.perf_counter()
+        self.current[phase] += now - self._last
+        self._last = now
+
+    def count(self, **counts):
+        """Adds to the counters of the current generation, eg. count(births = 10)"""
+        for name, value in counts.items():
+            self.current[name] += value
+
+    def end(self, generation):
+        """
+        Called by the simulators at the end of a generation
+        :param generation: generation number
+        :returns: the record of the generation
+        """
+        record = self.current
+        record['generation'] = generation
+        record['total'] = time.perf_counter() - self._start
+        self.current = None
+        if self.keep:
+            self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+        return record
+
+    def totals(self):
+        """Returns a dict of the sum of each phase and counter over the kept records"""
+        totals = dict.fromkeys(PHASES + ('total',), 0.0)
+        totals.update(dict.fromkeys(COUNTERS, 0))
+        for record in self.records:
+            for name in totals:
+                totals[name] += record[name]
+        return totals
+
+def cell_timesteps(population):
+    """
+    Returns the number of cell timesteps survive runs for a population (see Profiler)
+    :param population: list of bacteria, Population or CohortPopulation
+    """
+    if isinstance(population, CohortPopulation):
+        return population.num_cohorts * population.survive_num_timesteps
+    if isinstance(population, Population):
+        return len(population) * population.survive_num_timesteps
+    return len(population) * population[0].survive_num_timesteps if population else 0
@@ -1,48 +1,36 @@
-class Simulator(object):
+from BactSim.Simulator.Allocation import EqualShare
+from BactSim.Simulator.Engine import Engine, MULTICORE_THRESHOLD, REPLICATE_THRESHOLD
 
-    def __init__(self, food_generator, initial_bacteria):
+class Simulator(Engine):
+    """
+    Simulator gives every bacterium the same fraction of the food (see
+    BactSim.Simulator.Allocation.EqualShare)
+    """
+
+    def __init__(self, food_generator, initial_bacteria, checkpoint_path = None, checkpoint_every = 0, seed = None,
+                 profiler = None, memory_budget = None, max_cells = None, allocation = None, cores = None,
+                 multicore_threshold = MULTICORE_THRESHOLD, replicate_threshold = REPLICATE_THRESHOLD):
         """
         Initialize Simulator class
         :param food_generator: FoodGenerator object to output food available at each generation
-        :param initial_bacteria: Initial bacteria cell at generation 0
-        """
-        self.food_generator = food_generator
-        self.bacteria = initial_bacteria
-        self.total_population = len(initial_bacteria)
-
-    def progress(self):
-        """
-        Move forward by 1 generation/time-step
-        :return: Update self.bacteria with new population at next time-step
-        """
-        new_population = self.replicate()
-        available_food = self.calculate_food(len(new_population))
-        self.bacteria = list(filter(lambda x: x.survive(available_food), new_population))
+        :param initial_bacteria: Initial bacteria cell at generation 0, either a list of Bacteria
+        or a Population (to simulate all the cells at once), or a CohortPopulation (to simulate
+        each group of identical cells once)
+        :param allocation: (default: EqualShare()) another food allocation strategy (see
+        BactSim.Simulator.Allocation)
+        :param cores: number of worker processes used to simulate large populations
+        (default: number of CPUs)
+        :param multicore_threshold: run survive for lists of at least this many bacteria on
+        their state arrays, split between the worker processes (default: 1000, see
+        BactSim.Simulator.Engine.MULTICORE_THRESHOLD)
+        :param replicate_threshold: replicate lists of at least this many bacteria with the
+        worker processes (default: 10000000). Pickling the cells for the workers costs more
+        than it saves for smaller lists (see BactSim.Simulator.Engine.REPLICATE_THRESHOLD).
 
-    def replicate(self):
+        See BactSim.Simulator.Engine for the other parameters
         """
-        All members in current population replicate
-        :return: List containing all new bacteria cells (cells from previous generation + progeny)
-        """
-        new_population = []
-        for bacteria in self.bacteria:
-            if not bacteria.can_reproduce():
-                continue
-            new_population.append(bacteria)
-            self.total_population += 1
-            daughter_cell = bacteria.clone(self.total_population)
-            daughter_cell.evolve()
-            new_population.append(daughter_cell)
-        return new_population
-
-    def calculate_food(self, population_size):
-        """
-        Determine food available to each cell in population
-        :param population_size: Size of current population
-        :return: Dictionary containing food available to each cell
-        """
-        available_food = {}
-        for food, quantity in list(self.food_generator.getAvailable().items()):
-            available_food[food] = quantity / population_size
-        return available_food
-
+        super().__init__(food_generator, initial_bacteria, allocation or EqualShare(), cores = cores,
+                         multicore_threshold = multicore_threshold, replicate_threshold = replicate_threshold,
+                         max_cells = max_cells,
+                         checkpoint_path = checkpoint_path, checkpoint_every = checkpoint_every, seed = seed,
+                         profiler = profiler, memory_budget = memory_budget)
@@ -0,0 +1,157 @@
+import numpy as np
+
+from BactSim.Population import Population, CohortPopulation
+
+class PopulationStatistics(object):
+    """
+    Running statistics of the edge weights of a population, kept by the simulators in
+    `simulator.statistics`.
+
+    The weight of an edge only changes when a daughter cell is born, so the sum and the sum
+    of squares of every edge weight are updated with the cells which are born and the cells
+    which die in each generation, instead of going through the whole population. The means
+    and variances are over every cell in the population (nothing is sampled). The sums are
+    recomputed from the whole population every `resync_every` generations so that rounding
+    errors cannot build up.
+
+    Node amounts change in every cell in every timestep, so their statistics are computed from
+    the population when they are asked for (see amount_stats).
+
+    The cohorts of a CohortPopulation count once for each of their cells.
+    """
+
+    def __init__(self, topology, bacteria = (), resync_every = 1000):
+        """
+        :param topology: Topology of the bacteria
+        :param bacteria: (default: empty) initial population, a list of bacteria or a Population
+        :param resync_every: (default: 1000) recompute the sums from the whole population every
+        this many generations (0 for never)
+        """
+        self.topology = topology
+        self.resync_every = resync_every
+        self.reset(bacteria)
+
+    @classmethod
+    def of(cls, bacteria):
+        """
+        Returns the statistics of a population, or None if the population is an empty list
+        (and so has no topology yet)
+        :param bacteria: list of bacteria or a Population
+        """
+        if isinstance(bacteria, Population):
+            return cls(bacteria.topology, bacteria)
+        if bacteria:
+            return cls(bacteria[0].compile(), bacteria)
+        return None
+
+    def get_weights(self, cells):
+        """
+        Returns the edge weights of the given cells as an array (cells x edges)
+        :param cells: list of bacteria, a Population or an array (cells x edges) of weights. For a
+        CohortPopulation, the weights of each cohort (see get_totals).
+        """
+        if isinstance(cells, Population):
+            return cells.weights
+        if isinstance(cells, np.ndarray):
+            return cells.reshape(-1, self.topology.num_edges)
+        return np.array([bac.get_state()[1] for bac in cells]).reshape(-1, self.topology.num_edges)
+
+    def get_totals(self, cells):
+        """
+        Returns the number of cells, and the sums and sums of squares of their edge weights
+        :param cells: see get_weights
+        :returns: tuple of (count, array of sums, array of sums of squares)
+        """
+        weights = self.get_weights(cells)
+        if isinstance(cells, CohortPopulation):
+            return len(cells), cells.counts @ weights, cells.counts @ np.square(weights)
+        return len(weights), weights.sum(axis=0), np.square(weights).sum(axis=0)
+
+    def reset(self, bacteria):
+        """
+        Recomputes the statistics from the whole population
+        :param bacteria: list of bacteria or a Population
+        """
+        self.count, self.weight_sum, self.weight_sq_sum = self.get_totals(bacteria)
+        self.generations_since_reset = 0
+
+    def update(self, born = (), died = ()):
+        """
+        Updates the statistics with the cells which were born and which died
+        :param born: cells added to the population (see get_weights)
+        :param died: cells removed from the population (see get_weights)
+        """
+        born_count, born_sum, born_sq_sum = self.get_totals(born)
+        died_count, died_sum, died_sq_sum = self.get_totals(died)
+        self.count += born_count - died_count
+        self.weight_sum += born_sum - died_sum
+        self.weight_sq_sum += born_sq_sum - died_sq_sum
+
+    def end_generation(self, bacteria):
+        """
+        Called by the simulators at the end of every generation
+        :param bacteria: the population at the end of the generation
+        """
+        self.generations_since_reset += 1
+        if self.resync_every and self.generations_since_reset >= self.resync_every:
+            self.reset(bacteria)
+
+
+    ## Edge weights ##
+
+    def weight_means(self):
+        """
+        :returns: array of the mean weight of each edge, ordered like topology.edges
+        :raises: ZeroDivisionError if the population is empty
+        """
+        if self.count == 0:
+            raise ZeroDivisionError('the population is empty')
+        return self.weight_sum / self.count
+
+    def weight_variances(self):
+        """
+        :returns: array of the (population) variance of the weight of each edge, ordered like
+        topology.edges
+        :raises: ZeroDivisionError if the population is empty
+        """
+        means = self.weight_means()
+        return np.maximum(self.weight_sq_sum / self.count - np.square(means), 0)
+
+    def weight_mean(self, src, dest):
+        """
+        :param src: name of source node
+        :param dest: name of destination node
+        :returns: mean weight of the edge
+        :raises: ZeroDivisionError if the population is empty
+        """
+        return self.weight_means()[self.topology.edge_index[(src, dest)]].item()
+
+    def weight_variance(self, src, dest):
+        """
+        :param src: name of source node
+        :param dest: name of destination node
+        :returns: variance of the weight of the edge
+        :raises: ZeroDivisionError if the population is empty
+        """
+        return self.weight_variances()[self.topology.edge_index[(src, dest)]].item()
+
+
+    ## Node amounts ##
+
+    def amount_stats(self, bacteria):
+        """
+        Computes the mean and variance of the amount of each node
+        :param bacteria: the current population, a list of bacteria or a Population
+        :returns: tuple of 2 arrays (means, variances), ordered like topology.nodes
+        :raises: ZeroDivisionError if the population is empty
+        """
+        if isinstance(bacteria, Population):
+            amounts = bacteria.amounts
+        else:
+            amounts = np.array([bac.get_state()[0] for bac in bacteria]).reshape(-1, self.topology.num_nodes)
+        if len(amounts) == 0:
+            raise ZeroDivisionError('the population is empty')
+        if isinstance(bacteria, CohortPopulation):
+            means = np.average(amounts, axis=0, weights=bacteria.counts)
+            return means, np.average(np.square(amounts - means), axis=0, weights=bacteria.counts)
+        return amounts.mean(axis=0), amounts.var(axis=0)
@@ -1,2 +1,5 @@
 from BactSim.Simulator.Simulator import Simulator
 from BactSim.Simulator.IntSimulator import IntSimulator
+from BactSim.Simulator.Statistics import PopulationStatistics
+from BactSim.Simulator.Profiler import Profiler
+from BactSim.Simulator.Allocation import EqualShare, IntegerUnits, ProportionalShare, RandomCompetition
@@ -1,15 +1,19 @@
 """
 This is the Main driver script that will handle the simulation of the system
+
+It waits between generations and asks whether to continue every 500 generations. To run a
+simulation at full speed without any interaction, use BactSim.Batch instead, eg.
+    python3 -m BactSim.Batch --generations 10000 --seed 1 --output records.bslog
 """
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-import csv
 import time
 
 from BactSim.Bacteria import make_basic_bacteria
 from BactSim.Simulator import Simulator, IntSimulator
 from BactSim.FoodGenerators import FoodGenerator
 from BactSim.FoodGenerators import StaticGenerator
+from BactSim.RunLog import RunLogWriter
 
 initial_bacteria = make_basic_bacteria(1)
 food_source = StaticGenerator()
@@ -18,49 +22,36 @@ simulator = IntSimulator(food_generator=food_source,
                          initial_bacteria=[initial_bacteria],
                          food_unit=1)
 
-def sugar_stats(bacteria_pop, sugar):
+def sugar_stats(statistics, sugar):
     """
     Get edge weights for each sugar pathway in the population
-    :param bacteria_pop: Bacteria population
+    :param statistics: PopulationStatistics of the simulator (simulator.statistics)
     :param sugar: Sugar/Food source
     :return: Tuple containing the average edge weights
     """
-    # Initialize empty statistics
-    statistics = [0.0, 0.0, 0.0]
-
-    for bac in bacteria_pop:
-        statistics[0] += bac.get_edge(f"{sugar}", f"transported_{sugar}")["weight"]
-        statistics[1] += bac.get_edge(f"transported_{sugar}", f"enz_{sugar}_complex")["weight"]
-        statistics[2] += bac.get_edge(f"enz_{sugar}_complex", "atp")["weight"]
-    try:
-        return tuple(map(lambda x: round(x[0] / len(bacteria_pop), 5), statistics))
-    except TypeError as e:
-        return tuple(map(lambda x: round(x / len(bacteria_pop), 5), statistics))
-
-with open('records.tsv', 'w') as file:
-    writer = csv.writer(file, delimiter="\t")
+    pathway = [(f"{sugar}", f"transported_{sugar}"),
+               (f"transported_{sugar}", f"enz_{sugar}_complex"),
+               (f"enz_{sugar}_complex", "atp")]
+    return tuple(round(statistics.weight_mean(src, dest), 5) for (src, dest) in pathway)
 
+# rows are written every 10 generations, so Viewer.py stays up to date
+with RunLogWriter.for_simulator('records.bslog', simulator, buffer_rows=10) as log:
     for i in range(10000):
         try:
             # Progress simulator by 1 generation
             simulator.progress()
 
-            # Obtain population statistics
-            generation = i
-            population_size = len(simulator.bacteria)
-            food_availability = simulator.food_generator.food
-            glucose_stats = sugar_stats(simulator.bacteria, "glucose")
-            lactose_stats = sugar_stats(simulator.bacteria, "lactose")
-            sucrose_stats = sugar_stats(simulator.bacteria, "sucrose")
-
-            # Write stats to file
-            writer.writerow([generation, population_size, *tuple(map(lambda pair: pair[1], sorted(list(food_availability.items()), key=lambda x: x[0]))),*glucose_stats, *lactose_stats, *sucrose_stats])
-            file.flush()
+            # Write population statistics to the run log (see Viewer.py)
+            log.log(simulator)
 
             if i % 500 == 0 and i != 0:
+                glucose_stats = sugar_stats(simulator.statistics, "glucose")
+                lactose_stats = sugar_stats(simulator.statistics, "lactose")
+                sucrose_stats = sugar_stats(simulator.statistics, "sucrose")
+
                 print("Generation: {}".format(i))
                 print("Food available: {}".format(simulator.food_generator.food))
-                print("Population size: {}".format(len(simulator.bacteria)))
+                print("Population size: {}".format(simulator.population_size))
 
                 print("Glucose -> Transported Glucose {0:.5f} Transported_Glucose -> Enz_Glucose_Complex {1:.5f} Enz_Glucose_Complex -> ATP {2:.5f}".format(glucose_stats[0], glucose_stats[1], glucose_stats[2]))
                 print("Lactose -> Transported Lactose {0:.5f} Transported_Lactose -> Enz_Lactose_Complex {1:.5f} Enz_Lactose_Complex -> ATP {2:.5f}".format(lactose_stats[0], lactose_stats[1], lactose_stats[2]))
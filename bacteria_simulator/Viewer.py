@@ -1,7 +1,10 @@
 # importing libraries
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 
+from BactSim.RunLog import RunLogReader, Pyramid, weight_column, food_column
+
 # Color palette
 # https://davidmathlogic.com/colorblind/#%23000000-%23E69F00-%2356B4E9-%23009E73-%23F0E442-%230072B2-%23D55E00-%23CC79A7 for colorpalette
 
@@ -16,99 +19,106 @@ lactose_ax = fig.add_subplot(2, 2, 3)
 sucrose_ax = fig.add_subplot(2, 2, 4)
 
 
-def line_to_dict(line, delim="\t"):
-    data = line.split(delim)
-    return {
-        "generation"    : float(data[0]),
-        "population"    : float(data[1]),
-        "glucose_amt"   : float(data[2]),
-        "lactose_amt"   : float(data[3]),
-        "sucrose_amt"   : float(data[4]),
-        "glucose_trans" : float(data[5]),
-        "glucose_enz"   : float(data[6]),
-        "glucose_atp"   : float(data[7]),
-        "lactose_trans" : float(data[8]),
-        "lactose_enz"   : float(data[9]),
-        "lactose_atp"   : float(data[10]),
-        "sucrose_trans" : float(data[11]),
-        "sucrose_enz"   : float(data[12]),
-        "sucrose_atp"   : float(data[13])
-    }
+# run log written by Main.py. Each frame only maps the rows written since the last frame,
+# and adds them to a multi-resolution pyramid (which reads the rows from the memory map
+# rather than copying them), so the whole run (or any part of it the user zooms into) is
+# plotted at the resolution of the screen.
+log = RunLogReader('records.bslog')
+pyramid = Pyramid(log)
+
+def pathway(sugar):
+    """Returns the run log columns of the mean weights of the edges of the pathway of a sugar"""
+    return [weight_column(sugar, f"transported_{sugar}"),
+            weight_column(f"transported_{sugar}", f"enz_{sugar}_complex"),
+            weight_column(f"enz_{sugar}_complex", "atp")]
+
+# Figure settings: the lines are created once, and each frame only updates their data
+# ax -> list of (run log column, line of the mean, band between the minimum and maximum)
+lines = {ax: [] for ax in (pop_ax, glucose_ax, lactose_ax, sucrose_ax)}
+
+def add_line(ax, column, color, label, **kwargs):
+    line, = ax.plot([], [], color, label=label, **kwargs)
+    lines[ax].append([log.column_index[column], line, None])
+
+pop_ax.set_title("Population & Food")
+add_line(pop_ax, "population", "#D55E00", "Population", linestyle='dashed')
+add_line(pop_ax, food_column("glucose"), "#0072B2", "Glucse amt")
+add_line(pop_ax, food_column("lactose"), "#F0E442", "Lactose amt")
+add_line(pop_ax, food_column("sucrose"), "#009E73", "Sucrose amt")
+pop_ax.legend(loc="lower left")
+
+for ax, sugar in ((glucose_ax, "glucose"), (lactose_ax, "lactose"), (sucrose_ax, "sucrose")):
+    ax.set_title(f"{sugar.capitalize()} Pathway")
+    trans, enz, atp = pathway(sugar)
+    add_line(ax, trans, "#D55E00", "Transporter")
+    add_line(ax, enz, "#0072B2", "to Intermediate")
+    add_line(ax, atp, "#009E73", "to ATP")
+    ax.legend(loc="right")
+
+generation_column = log.column_index["generation"]
+
+# x axis limits set by animate for each axis. If an axis has other limits, the user has zoomed
+# in, and only that part of the run is shown (press "a" to show the whole run again).
+shown = {}
+# x axis limits and width in pixels of each axis when its lines were last drawn
+drawn = {}
+
+def show_all(event):
+    if event.key == "a":
+        shown.clear()
+
+fig.canvas.mpl_connect("key_press_event", show_all)
+
+def draw_band(ax, ax_line, generation, mins, maxs):
+    """Sets the band between the minimum and maximum of a line, creating it the first time"""
+    column, line, band = ax_line
+    if band is not None and hasattr(band, "set_data"):
+        band.set_data(generation, mins, maxs)
+        return band
+    # matplotlib < 3.10 cannot change the data of a band
+    if band is not None:
+        band.remove()
+    ax_line[2] = ax.fill_between(generation, mins, maxs, color=line.get_color(), alpha=0.2, linewidth=0)
+    return ax_line[2]
 
 def animate(i):
-    data = open('records.tsv', 'r').read()
-    lines = data.split('\n')
-    generation = []
-    population = []
-    glucose_amt = []
-    lactose_amt = []
-    sucrose_amt = []
-    glucose_trans = []
-    glucose_enz = []
-    glucose_atp = []
-    lactose_trans = []
-    lactose_enz = []
-    lactose_atp = []
-    sucrose_trans = []
-    sucrose_enz = []
-    sucrose_atp = []
-
-    for line in lines[-50:-1]:
-        statistics = line_to_dict(line)  # Delimiter is tab
-        generation.append(statistics["generation"])
-        population.append(statistics["population"])
-        glucose_amt.append(statistics["glucose_amt"])
-        lactose_amt.append(statistics["lactose_amt"])
-        sucrose_amt.append(statistics["sucrose_amt"])
-        glucose_trans.append(statistics["glucose_trans"])
-        glucose_enz.append(statistics["glucose_enz"])
-        glucose_atp.append(statistics["glucose_atp"])
-        lactose_trans.append(statistics["lactose_trans"])
-        lactose_enz.append(statistics["lactose_enz"])
-        lactose_atp.append(statistics["lactose_atp"])
-        sucrose_trans.append(statistics["sucrose_trans"])
-        sucrose_enz.append(statistics["sucrose_enz"])
-        sucrose_atp.append(statistics["sucrose_atp"])
-
-    # Figure settings
-    pop_ax.clear()
-    pop_ax.set_ylim([0, max([*population, *glucose_amt, *lactose_amt, *sucrose_amt]) * 1.1])
-    pop_ax.set_title("Population & Food")
-
-    glucose_ax.clear()
-    glucose_ax.set_ylim([0, min(max([*glucose_trans, *glucose_enz, *glucose_atp]) * 1.1, 1)])
-    glucose_ax.set_title("Glucose Pathway")
-
-    lactose_ax.clear()
-    lactose_ax.set_ylim([0, 1])
-    lactose_ax.set_ylim([0, min(max([*lactose_trans, *lactose_enz, *lactose_atp]) * 1.1, 1)])
-    lactose_ax.set_title("Lactose Pathway")
-
-    sucrose_ax.clear()
-    sucrose_ax.set_ylim([0, 1])
-    sucrose_ax.set_ylim([0, min(max([*sucrose_trans, *sucrose_enz, *sucrose_atp]) * 1.1, 1)])
-    sucrose_ax.set_title("Sucrose Pathway")
-
-    pop_ax.plot(generation, population, "#D55E00", linestyle='dashed', label="Population")
-    pop_ax.plot(generation, glucose_amt, "#0072B2", label="Glucse amt")
-    pop_ax.plot(generation, lactose_amt, "#F0E442", label="Lactose amt")
-    pop_ax.plot(generation, sucrose_amt, "#009E73", label="Sucrose amt")
-    pop_ax.legend(loc="bottom left")
-
-    glucose_ax.plot(generation, glucose_trans, "#D55E00", label="Transporter")
-    glucose_ax.plot(generation, glucose_enz, "#0072B2", label="to Intermediate")
-    glucose_ax.plot(generation, glucose_atp, "#009E73", label="to ATP")
-    glucose_ax.legend(loc="right")
-
-    lactose_ax.plot(generation, lactose_trans, "#D55E00", label="Transporter")
-    lactose_ax.plot(generation, lactose_enz, "#0072B2", label="to Intermediate")
-    lactose_ax.plot(generation, lactose_atp, "#009E73", label="to ATP")
-    lactose_ax.legend(loc="right")
-
-    sucrose_ax.plot(generation, sucrose_trans, "#D55E00", label="Transporter")
-    sucrose_ax.plot(generation, sucrose_enz, "#0072B2", label="to Intermediate")
-    sucrose_ax.plot(generation, sucrose_atp, "#009E73", label="to ATP")
-    sucrose_ax.legend(loc="right")
+    # an axis is only redrawn when there are new rows, or when the user has zoomed or resized
+    # it. Redrawing costs about the same however long the run is.
+    log.refresh()
+    new_rows = pyramid.update()
+    if len(pyramid) == 0:
+        return []
+    first_generation = log.rows[0, generation_column]
+
+    changed = []
+    for ax, ax_lines in lines.items():
+        following = ax not in shown or shown[ax] == ax.get_xlim()
+        if not new_rows and ax in shown and drawn.get(ax) == (ax.get_xlim(), int(ax.bbox.width)):
+            continue
+        if following:
+            start, stop = 0, len(pyramid)
+        else:
+            left, right = ax.get_xlim()
+            start, stop = int(left - first_generation), int(np.ceil(right - first_generation)) + 1
+        window = pyramid.window(start, stop, points=max(int(ax.bbox.width), 1))
+        # plot each block at its middle generation
+        generation = first_generation + window.rows + (window.block_size - 1) / 2
+
+        for ax_line in ax_lines:
+            column, line, _ = ax_line
+            line.set_data(generation, window.means[:, column])
+            changed += [line, draw_band(ax, ax_line, generation, window.mins[:, column], window.maxs[:, column])]
+
+        if following:
+            columns = [column for (column, _, _) in ax_lines]
+            top = np.nanmax(window.maxs[:, columns], initial=0) * 1.1
+            if ax is not pop_ax:
+                top = min(top, 1)
+            ax.set_ylim([0, top or 1])
+            ax.set_xlim([first_generation, max(log.rows[-1, generation_column], first_generation + 1)])
+            shown[ax] = ax.get_xlim()
+        drawn[ax] = (ax.get_xlim(), int(ax.bbox.width))
+    return changed
 
 ani = animation.FuncAnimation(fig, animate, interval=1000)
 plt.show()
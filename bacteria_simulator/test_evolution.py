@@ -0,0 +1,48 @@
+"""
+Tests of the mutation of edge weights. Run them from the bacteria_simulator directory:
+
+    python3 -m pytest -q
+"""
+import numpy as np
+
+from BactSim.Bacteria import make_basic_bacteria
+from BactSim.Evolution import Evolution
+
+def edge_weights(bacteria):
+    return [weight for (_, _, weight) in bacteria.graph.edges.data('weight')]
+
+def test_mutate_matches_get_mutated():
+    weights = np.array([0.2, 0.5, 0.9])
+    initial, sd = np.array([0.5, 0.005, 0.5]), np.array([0.2, 0.3, 0.1])
+    evolutions = [Evolution(i, s) for (i, s) in zip(initial, sd)]
+    for (evolution, weight) in zip(evolutions, weights):
+        evolution.weight = weight
+    rng = np.random.default_rng(1)
+    expected = [evolution.getMutated(rng) for evolution in evolutions]
+    assert Evolution.mutate(weights, initial, sd, np.random.default_rng(1)).tolist() == expected
+
+def test_evolve_reads_the_evolution_objects():
+    bacteria = make_basic_bacteria(1)
+    bacteria.compile()
+    for (_, _, evolution) in bacteria.graph.edges.data('evolution'):
+        evolution.sd = 0
+    before = edge_weights(bacteria)
+    bacteria.evolve(np.random.default_rng(1))
+    assert edge_weights(bacteria) == before
+    # clones share the compiled topology, but mutate with their own evolution objects
+    daughter = bacteria.divide(2, np.random.default_rng(1))
+    assert edge_weights(daughter) == before
+
+def test_evolve_uses_overridden_mutations():
+    class Fixed(Evolution):
+        def evolve(self, time):
+            return 0.25
+
+    assert not Fixed.batchable() and Evolution.batchable()
+    bacteria, expected = make_basic_bacteria(1), make_basic_bacteria(1)
+    edges = list(bacteria.graph.edges)
+    bacteria.graph.edges[edges[0]]['evolution'] = Fixed(0.5, 0.2)
+    bacteria.evolve(np.random.default_rng(1))
+    # the other edges are mutated by getMutated, drawing from rng in the same order
+    expected.evolve(np.random.default_rng(1))
+    assert edge_weights(bacteria) == [0.25] + edge_weights(expected)[1:]
@@ -0,0 +1,141 @@
+"""
+Tests of the food schedules of the food generators. Run them from the bacteria_simulator
+directory:
+
+    python3 -m pytest -q
+"""
+import math
+import numpy as np
+import pytest
+
+from BactSim.FoodGenerators import (FoodGenerator, StaticGenerator, ScheduleGenerator, TraceGenerator,
+                                    save_trace, schedule_chunks)
+
+def old_food(generation):
+    """The amounts of FoodGenerator, one generation at a time, as they were computed before
+    schedules"""
+    rad = generation * math.pi / 180 / 0.2
+    return {'glucose': 500 * math.cos(rad) + 500,
+            'lactose': 500 * math.cos(0.9 * rad) + 500,
+            'sucrose': 500 * math.sin(rad + 1.5 * math.pi) + 500}
+
+def test_food_generator_schedule_matches_old_formula():
+    schedule = FoodGenerator().schedule(0, 2000)
+    for generation in range(2000):
+        assert dict(zip(FoodGenerator.foods, schedule[generation].tolist())) == old_food(generation)
+
+def test_schedule_does_not_depend_on_start():
+    generator = FoodGenerator()
+    assert np.array_equal(generator.schedule(100, 300), generator.schedule(0, 300)[100:])
+    assert generator.schedule(5, 5).shape == (0, 3)
+    with pytest.raises(ValueError):
+        generator.schedule(5, 4)
+
+def test_get_available_reads_the_schedule():
+    generator = FoodGenerator()
+    schedule = generator.schedule(0, 50)
+    for generation in range(50):
+        food = generator.getAvailable()
+        assert food == old_food(generation)
+        assert food == dict(zip(generator.foods, schedule[generation].tolist()))
+        # a new dict every generation
+        food['glucose'] = -1
+        assert generator.food['glucose'] != -1
+
+def test_chunks_cover_the_schedule():
+    generator = FoodGenerator()
+    chunks = list(generator.chunks(10, 1000, chunk_size = 300))
+    assert [start for (start, _) in chunks] == [10, 310, 610, 910]
+    assert np.array_equal(np.concatenate([chunk for (_, chunk) in chunks]), generator.schedule(10, 1000))
+    with pytest.raises(ValueError):
+        next(schedule_chunks(generator, chunk_size = 0))
+
+def test_static_generator_schedule():
+    generator = StaticGenerator({'glucose': 10, 'sucrose': 20})
+    assert generator.foods == ('glucose', 'sucrose')
+    assert np.array_equal(generator.schedule(0, 3), [[10, 20]] * 3)
+    assert generator.getAvailable() == {'glucose': 10, 'sucrose': 20}
+    assert generator.generation == 1
+
+def test_schedule_generator_replays_a_generator():
+    schedule = FoodGenerator().schedule(0, 100)
+    replay = ScheduleGenerator.from_generator(FoodGenerator(), 100)
+    assert len(replay) == 100
+    assert np.array_equal(replay.schedule(20, 70), schedule[20:70])
+    generator = FoodGenerator()
+    for _ in range(100):
+        assert replay.getAvailable() == generator.getAvailable()
+    with pytest.raises(ValueError):
+        replay.getAvailable()
+
+def test_schedule_generator_shares_its_schedule():
+    values = np.zeros((10, 2))
+    first, second = ScheduleGenerator(('a', 'b'), values), ScheduleGenerator(('a', 'b'), values)
+    values[3] = (1, 2)
+    assert first.schedule(3, 4).tolist() == second.schedule(3, 4).tolist() == [[1, 2]]
+    with pytest.raises(ValueError):
+        ScheduleGenerator(('a', 'b', 'c'), values)
+
+@pytest.fixture
+def trace(tmp_path):
+    """A trace of 4 samples of 2 sugars, saved in columns"""
+    path = tmp_path / 'trace'
+    save_trace(path, {'glucose': [0., 10., 20., 30.], 'sucrose': [5., 5., 1., 1.]})
+    return path
+
+def test_trace_holds_each_sample_for_step_generations(trace):
+    generator = TraceGenerator(trace, step = 2)
+    assert generator.foods == ('glucose', 'sucrose')
+    assert generator.generations == 8
+    assert generator.schedule(0, 8)[:, 0].tolist() == [0, 0, 10, 10, 20, 20, 30, 30]
+    for generation in range(8):
+        assert generator.getAvailable()['glucose'] == 10 * (generation // 2)
+    with pytest.raises(ValueError):
+        generator.getAvailable()
+    with pytest.raises(ValueError):
+        generator.schedule(0, 9)
+
+def test_trace_with_a_fractional_step(trace):
+    generator = TraceGenerator(trace, step = 1.5)
+    assert generator.generations == 6
+    assert generator.schedule(0, 6)[:, 0].tolist() == [0, 0, 10, 20, 20, 30]
+
+def test_trace_interpolates_up_to_the_last_sample(trace):
+    generator = TraceGenerator(trace, step = 2, interpolate = True)
+    # the last generation is at the last sample
+    assert generator.generations == 7
+    assert generator.schedule(0, 7)[:, 0].tolist() == [0, 5, 10, 15, 20, 25, 30]
+    assert generator.schedule(0, 7)[:, 1].tolist() == [5, 5, 5, 3, 1, 1, 1]
+    with pytest.raises(ValueError):
+        generator.schedule(6, 8)
+
+def test_trace_loops(trace):
+    generator = TraceGenerator(trace, step = 2, loop = True)
+    assert generator.generations is None
+    assert np.array_equal(generator.schedule(8, 16), generator.schedule(0, 8))
+    assert generator.schedule(1000, 1002)[:, 0].tolist() == [0, 0]
+    # the last sample is interpolated with the first one
+    generator = TraceGenerator(trace, step = 2, interpolate = True, loop = True)
+    assert generator.schedule(6, 9)[:, 0].tolist() == [30, 15, 0]
+
+def test_trace_chunks_stop_at_its_end(trace):
+    generator = TraceGenerator(trace, step = 3)
+    chunks = list(generator.chunks(chunk_size = 5))
+    assert [start for (start, _) in chunks] == [0, 5, 10]
+    assert np.array_equal(np.concatenate([chunk for (_, chunk) in chunks]), generator.schedule(0, 12))
+
+def test_trace_files(tmp_path):
+    table = np.array([[1., 2.], [3., 4.], [5., 6.]])
+    np.save(tmp_path / 'trace.npy', table)
+    table.astype(np.float32).tofile(tmp_path / 'trace.raw')
+    for (path, dtype) in ((tmp_path / 'trace.npy', 'float64'), (str(tmp_path / 'trace.raw'), 'float32')):
+        generator = TraceGenerator(path, foods = ('glucose', 'sucrose'), dtype = dtype)
+        assert np.array_equal(generator.schedule(0, 3), table)
+    with pytest.raises(ValueError):
+        TraceGenerator(tmp_path / 'trace.npy')
+    with pytest.raises(ValueError):
+        TraceGenerator(tmp_path / 'trace.npy', foods = ('glucose', 'sucrose', 'lactose'))
+    with pytest.raises(ValueError):
+        TraceGenerator(tmp_path / 'trace.raw', foods = ('glucose', 'sucrose', 'lactose', 'maltose'), dtype = 'float32')
+    with pytest.raises(ValueError):
+        TraceGenerator(tmp_path / 'trace.npy', foods = ('glucose', 'sucrose'), step = 0)
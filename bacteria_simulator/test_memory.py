@@ -0,0 +1,79 @@
+"""
+Tests of the memory estimates and of the memory budget of the simulators. Run them from the
+bacteria_simulator directory:
+
+    python3 -m pytest -q
+"""
+import numpy as np
+import pytest
+
+from BactSim.Batch.Batch import make_simulator
+from BactSim.Population import Population
+from BactSim.Simulator.Memory import MemoryBudget, PEAK_FACTOR, memory_usage, representation
+
+def grown(representation, generations = 6, **kwargs):
+    """Returns a simulator with StaticGenerator food, run for a few generations"""
+    simulator = make_simulator(representation = representation, food_generator = 'StaticGenerator', seed = 1,
+                               **kwargs)
+    for _ in range(generations):
+        simulator.progress()
+    return simulator
+
+def test_memory_usage():
+    sizes = {name: memory_usage(grown(name).bacteria) for name in ('bacteria', 'compact', 'population')}
+    assert sizes['bacteria'].bytes_per_cell > sizes['compact'].bytes_per_cell > sizes['population'].bytes_per_cell
+    population = grown('population').bacteria
+    arrays = (population.amounts, population.weights, population.ids, population.generations,
+              population.timesteps, *population.last_food.values())
+    assert sizes['population'].population_bytes == sum(array.nbytes for array in arrays)
+    assert memory_usage([]) == (0, 0)
+
+def test_budget_converts_to_smaller_representations():
+    simulator = grown('bacteria')
+    usage = memory_usage(grown('compact').bacteria)
+    budget = MemoryBudget(PEAK_FACTOR['compact'] * usage.population_bytes)
+    budget.check(simulator)
+    assert representation(simulator.bacteria) == 'compact'
+    assert budget.changes == [(6, 'converted the population to CompactBacteria')]
+    # within the budget, nothing changes
+    bacteria = simulator.bacteria
+    budget.check(simulator)
+    assert simulator.bacteria is bacteria and len(budget.changes) == 1
+
+    simulator = grown('bacteria')
+    budget = MemoryBudget(PEAK_FACTOR['compact'] * usage.population_bytes - 1)
+    budget.check(simulator)
+    assert isinstance(simulator.bacteria, Population)
+    assert len(budget.changes) == 2 and simulator.max_cells is None
+
+def test_converted_population_gives_the_same_results():
+    simulator = grown('bacteria', 10, memory_budget = 2 ** 20)
+    expected = grown('bacteria', 10)
+    assert simulator.memory_budget.changes and simulator.cell_weight == 1
+    assert representation(simulator.bacteria) != 'bacteria'
+    actual = simulator.bacteria
+    if not isinstance(actual, Population):
+        actual = Population.from_bacteria(actual)
+    assert np.array_equal(actual.weights, Population.from_bacteria(expected.bacteria).weights)
+
+def test_budget_samples_the_population():
+    simulator = grown('population')
+    cells = len(simulator.bacteria)
+    usage = memory_usage(simulator.bacteria)
+    # room for 20.5 cells at the peak of a generation
+    budget = MemoryBudget(int(20.5 * PEAK_FACTOR['population'] * usage.bytes_per_cell))
+    budget.check(simulator)
+    assert len(simulator.bacteria) == simulator.max_cells == 20
+    assert simulator.cell_weight == cells / 20
+    assert simulator.population_size == cells
+    assert budget.changes == [(6, 'sampled 20 cells of the population')]
+    # a smaller carrying capacity is kept
+    simulator = grown('population', max_cells = 10)
+    budget.check(simulator)
+    assert simulator.max_cells == 10
+
+def test_budget_too_small():
+    with pytest.raises(MemoryError):
+        MemoryBudget(10).check(grown('population'))
+    with pytest.raises(ValueError):
+        MemoryBudget(0)
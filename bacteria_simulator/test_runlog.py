@@ -0,0 +1,163 @@
+"""
+Tests of the run logs and of the pyramid the Viewer plots them with. Run them from the
+bacteria_simulator directory:
+
+    python3 -m pytest -q
+"""
+import numpy as np
+import pytest
+
+from BactSim.Batch.Batch import make_simulator
+from BactSim.RunLog import RunLogWriter, RunLogReader, Pyramid, weight_column
+
+def expected_window(rows, block_size, first, blocks):
+    """The minimum, maximum and mean of each block of rows, computed directly"""
+    starts = [(first + b) * block_size for b in range(blocks)]
+    chunks = [rows[start:start + block_size] for start in starts]
+    return (np.array([np.fmin.reduce(chunk) for chunk in chunks]),
+            np.array([np.fmax.reduce(chunk) for chunk in chunks]),
+            np.array([chunk.mean(axis = 0) for chunk in chunks]))
+
+@pytest.mark.parametrize('factor', (2, 3, 4))
+@pytest.mark.parametrize('num_rows', (2, 7, 64, 100, 1001))
+def test_pyramid_window_matches_the_rows(factor, num_rows):
+    rows = np.random.default_rng(num_rows).normal(size = (num_rows, 3))
+    pyramid = Pyramid(rows, factor = factor)
+    for (start, stop, points) in ((0, num_rows, 10), (0, num_rows, 1000), (num_rows // 3, num_rows, 7),
+                                  (1, num_rows // 2 + 1, 5), (0, None, 1)):
+        window = pyramid.window(start, stop, points)
+        assert len(window.rows) <= max(points, -(-num_rows // window.block_size))
+        assert window.rows[0] <= start < window.rows[0] + window.block_size
+        first = window.rows[0] // window.block_size
+        mins, maxs, means = expected_window(rows, window.block_size, first, len(window.rows))
+        assert np.array_equal(window.mins, mins)
+        assert np.array_equal(window.maxs, maxs)
+        assert window.means == pytest.approx(means)
+
+def test_pyramid_window_uses_the_lowest_level_which_fits():
+    pyramid = Pyramid(np.arange(1000.).reshape(-1, 1))
+    assert pyramid.num_levels == 5
+    assert pyramid.window(0, 1000, 1000).block_size == 1
+    assert pyramid.window(0, 1000, 250).block_size == 4
+    assert pyramid.window(0, 1000, 249).block_size == 16
+    assert pyramid.window(100, 116, 4).block_size == 4
+    # the highest level, with more blocks than wanted
+    assert pyramid.window(0, 1000, 1).block_size == 256
+    assert len(pyramid.window(500, 500).rows) == 0
+
+def test_pyramid_tail_covers_the_incomplete_blocks():
+    # 4 ** 3 + 4 ** 2 + 4 + 3 rows: a partial block at every level
+    rows = np.arange(87.).reshape(-1, 1)
+    pyramid = Pyramid(rows)
+    window = pyramid.window(0, 87, 2)
+    assert window.block_size == 64
+    assert window.mins[:, 0].tolist() == [0, 64]
+    assert window.maxs[:, 0].tolist() == [63, 86]
+    assert window.means[:, 0].tolist() == [31.5, 75]
+
+def test_pyramid_ignores_nan_in_the_minimum_and_maximum():
+    rows = np.array([[1.], [np.nan], [3.], [np.nan], [np.nan], [np.nan]])
+    window = Pyramid(rows, factor = 2).window(0, 6, 3)
+    assert window.mins[:, 0].tolist()[:2] == [1, 3]
+    assert window.maxs[:, 0].tolist()[:2] == [1, 3]
+    assert np.isnan(window.mins[2, 0]) and np.isnan(window.means[0, 0])
+
+def test_pyramid_follows_a_run_log(tmp_path):
+    path = tmp_path / 'log.bslog'
+    rows = np.random.default_rng(1).normal(size = (300, 2))
+    writer = RunLogWriter(path, ['a', 'b'], buffer_rows = 1)
+    reader = RunLogReader(path)
+    pyramid = Pyramid(reader)
+    for chunk in np.array_split(rows, 7):
+        for row in chunk:
+            writer.write(row)
+        reader.refresh()
+        assert pyramid.update() == len(chunk)
+    assert pyramid.update() == 0
+    writer.close()
+
+    expected = Pyramid(rows)
+    for points in (300, 50, 3):
+        window, expected_ = pyramid.window(10, 290, points), expected.window(10, 290, points)
+        for (a, b) in zip(window, expected_):
+            assert np.array_equal(a, b)
+    # the rows are read from the log, and only the levels above them are kept
+    assert pyramid.rows is reader.rows
+    assert sum(len(level[0]) for level in pyramid._levels) < len(rows)
+
+def test_run_log_round_trip(tmp_path):
+    path = tmp_path / 'log.bslog'
+    rows = np.random.default_rng(1).normal(size = (100, 3))
+    with RunLogWriter(path, ['generation', 'a', 'b'], metadata = {'seed': 1}, buffer_rows = 16) as writer:
+        for row in rows[:99]:
+            writer.write(row)
+        writer.write({'generation': 7, 'b': 2})
+    reader = RunLogReader(path)
+    assert reader.columns == ['generation', 'a', 'b']
+    assert reader.metadata == {'seed': 1}
+    assert len(reader) == 100
+    assert np.array_equal(reader.rows[:99], rows[:99])
+    # missing columns are NaN
+    assert reader.rows[99, 0] == 7 and np.isnan(reader.rows[99, 1]) and reader.rows[99, 2] == 2
+    assert np.array_equal(reader['a'][:99], rows[:99, 1])
+    assert np.array_equal(reader.column('b', start = -10, stop = -1), rows[90:99, 2])
+    assert np.array_equal(reader[['b', 'a']][:99], rows[:99, [2, 1]])
+    with pytest.raises(ValueError):
+        reader.column('c')
+
+def test_run_log_appends_to_an_existing_log(tmp_path):
+    path = tmp_path / 'log.bslog'
+    with RunLogWriter(path, ['a', 'b']) as writer:
+        writer.write([1, 2])
+    # a partly written row, eg. if the writer was killed
+    with open(path, 'ab') as file:
+        file.write(b'\0' * 3)
+    with RunLogWriter(path, ['a', 'b'], append = True) as writer:
+        writer.write([3, 4])
+    assert RunLogReader(path).rows.tolist() == [[1, 2], [3, 4]]
+    with pytest.raises(ValueError):
+        RunLogWriter(path, ['a', 'c'], append = True)
+    with pytest.raises(ValueError):
+        RunLogWriter(path, ['a', 'a'])
+
+def test_run_log_rejects_other_files(tmp_path):
+    path = tmp_path / 'records.tsv'
+    path.write_text('generation\tpopulation\n')
+    with pytest.raises(ValueError):
+        RunLogReader(path)
+
+def test_run_log_for_simulator(tmp_path):
+    path = tmp_path / 'log.bslog'
+    simulator = make_simulator(representation = 'population', seed = 1)
+    with RunLogWriter.for_simulator(path, simulator, extra_columns = ['phase']) as writer:
+        for _ in range(3):
+            simulator.progress()
+            writer.log(simulator, extra = {'phase': 0.5})
+    reader = RunLogReader(path)
+    assert reader['generation'].tolist() == [1, 2, 3]
+    assert reader['population'][-1] == simulator.population_size
+    assert reader['phase'].tolist() == [0.5] * 3
+    means = simulator.statistics.weight_means()
+    edges = simulator.statistics.topology.edges
+    assert [reader.column(weight_column(src, dest))[-1] for (src, dest) in edges] == means.tolist()
+
+def test_reader_follows_a_log_being_written(tmp_path):
+    path = tmp_path / 'log.bslog'
+    writer = RunLogWriter(path, ['a', 'b'], buffer_rows = 4)
+    reader = RunLogReader(path)
+    assert reader.read_new().shape == (0, 2)
+    for i in range(6):
+        writer.write([i, -i])
+    # only the first 4 rows have been written
+    assert reader.read_new()[:, 0].tolist() == [0, 1, 2, 3]
+    assert reader.read_new().shape == (0, 2)
+    writer.flush()
+    # a partly written row is left until it is complete
+    writer.file.write(np.array([6.]).tobytes())
+    writer.file.flush()
+    assert reader.refresh() == 2
+    assert reader.read_new()[:, 0].tolist() == [4, 5]
+    writer.file.write(np.array([-6.]).tobytes())
+    writer.close()
+    assert reader.read_new().tolist() == [[6, -6]]
+    assert len(reader) == 7
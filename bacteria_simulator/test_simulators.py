@@ -0,0 +1,178 @@
+"""
+Tests that the representations of the cells and the ways of running a simulation give the
+same results. Run them from the bacteria_simulator directory:
+
+    python3 -m pytest -q
+"""
+import numpy as np
+import pytest
+
+from BactSim.Bacteria import Bacteria
+from BactSim.Batch.Batch import make_simulator
+from BactSim.Population import Population, SharedPopulation, CohortPopulation
+from BactSim.Simulator import Engine
+from BactSim.Simulator.Statistics import PopulationStatistics
+
+SIMULATORS = ('int', 'simple')
+REPRESENTATIONS = ('bacteria', 'compact', 'population', 'shared', 'cohorts')
+
+def make(representation, simulator = 'int', seed = 1, **kwargs):
+    """
+    Returns a simulator with StaticGenerator food, whose cells are in the given representation,
+    or a SharedPopulation ('shared') run by 2 worker processes
+    """
+    params = dict(food_generator = 'StaticGenerator', simulator = simulator, seed = seed, cores = 2, **kwargs)
+    if representation != 'shared':
+        return make_simulator(representation = representation, **params)
+    simulator = make_simulator(representation = 'population', **params)
+    simulator.bacteria = SharedPopulation(simulator.bacteria, cores = 2, min_chunk_size = 16)
+    simulator.statistics = PopulationStatistics.of(simulator.bacteria)
+    return simulator
+
+def close(simulator):
+    simulator.close()
+    if isinstance(simulator.bacteria, SharedPopulation):
+        simulator.bacteria.close()
+
+def snapshot(simulator):
+    """Returns the ids, amounts and weights of the cells, as a Population with one row per cell"""
+    bacteria = simulator.bacteria
+    if isinstance(bacteria, CohortPopulation):
+        return bacteria.expand()
+    if isinstance(bacteria, Population):
+        # copied, as a SharedPopulation changes its arrays in place
+        return Population(bacteria.topology, bacteria.amounts.copy(), bacteria.weights.copy(),
+                          ids = bacteria.ids.copy())
+    return Population.from_bacteria(bacteria) if bacteria else None
+
+def run(simulator, generations):
+    """Runs a simulator, and returns a snapshot of every generation, until it dies out"""
+    snapshots = []
+    for _ in range(generations):
+        if len(simulator.bacteria) == 0:
+            break
+        simulator.progress()
+        snapshots.append(snapshot(simulator))
+    return snapshots
+
+def trajectory(simulator, generations):
+    """Same as run, and closes the simulator afterwards"""
+    try:
+        return run(simulator, generations)
+    finally:
+        close(simulator)
+
+def assert_identical(first, second):
+    assert len(first) == len(second)
+    for (a, b) in zip(first, second):
+        if a is None or b is None:
+            assert a is None and b is None
+            continue
+        assert np.array_equal(a.ids, b.ids)
+        assert np.array_equal(a.amounts, b.amounts)
+        assert np.array_equal(a.weights, b.weights)
+
+@pytest.mark.parametrize('simulator', SIMULATORS)
+def test_per_cell_representations_are_identical(simulator):
+    expected = trajectory(make('population', simulator), 10)
+    for representation in ('bacteria', 'compact', 'shared'):
+        assert_identical(trajectory(make(representation, simulator), 10), expected)
+
+@pytest.mark.parametrize('representation', ('bacteria', 'compact'))
+@pytest.mark.parametrize('cores', (1, 2))
+def test_multicore_is_identical(representation, cores, monkeypatch):
+    # small ranges of cells, so that the worker processes run several of them
+    monkeypatch.setattr(Engine, 'MIN_CHUNK_SIZE', 8)
+    simulator = make(representation, multicore_threshold = 1)
+    simulator.cores = cores
+    simulator.replicate_threshold = 1 if cores > 1 else None
+    expected = make(representation, multicore_threshold = None)
+    assert_identical(trajectory(simulator, 12), trajectory(expected, 12))
+
+class Hungry(Bacteria):
+    """Bacteria which die when they get less than 2 units of glucose"""
+
+    def survive(self, food):
+        return super().survive(food) and food['glucose'] >= 2
+
+def test_multicore_runs_customized_survive():
+    simulators = [make('bacteria', multicore_threshold = threshold) for threshold in (1, None)]
+    for simulator in simulators:
+        simulator.bacteria[0].__class__ = Hungry
+    multicore, expected = (trajectory(simulator, 12) for simulator in simulators)
+    assert_identical(multicore, expected)
+    assert len(multicore[-1]) < len(trajectory(make('bacteria'), 12)[-1])
+
+def test_cohorts_without_mutations_match_population():
+    # every cell gets the same food, so with evo_sd = 0 the cells stay identical
+    params = dict(simulator = 'simple', bacteria_params = {'evo_sd': 0})
+    cohorts = trajectory(make('cohorts', **params), 30)
+    population = trajectory(make('population', **params), 30)
+    assert len(cohorts) == len(population)
+    for (a, b) in zip(cohorts, population):
+        assert len(a) == len(b)
+        assert np.array_equal(a.amounts, b.amounts)
+        assert np.array_equal(a.weights, b.weights)
+
+def test_cohorts_match_population_on_average():
+    # with extra units of food given at random, only the distribution is the same. The size
+    # after 15 generations varies a lot between runs: the standard error of each mean is
+    # about 12%.
+    sizes = {representation: [len(trajectory(make(representation, seed = seed), 15)[-1])
+                              for seed in range(32)]
+             for representation in ('cohorts', 'population')}
+    assert np.mean(sizes['cohorts']) == pytest.approx(np.mean(sizes['population']), rel = 0.2)
+
+@pytest.mark.parametrize('representation', REPRESENTATIONS)
+def test_checkpoint_resume_is_identical(representation, tmp_path):
+    path = tmp_path / 'checkpoint.npz'
+    simulator = make(representation)
+    try:
+        run(simulator, 5)
+        simulator.save_checkpoint(path)
+    except BaseException:
+        close(simulator)
+        raise
+    expected = trajectory(simulator, 5)
+
+    resumed = make('population' if representation == 'shared' else representation, seed = 2)
+    resumed.load_checkpoint(path)
+    assert_identical(trajectory(resumed, 5), expected)
+
+@pytest.mark.parametrize('simulator', SIMULATORS)
+@pytest.mark.parametrize('representation', REPRESENTATIONS)
+@pytest.mark.parametrize('allocation', (None, 'equal', 'integer', 'proportional', 'competitive'))
+def test_extinction_raises(simulator, representation, allocation):
+    simulator = make(representation, simulator, allocation = allocation)
+    simulator.food_generator.food = dict.fromkeys(simulator.food_generator.food, 0)
+    try:
+        with pytest.raises(ZeroDivisionError):
+            for _ in range(50):
+                simulator.progress()
+        assert len(simulator.bacteria) == 0
+    finally:
+        close(simulator)
+
+@pytest.mark.parametrize('representation', ('bacteria', 'population', 'cohorts'))
+def test_sample_keeps_the_population_size(representation):
+    simulator = make(representation)
+    try:
+        run(simulator, 6)
+        cells = len(simulator.bacteria)
+        ids = set(snapshot(simulator).ids.tolist())
+        simulator.sample(cells // 4)
+        assert len(simulator.bacteria) == cells // 4
+        assert simulator.cell_weight == cells / (cells // 4)
+        assert simulator.population_size == cells
+        assert set(snapshot(simulator).ids.tolist()) <= ids
+        simulator.sample(len(simulator.bacteria) // 2)
+        assert simulator.population_size == pytest.approx(cells)
+    finally:
+        close(simulator)
+
+def test_carrying_capacity():
+    simulator = make('population', max_cells = 50)
+    assert max(len(cells) for cells in trajectory(simulator, 12)) <= 50
+    # the sample stands for the whole population, which keeps growing
+    assert simulator.cell_weight > 1
+    assert simulator.population_size == len(simulator.bacteria) * simulator.cell_weight > 50